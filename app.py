@@ -1,20 +1,31 @@
 import streamlit as st
-import base64
-from openai import OpenAI
 from dotenv import load_dotenv
 import os
-from mongo_utils import get_mongo_collections
+from mongo_utils import get_mongo_collections, get_cache_collection, get_database
+import db_indexes
 import auth_service
 import db_service
 import chat_service
+import conversation_context
+import profiler
+import llm_client
+import warmup
+import census_index
+import segment_sizing
+import result_cache
+import image_pipeline
 import ui_components
-import pandas as pd
-from pypdf import PdfReader
+import pdf_extractor
+import upload_cache
+import doc_retrieval
 import io
+import hashlib
 import platform
 import uuid
 
 load_dotenv()
+# 이번 리런의 구간별 소요 시간 기록 시작
+profiler.begin_rerun()
 openai_api_key = os.getenv("OPENAI_API_KEY", "").strip()
 google_client_id = os.getenv("GOOGLE_CLIENT_ID", "").strip()
 google_client_secret = os.getenv("GOOGLE_CLIENT_SECRET", "").strip()
@@ -34,6 +45,17 @@ else:
     pass
 
 login_collection, chat_collection = get_mongo_collections()
+cache_collection = get_cache_collection()
+db_indexes.ensure_indexes_once(login_collection, chat_collection, cache_collection)
+result_cache.configure(cache_collection)
+image_pipeline.configure(get_database())
+# 프로세스당 한 번, 무거운 리소스를 백그라운드에서 미리 준비한다
+warmup.start(openai_api_key)
+
+# 채팅 화면에 한 번에 그리는 메시지 수 / 세션 선택 시 불러오는 메시지 수
+CHAT_WINDOW_SIZE = int(os.getenv("CHAT_WINDOW_SIZE", "30"))
+SESSION_PAGE_SIZE = int(os.getenv("SESSION_PAGE_SIZE", "50"))
+SESSION_MAX_LOAD = int(os.getenv("SESSION_MAX_LOAD", "300"))
 
 auth_url = "https://accounts.google.com/o/oauth2/v2/auth"
 token_url = "https://oauth2.googleapis.com/token"
@@ -48,10 +70,29 @@ def on_new_chat():
         "content": "안녕하세요! 예비 창업자님. 💡 **창업 아이템**을 알려주시면 **잠재 고객**, **시장 전망**, **SWOT**, **성공 전략**을 상세히 분석해 드릴게요!"
     }]
     st.session_state["session_id"] = None
+    st.session_state["context_state"] = conversation_context.new_context_state()
+    st.session_state["doc_index"] = doc_retrieval.DocumentIndex()
+    reset_message_window()
+
+def reset_message_window(offset=0, cursor=None, has_older=False):
+    # offset: 메모리에 올리지 않은 (더 오래된) 저장 메시지 수
+    st.session_state["messages_offset"] = offset
+    st.session_state["messages_cursor"] = cursor
+    st.session_state["messages_has_older"] = has_older
+    st.session_state["chat_window"] = CHAT_WINDOW_SIZE
 
 def on_session_select(session_id):
     st.session_state["session_id"] = session_id
-    messages = db_service.get_session_messages(chat_collection, session_id)
+    context_state = db_service.get_session_summary(chat_collection, session_id)
+    st.session_state["context_state"] = context_state
+    st.session_state["doc_index"] = doc_retrieval.DocumentIndex()
+
+    # 화면용 최신 페이지 + 아직 요약되지 않은 메시지까지만 불러온다
+    total = db_service.count_session_messages(chat_collection, session_id)
+    limit = min(max(SESSION_PAGE_SIZE, total - context_state["summary_upto"]), SESSION_MAX_LOAD)
+    page = db_service.get_session_messages_page(chat_collection, session_id, limit=limit)
+    messages = page["messages"]
+    reset_message_window(total - len(messages), page["cursor"], page["has_more"])
     if messages:
         st.session_state["messages"] = messages
     else:
@@ -60,6 +101,62 @@ def on_session_select(session_id):
             "content": "안녕하세요! 예비 창업자님. 💡 **창업 아이템**을 알려주시면 **잠재 고객**, **시장 전망**, **SWOT**, **성공 전략**을 상세히 분석해 드릴게요!"
         }]
 
+def on_load_older_messages():
+    window = st.session_state["chat_window"] + CHAT_WINDOW_SIZE
+    st.session_state["chat_window"] = window
+    missing = window - len(st.session_state["messages"])
+    if missing > 0 and st.session_state["messages_has_older"] and st.session_state.get("session_id"):
+        page = db_service.get_session_messages_page(
+            chat_collection, st.session_state["session_id"],
+            limit=max(missing, SESSION_PAGE_SIZE), before=st.session_state["messages_cursor"]
+        )
+        st.session_state["messages"] = page["messages"] + st.session_state["messages"]
+        st.session_state["messages_offset"] = max(0, st.session_state["messages_offset"] - len(page["messages"]))
+        st.session_state["messages_cursor"] = page["cursor"]
+        st.session_state["messages_has_older"] = page["has_more"]
+
+def build_conversation_context(client):
+    # 오래된 대화는 롤링 요약으로 접고, 요약이 갱신되면 세션 문서에 저장
+    context, changed = conversation_context.build_context(
+        client, st.session_state["messages"], st.session_state["context_state"],
+        offset=st.session_state["messages_offset"]
+    )
+    if changed and st.session_state.get("session_id"):
+        state = st.session_state["context_state"]
+        try:
+            db_service.update_session_summary(chat_collection, st.session_state["session_id"], state["summary"], state["summary_upto"])
+        except Exception as e:
+            print(f"대화 요약 저장 실패: {str(e)}")
+    return context
+
+def render_bmc_result(bmc_data):
+    st.markdown("#### 🏗️ 비즈니스 모델 캔버스 결과")
+    ui_components.render_bmc_visual(bmc_data)
+    
+    # 다운로드 버튼 (Markdown)
+    markdown_content = f"""
+# Business Model Canvas
+
+| 구분 | 내용 |
+|---|---|
+| 🤝 핵심 파트너 | {bmc_data.get('key_partners')} |
+| 🔑 핵심 활동 | {bmc_data.get('key_activities')} |
+| 💎 핵심 자원 | {bmc_data.get('key_resources')} |
+| 🎁 가치 제안 | {bmc_data.get('value_propositions')} |
+| 🗣️ 고객 관계 | {bmc_data.get('customer_relationships')} |
+| 🚚 채널 | {bmc_data.get('channels')} |
+| 👥 고객 세그먼트 | {bmc_data.get('customer_segments')} |
+| 💰 비용 구조 | {bmc_data.get('cost_structure')} |
+| 💵 수익원 | {bmc_data.get('revenue_streams')} |
+"""
+    st.download_button(
+        label="📥 Markdown 다운로드",
+        data=markdown_content,
+        file_name=f"BMC_{st.session_state.get('guest_id', 'user')}.md",
+        mime="text/markdown",
+        use_container_width=True
+    )
+
 def on_delete_session(session_id):
     db_service.delete_chat_session(chat_collection, session_id)
     if st.session_state.get("session_id") == session_id:
@@ -168,10 +265,26 @@ if "messages" not in st.session_state:
         "content": "안녕하세요! 예비 창업자님. 💡 **창업 아이템**을 알려주시면 **잠재 고객**, **시장 전망**, **SWOT**, **성공 전략**을 상세히 분석해 드릴게요!"
     }]
 
+if "context_state" not in st.session_state:
+    st.session_state["context_state"] = conversation_context.new_context_state()
+
+if "chat_window" not in st.session_state:
+    reset_message_window()
+
+if "doc_index" not in st.session_state:
+    st.session_state["doc_index"] = doc_retrieval.DocumentIndex()
+if "doc_profiles" not in st.session_state:
+    st.session_state["doc_profiles"] = {}
+
 tab_chat, tab_bmc, tab_panel = st.tabs(["💬 채팅 분석", "📋 원클릭 BMC & 진단", "👥 가상 자문단 회의"])
 
-with tab_chat:
-    ui_components.display_chat_messages(st.session_state["messages"])
+with tab_chat, profiler.span("tab.chat"):
+    ui_components.display_chat_messages(
+        st.session_state["messages"],
+        window=st.session_state["chat_window"],
+        has_older=st.session_state["messages_has_older"],
+        on_load_older=on_load_older_messages
+    )
     
     col1, col2 = st.columns(2)
     with col1:
@@ -186,66 +299,80 @@ with tab_chat:
             st.info("Please add your OpenAI API key to continue.")
             st.stop()
 
-        client = OpenAI(api_key=openai_api_key)
+        client = llm_client.get_client(openai_api_key)
 
         message_content = []
         
         message_content.append({"type": "text", "text": prompt})
         
         if uploaded_file:
-            image_bytes = uploaded_file.getvalue()
-            base64_image = base64.b64encode(image_bytes).decode('utf-8')
+            # 축소/재압축 후 GridFS 에 저장하고 메시지에는 참조만 남긴다
+            try:
+                image = image_pipeline.ingest_image(uploaded_file.getvalue())
+            except Exception as e:
+                st.error(f"이미지 처리 중 오류 발생: {e}")
+                st.stop()
             
             message_content.append({
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_image}"
+                    "url": image["url"]
                 }
             })
             
             with st.chat_message("user"):
-                st.image(uploaded_file)
+                st.image(image["data"])
 
+        doc_index = st.session_state["doc_index"]
+        doc_hash = None
         if uploaded_doc:
-            file_text = ""
             try:
-                if uploaded_doc.type == "application/pdf":
-                    reader = PdfReader(uploaded_doc)
-                    max_pages = 5
-                    for i, page in enumerate(reader.pages):
-                        if i >= max_pages:
-                            file_text += f"\n\n[...내용이 너무 길어 {max_pages}페이지만 표시합니다...]"
-                            break
-                        file_text += page.extract_text() + "\n"
-                elif uploaded_doc.type == "text/csv":
-                    try:
-                        df = pd.read_csv(uploaded_doc)
-                    except UnicodeDecodeError:
-                        uploaded_doc.seek(0)
-                        df = pd.read_csv(uploaded_doc, encoding='cp949')
-                    
-                    if len(df) > 50:
-                        file_text = f"⚠️ 데이터가 너무 많아 상위 50행만 분석에 사용합니다 (총 {len(df)}행).\n"
-                        file_text += df.head(50).to_markdown(index=False)
+                doc_bytes = uploaded_doc.getvalue()
+                doc_hash = hashlib.sha256(doc_bytes).hexdigest()
+                # 세션 검색 인덱스에 한 번만 색인하고, 프롬프트에는 관련 조각만 붙인다
+                if not doc_index.has_document(doc_hash):
+                    # 같은 파일을 이전에 파싱했다면 디스크 캐시에서 바로 가져온다
+                    cached = upload_cache.get(doc_hash)
+                    if uploaded_doc.type == "application/pdf":
+                        if cached is None:
+                            pdf = pdf_extractor.extract_text(doc_bytes)
+                            cached = {"meta": {"kind": "pdf", "pages": pdf["pages"], "page_count": pdf["page_count"]}, "text": pdf["text"], "frame": None}
+                            upload_cache.put(doc_hash, cached["meta"], text=cached["text"])
+                        doc_index.add_document(uploaded_doc.name, text=cached["text"], doc_hash=doc_hash)
                     else:
-                        file_text = df.to_markdown(index=False)
-                elif "excel" in uploaded_doc.type or uploaded_doc.name.endswith(".xlsx"):
-                    df = pd.read_excel(uploaded_doc)
-                    if len(df) > 50:
-                        file_text = f"⚠️ 데이터가 너무 많아 상위 50행만 분석에 사용합니다 (총 {len(df)}행).\n"
-                        file_text += df.head(50).to_markdown(index=False)
-                    else:
-                        file_text = df.to_markdown(index=False)
-                
-                if file_text:
-                    message_content[0]["text"] += f"\n\n[첨부 파일 내용 ({uploaded_doc.name})]:\n{file_text}"
-                    
-                    with st.chat_message("user"):
-                        st.caption(f"📎 파일 첨부: {uploaded_doc.name}")
-                        if "⚠️" in file_text:
-                            st.caption("※ 토큰 제한으로 인해 데이터 일부만 전송되었습니다.")
+                        if cached is None:
+                            # pandas 는 표 파일을 처음 파싱할 때만 불러온다
+                            import data_profiler
+
+                            # 표 데이터는 청크 단위로 스트리밍하며 전체 통계를 낸다
+                            if uploaded_doc.type == "text/csv" or uploaded_doc.name.endswith(".csv"):
+                                profile = data_profiler.profile_csv(doc_bytes)
+                            else:
+                                profile = data_profiler.profile_xlsx(doc_bytes)
+                            cached = {"meta": {"kind": "table", "rows": profile["rows"]}, "text": data_profiler.format_profile(profile, uploaded_doc.name), "frame": profile["head"]}
+                            upload_cache.put(doc_hash, cached["meta"], text=cached["text"], frame=cached["frame"])
+                        st.session_state["doc_profiles"][doc_hash] = cached["text"]
+                        # 특정 행 검색용으로는 앞부분 표본 행만 색인한다
+                        doc_index.add_document(uploaded_doc.name, doc_hash=doc_hash, chunks=doc_retrieval.table_chunks(cached["frame"]))
+
+                with st.chat_message("user"):
+                    st.caption(f"📎 파일 첨부: {uploaded_doc.name}")
             except Exception as e:
                 st.error(f"파일 처리 중 오류 발생: {e}")
+                doc_hash = None
+
+        profile_text = st.session_state["doc_profiles"].get(doc_hash) if doc_hash else None
+        if profile_text:
+            message_content[0]["text"] += f"\n\n[첨부 데이터 요약]:\n{profile_text}"
+
+        if len(doc_index):
+            hits = doc_index.search(prompt)
+            if not hits and doc_hash and not profile_text:
+                hits = doc_index.leading_chunks(doc_hash)
+            if hits:
+                message_content[0]["text"] += f"\n\n[첨부 문서에서 찾은 관련 내용]:\n{doc_retrieval.format_chunks(hits)}"
+                with st.chat_message("user"):
+                    st.caption(f"🔎 첨부 문서에서 관련 내용 {len(hits)}개를 찾아 함께 보냅니다.")
 
         with st.chat_message("user"):
             st.write(prompt)
@@ -271,35 +398,93 @@ with tab_chat:
         except Exception as e:
             print(f"메시지 저장 실패: {str(e)}")
 
-        try:
-            with st.spinner("분석 중입니다... 잠시만 기다려주세요..."):
-                persona = st.session_state.get("current_persona", "general")
-                msg = chat_service.get_ai_response(client, st.session_state["messages"], persona=persona)
-        except Exception as e:
-            st.error(f"AI 응답 생성 실패: {str(e)}")
-            st.stop()
-        
-        st.session_state["messages"].append({"role": "assistant", "content": msg})
-        with st.chat_message("assistant"):
-            st.write(msg)
-            
-            persona_labels = {
-                "general": "🧥 일반 컨설턴트",
-                "vc": "🦅 냉철한 VC",
-                "marketer": "📣 마케팅 전문가"
-            }
-            current_persona = st.session_state.get("current_persona", "general")
-            st.caption(f"Momentary Analysis by {persona_labels.get(current_persona, 'AI')}")
+        persona = st.session_state.get("current_persona", "general")
+        context_messages = build_conversation_context(client)
+        # 프롬프트에 지역/성별/연령 타겟이 있으면 실제 인구 통계로 TAM/SAM 을 계산해 넣는다
+        grounding = census_index.grounding_for_messages(st.session_state["messages"])
+        chunks = []
+        completed = False
+
+        def collect_stream(stream):
+            for delta in stream:
+                chunks.append(delta)
+                yield delta
 
         try:
-            db_service.log_chat_message(chat_collection, "assistant", msg, user_data, st.session_state["session_id"])
-        except Exception as e:
-            print(f"AI 응답 저장 실패: {str(e)}")
+            with st.chat_message("assistant"):
+                try:
+                    st.write_stream(collect_stream(
+                        chat_service.stream_ai_response(client, context_messages, persona=persona, grounding=grounding)
+                    ))
+                    completed = True
+                except Exception as e:
+                    if not chunks:
+                        st.error(f"AI 응답 생성 실패: {str(e)}")
+                        st.stop()
+                    st.warning(f"응답이 중간에 끊겼습니다: {str(e)}")
+
+                persona_labels = {
+                    "general": "🧥 일반 컨설턴트",
+                    "vc": "🦅 냉철한 VC",
+                    "marketer": "📣 마케팅 전문가"
+                }
+                current_persona = st.session_state.get("current_persona", "general")
+                st.caption(f"Momentary Analysis by {persona_labels.get(current_persona, 'AI')}")
+        finally:
+            # 스트림이 끊기거나 리런으로 중단돼도 받은 만큼은 저장한다 (partial 표시)
+            if chunks:
+                msg = "".join(chunks)
+                st.session_state["messages"].append({"role": "assistant", "content": msg})
+                try:
+                    db_service.log_chat_message(chat_collection, "assistant", msg, user_data, st.session_state["session_id"], partial=not completed)
+                except Exception as e:
+                    print(f"AI 응답 저장 실패: {str(e)}")
 
 # BMC 및 진단 탭 내용
-with tab_bmc:
+with tab_bmc, profiler.span("tab.bmc"):
     st.markdown("### 📊 스타트업 진단 및 모델링")
     st.markdown("AI가 당신의 사업 아이템을 **5가지 핵심 지표**로 분석하고, **비즈니스 모델 캔버스**를 그려줍니다.")
+    cache_stats = result_cache.stats()
+    st.caption(f"⚡ 결과 캐시: 히트 {cache_stats['memory_hits'] + cache_stats['mongo_hits']}회 (메모리 {cache_stats['memory_hits']} / DB {cache_stats['mongo_hits']}) · 미스 {cache_stats['misses']}회")
+
+    bmc_rendered = False
+    if st.button("⚡ 전체 진단 한번에 실행 (차트 · BMC · 자문단)", key="run_all_diagnostics_btn", use_container_width=True):
+        if not openai_api_key:
+            st.info("Please add your OpenAI API key to continue.")
+        elif not st.session_state["messages"] or len(st.session_state["messages"]) < 2:
+            st.warning("⚠️ 먼저 채팅으로 아이템에 대해 충분히 이야기를 나누어 주세요.")
+        else:
+            client = llm_client.get_client(openai_api_key)
+            context_messages = build_conversation_context(client)
+            labels = {"ratings": "🩺 진단 차트", "bmc": "📋 BMC", "panel": "👥 자문단 회의"}
+            slots = {name: st.empty() for name in labels}
+            for name, slot in slots.items():
+                slot.info(f"⏳ {labels[name]} 생성 중...")
+
+            # 끝나는 순서대로 바로 그린다
+            grounding = segment_sizing.grounding_for_messages(st.session_state["messages"])
+            for name, data, error in chat_service.run_all_diagnostics(client, context_messages, grounding=grounding):
+                slot = slots[name]
+                if error is None and not isinstance(data, dict):
+                    error = ValueError("JSON 객체가 아닌 응답입니다.")
+                if error is not None:
+                    slot.error(f"{labels[name]} 생성 실패: {str(error)}")
+                    continue
+                with slot.container():
+                    if name == "ratings":
+                        st.session_state["ratings_data"] = data
+                        st.markdown(f"#### {labels[name]}")
+                        ui_components.render_radar_chart(data)
+                        st.info(f"**총평**: {data.get('comment', '')}")
+                    elif name == "bmc":
+                        st.session_state["bmc_data"] = data
+                        render_bmc_result(data)
+                        bmc_rendered = True
+                    elif name == "panel":
+                        st.session_state["panel_data"] = data.get("discussion", [])
+                        with st.expander(f"{labels[name]} 결과 보기 ('가상 자문단 회의' 탭에도 저장됨)"):
+                            ui_components.render_panel_discussion(st.session_state["panel_data"])
+        st.markdown("---")
 
     col1, col2 = st.columns(2)
     
@@ -309,23 +494,19 @@ with tab_bmc:
              if not st.session_state["messages"] or len(st.session_state["messages"]) < 2:
                 st.warning("⚠️ 먼저 채팅으로 아이템에 대해 충분히 이야기를 나누어 주세요.")
              else:
-                client = OpenAI(api_key=openai_api_key)
+                client = llm_client.get_client(openai_api_key)
                 try:
                     with st.spinner("5가지 핵심 지표를 분석 중입니다..."):
-                        ratings_json = chat_service.analyze_ratings(client, st.session_state["messages"])
+                        ratings_json = chat_service.analyze_ratings(
+                            client, build_conversation_context(client),
+                            grounding=segment_sizing.grounding_for_messages(st.session_state["messages"])
+                        )
                         
                         # 디버깅: 원본 데이터 확인
                         with st.expander("🔍 진단 결과 JSON 데이터 확인 (디버깅용)"):
                             st.code(ratings_json, language="json")
 
-                        # JSON 전처리
-                        if ratings_json.startswith("```json"):
-                            ratings_json = ratings_json.replace("```json", "").replace("```", "")
-                        elif ratings_json.startswith("```"):
-                            ratings_json = ratings_json.replace("```", "")
-                        
-                        import json
-                        scores = json.loads(ratings_json)
+                        scores = chat_service.parse_json_response(ratings_json)
                     
                     st.success("진단 완료!")
                     # 차트 렌더링
@@ -345,20 +526,17 @@ with tab_bmc:
             elif not st.session_state["messages"] or len(st.session_state["messages"]) < 2:
                 st.warning("⚠️ 먼저 채팅으로 아이템에 대해 충분히 이야기를 나누어 주세요.")
             else:
-                client = OpenAI(api_key=openai_api_key)
+                client = llm_client.get_client(openai_api_key)
                 try:
                     with st.spinner("비즈니스 캔버스를 그리는 중..."):
-                        bmc_json_str = chat_service.generate_bmc(client, st.session_state["messages"])
-                        
-                        if bmc_json_str.startswith("```json"):
-                            bmc_json_str = bmc_json_str.replace("```json", "").replace("```", "")
-                        elif bmc_json_str.startswith("```"):
-                            bmc_json_str = bmc_json_str.replace("```", "")
-                        
-                        import json
                         try:
-                            bmc_data = json.loads(bmc_json_str)
-                        except json.JSONDecodeError:
+                            # JSON 이 아닌 응답은 generate_bmc 에서 이미 ValueError 로 걸러진다
+                            bmc_json_str = chat_service.generate_bmc(
+                                client, build_conversation_context(client),
+                                grounding=segment_sizing.grounding_for_messages(st.session_state["messages"])
+                            )
+                            bmc_data = chat_service.parse_json_response(bmc_json_str)
+                        except ValueError:
                             st.error("데이터 파싱 실패. 다시 시도해주세요.")
                             st.stop()
                     
@@ -368,64 +546,29 @@ with tab_bmc:
                 except Exception as e:
                     st.error(f"오류 발생: {str(e)}")
 
-    # BMC 결과가 있으면 하단에 표시 (버튼 클릭 후에도 유지되도록 세션 활용하면 좋지만 일단 직접 렌더링)
-    # 위 코드에서 bmc_data는 지역변수라 사라짐. 세션에 저장하는게 좋음.
-    # 간단히 구현하기 위해 바로 렌더링하도록 함. (다만 컬럼 밖으로 빼기 위해 로직 조정 필요)
-    
-    # 여기서는 간단히 버튼 누른 직후에만 표시 (Streamlit 특성상 리런되면 사라짐, 세션 저장 권장)
-    # 일단 직관성을 위해 col2 안이 아닌 아래 넓은 영역에 표시
-    
-    if "bmc_data" in st.session_state:
+    # BMC 결과가 있으면 하단에 표시 (전체 진단에서 이미 그렸으면 생략)
+    if "bmc_data" in st.session_state and not bmc_rendered:
         st.markdown("---")
-        st.markdown("#### 🏗️ 비즈니스 모델 캔버스 결과")
-        ui_components.render_bmc_visual(st.session_state["bmc_data"])
-        
-        # 다운로드 버튼 (Markdown)
-        bmc_data = st.session_state["bmc_data"]
-        markdown_content = f"""
-# Business Model Canvas
-
-| 구분 | 내용 |
-|---|---|
-| 🤝 핵심 파트너 | {bmc_data.get('key_partners')} |
-| 🔑 핵심 활동 | {bmc_data.get('key_activities')} |
-| 💎 핵심 자원 | {bmc_data.get('key_resources')} |
-| 🎁 가치 제안 | {bmc_data.get('value_propositions')} |
-| 🗣️ 고객 관계 | {bmc_data.get('customer_relationships')} |
-| 🚚 채널 | {bmc_data.get('channels')} |
-| 👥 고객 세그먼트 | {bmc_data.get('customer_segments')} |
-| 💰 비용 구조 | {bmc_data.get('cost_structure')} |
-| 💵 수익원 | {bmc_data.get('revenue_streams')} |
-"""
-        st.download_button(
-            label="📥 Markdown 다운로드",
-            data=markdown_content,
-            file_name=f"BMC_{st.session_state.get('guest_id', 'user')}.md",
-            mime="text/markdown",
-            use_container_width=True
-        )
+        render_bmc_result(st.session_state["bmc_data"])
 
 # 가상 자문단 탭 내용
-with tab_panel:
+with tab_panel, profiler.span("tab.panel"):
     st.markdown("### 👥 가상 자문단 회의 (Virtual Advisory Board)")
     st.markdown("내 창업 아이템을 두고 **VC(투자자)**, **마케터**, **CTO(기술책임자)**가 벌이는 **끝장 토론**을 엿보세요.")
     
+    panel_rendered = False
     if st.button("🔥 자문단 회의 소집하기", key="start_panel_btn", type="primary", use_container_width=True):
         if not st.session_state["messages"] or len(st.session_state["messages"]) < 2:
             st.warning("⚠️ 먼저 채팅으로 아이템에 대해 충분히 이야기를 나누어 주세요.")
         else:
-            client = OpenAI(api_key=openai_api_key)
+            client = llm_client.get_client(openai_api_key)
             try:
                 with st.spinner("전문가들을 소집하고 있습니다... (약 10~20초 소요)"):
-                    panel_json_str = chat_service.generate_panel_discussion(client, st.session_state["messages"])
-                    
-                    if panel_json_str.startswith("```json"):
-                        panel_json_str = panel_json_str.replace("```json", "").replace("```", "")
-                    elif panel_json_str.startswith("```"):
-                        panel_json_str = panel_json_str.replace("```", "")
-                    
-                    import json
-                    panel_data_obj = json.loads(panel_json_str)
+                    panel_json_str = chat_service.generate_panel_discussion(
+                        client, build_conversation_context(client),
+                        grounding=segment_sizing.grounding_for_messages(st.session_state["messages"])
+                    )
+                    panel_data_obj = chat_service.parse_json_response(panel_json_str)
                     # "discussion" 키 유무 확인 (프롬프트에 따라 최상위 리스트일수도, 객체일수도 있음. 프롬프트는 객체로 수정함)
                     discussion_list = panel_data_obj.get("discussion", [])
                 
@@ -433,7 +576,20 @@ with tab_panel:
                 st.markdown("---")
                 
                 # 렌더링
+                st.session_state["panel_data"] = discussion_list
                 ui_components.render_panel_discussion(discussion_list)
+                panel_rendered = True
                 
             except Exception as e:
                 st.error(f"회의 생성 중 오류 발생: {str(e)}")
+
+    # 전체 진단 등으로 이미 만들어진 회의록이 있으면 표시
+    if "panel_data" in st.session_state and not panel_rendered:
+        st.markdown("---")
+        ui_components.render_panel_discussion(st.session_state["panel_data"])
+
+# 리런 기록 마무리 (PROFILER_DEBUG_PANEL=1 일 때만 패널 표시. 패널에는 프로세스 전체 통계가 보이므로
+# 방문자가 URL 로 켤 수 없게 한다)
+rerun_profile = profiler.end_rerun()
+if os.getenv("PROFILER_DEBUG_PANEL") == "1":
+    ui_components.render_profiler_panel(rerun_profile, profiler.summary(), profiler.to_prometheus(), profiler.to_json())
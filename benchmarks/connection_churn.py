@@ -0,0 +1,71 @@
+# Streamlit 리런을 흉내 내어 MongoDB 커넥션 churn을 측정한다.
+#
+#   python benchmarks/connection_churn.py --reruns 200
+#   python benchmarks/connection_churn.py --reruns 200 --uri mongodb://localhost:27017 --no-tls
+#
+# legacy: 리런마다 새 MongoClient 생성 (기존 app.py 동작)
+# pooled: mongo_utils.get_mongo_client() 싱글톤 재사용
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_schema
+import mongo_utils
+
+def simulate_rerun(client):
+    # app.py 한 번의 리런에서 발생하는 대표 쿼리 (사이드바 세션 목록)
+    collection = chat_schema.sessions(client[mongo_utils.MONGO_DB_NAME]["chat_messages"])
+    list(collection.find({"email": "bench@example.com"}).sort("updated_at", -1).limit(20))
+
+def run(mode, reruns, overrides):
+    mongo_utils.churn_listener.reset()
+    clients_before = mongo_utils.get_pool_stats()["clients_created"]
+    started = time.perf_counter()
+
+    for _ in range(reruns):
+        if mode == "legacy":
+            client = mongo_utils.create_mongo_client(**overrides)
+            simulate_rerun(client)
+            client.close()
+        else:
+            if mongo_utils._client is None:
+                mongo_utils._client = mongo_utils.create_mongo_client(**overrides)
+            simulate_rerun(mongo_utils.get_mongo_client())
+
+    elapsed = time.perf_counter() - started
+    stats = mongo_utils.get_pool_stats()
+    stats["clients_created"] -= clients_before
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["ms_per_rerun"] = round(elapsed * 1000 / reruns, 2)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="MongoDB connection churn benchmark")
+    parser.add_argument("--reruns", type=int, default=100)
+    parser.add_argument("--uri", default=None, help="기본값: MONGO_URI 환경변수")
+    parser.add_argument("--no-tls", action="store_true", help="로컬 mongod 처럼 TLS가 없는 서버용")
+    parser.add_argument("--mode", choices=["legacy", "pooled", "both"], default="both")
+    args = parser.parse_args()
+
+    if args.uri:
+        mongo_utils.mongo_uri = args.uri
+    if not mongo_utils.mongo_uri:
+        parser.error("MONGO_URI 환경변수 또는 --uri 가 필요합니다.")
+
+    overrides = {}
+    if args.no_tls:
+        overrides = {"tls": False, "tlsAllowInvalidCertificates": None, "tlsCAFile": None}
+
+    modes = ["legacy", "pooled"] if args.mode == "both" else [args.mode]
+    print(f"{'mode':<8} {'clients':>8} {'pools':>6} {'conn_created':>13} {'conn_closed':>12} {'ms/rerun':>9}")
+    for mode in modes:
+        stats = run(mode, args.reruns, overrides)
+        print(f"{mode:<8} {stats['clients_created']:>8} {stats['pools_created']:>6} "
+              f"{stats['connections_created']:>13} {stats['connections_closed']:>12} {stats['ms_per_rerun']:>9}")
+    mongo_utils.close_mongo_client()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+# db_service 마이크로 벤치마크 (합성 대용량 데이터셋)
+#
+#   python benchmarks/db_bench.py                                   # 기본 규모 (2천 명 / 2만 세션 / 40만 메시지)
+#   python benchmarks/db_bench.py --users 100000 --sessions 1000000 --messages 20000000
+#   python benchmarks/db_bench.py --uri mongodb://localhost:27017 --reload --output db_bench.json
+#
+# 로컬 mongod 의 별도 DB(--db)에 데이터를 한 번 적재하고, 같은 설정이면 다음 실행에서 재사용한다.
+# 함수별로 무작위 사용자/세션을 골라 반복 호출해 지연 분포(p50/p90/p95/p99)를 재고,
+# db_indexes.explain_query 로 실제 값에 대한 winning plan 과 검사한 키/문서 수를 함께 기록한다.
+# delete_chat_session 은 적재된 데이터셋을 건드리지 않도록 매번 새로 만든 세션을 지운다.
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import random
+import secrets
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson.objectid import ObjectId
+from pymongo import MongoClient
+
+import chat_schema
+import db_indexes
+import db_service
+
+INSERT_BATCH = 10000
+ROLES = ["user", "assistant"]
+WORDS = ["창업", "시장", "고객", "수익", "모델", "경쟁", "전략", "마케팅", "투자", "서비스",
+         "startup", "market", "pricing", "growth", "team", "app", "cafe", "subscription"]
+
+def _text(rng, chars):
+    words = []
+    length = 0
+    while length < chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+def _email(user):
+    return f"user{user}@bench.test"
+
+def _session_counts(rng, sessions, messages):
+    # 세션별 메시지 수는 지수분포 (짧은 대화가 많고 긴 대화가 조금), 합계는 messages 에 맞춘다
+    average = messages / sessions
+    counts = [max(1, int(rng.expovariate(1 / average))) for _ in range(sessions)]
+    scale = messages / sum(counts)
+    counts = [max(1, round(count * scale)) for count in counts]
+    counts[-1] = max(1, counts[-1] + messages - sum(counts))
+    return counts
+
+def generate(chat_collection, login_collection, config):
+    # chat_schema 레이아웃으로 바로 적재한다 (세션 / 세션별 메시지 버킷 / 로그인 토큰)
+    sessions_collection = chat_schema.sessions(chat_collection)
+    buckets_collection = chat_schema.message_buckets(chat_collection)
+    tokens_collection = chat_schema.login_tokens(login_collection)
+    bucket_size = config["bucket_size"]
+    rng = random.Random(config["seed"])
+    users, sessions = config["users"], config["sessions"]
+    counts = _session_counts(rng, sessions, config["messages"])
+    started = datetime(2025, 1, 1)
+    samples = {"sessions": [], "emails": [], "tokens": []}
+    session_buffer = []
+    bucket_buffer = []
+    loaded = 0
+
+    def flush(force=False):
+        nonlocal loaded
+        if session_buffer and (force or len(session_buffer) >= INSERT_BATCH):
+            sessions_collection.insert_many(session_buffer, ordered=False)
+            session_buffer.clear()
+        if bucket_buffer and (force or len(bucket_buffer) * bucket_size >= INSERT_BATCH):
+            buckets_collection.insert_many(bucket_buffer, ordered=False)
+            loaded += sum(bucket["count"] for bucket in bucket_buffer)
+            bucket_buffer.clear()
+            print(f"\r메시지 적재 {loaded:,}/{config['messages']:,}", end="", flush=True)
+
+    for index, count in enumerate(counts):
+        # 사용자별 세션 수가 고르지 않도록 앞쪽 사용자에 몰리게 배정
+        user = int(users * rng.random() ** 2)
+        created_at = started + timedelta(minutes=rng.randrange(0, 60 * 24 * 300))
+        session_id = ObjectId()
+        timestamp = created_at
+        docs = []
+        for i in range(count):
+            timestamp += timedelta(seconds=rng.randint(5, 300))
+            docs.append({"role": ROLES[i % 2], "content": _text(rng, config["message_chars"]), "timestamp": timestamp})
+        for start in range(0, count, bucket_size):
+            bucket_buffer.append(chat_schema.new_bucket(
+                str(session_id), _email(user), f"사용자{user}", docs[start:start + bucket_size], start + bucket_size >= count
+            ))
+        session_buffer.append({
+            "_id": session_id,
+            "email": _email(user),
+            "title": f"대화 {index}",
+            "created_at": created_at,
+            "updated_at": timestamp,
+        })
+        # 벤치마크 대상 표본 (reservoir sampling)
+        if len(samples["sessions"]) < config["sample_size"]:
+            samples["sessions"].append(str(session_id))
+        else:
+            j = rng.randrange(index + 1)
+            if j < config["sample_size"]:
+                samples["sessions"][j] = str(session_id)
+        flush()
+    flush(force=True)
+    print()
+
+    tokens = []
+    expires_at = datetime.now() + timedelta(days=365)
+    for user in range(users):
+        token = secrets.token_urlsafe(32)
+        tokens.append({
+            "token": token, "email": _email(user), "name": f"사용자{user}",
+            "created_at": datetime.now(), "expires_at": expires_at
+        })
+        if len(samples["tokens"]) < config["sample_size"]:
+            samples["tokens"].append(token)
+        if len(tokens) >= INSERT_BATCH:
+            tokens_collection.insert_many(tokens, ordered=False)
+            tokens = []
+    if tokens:
+        tokens_collection.insert_many(tokens, ordered=False)
+
+    samples["emails"] = [_email(int(users * rng.random() ** 2)) for _ in range(config["sample_size"])]
+    return samples
+
+def load_dataset(database, config, reload=False):
+    meta = database["bench_meta"].find_one({"_id": "dataset"})
+    if meta and meta["config"] == config and not reload:
+        print(f"기존 데이터셋 재사용 ({database.name})")
+        return meta["samples"]
+
+    print(f"데이터셋 생성: {config['users']:,} users / {config['sessions']:,} sessions / {config['messages']:,} messages")
+    for name in ("chat_messages", "login_logs", "bench_meta", chat_schema.SESSIONS_COLLECTION,
+                 chat_schema.MESSAGE_BUCKETS_COLLECTION, chat_schema.LOGIN_TOKENS_COLLECTION):
+        database.drop_collection(name)
+    started = time.perf_counter()
+    samples = generate(database["chat_messages"], database["login_logs"], config)
+    print(f"적재 {time.perf_counter() - started:.1f}s, 인덱스 생성 중...")
+    db_indexes.ensure_indexes(database["login_logs"], database["chat_messages"])
+    database["bench_meta"].insert_one({"_id": "dataset", "config": config, "samples": samples})
+    return samples
+
+def distribution(samples):
+    ordered = sorted(samples)
+
+    def quantile(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "p50_ms": quantile(0.5),
+        "p90_ms": quantile(0.9),
+        "p95_ms": quantile(0.95),
+        "p99_ms": quantile(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+def measure(function, iterations, warmup):
+    for _ in range(warmup):
+        function()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return distribution(samples)
+
+def query_plan(collection, name, value):
+    # db_indexes.HOT_QUERIES 의 쿼리 모양에 실제 표본 값을 넣어 explain 한다
+    for query_name, query_filter, sort, expected_index, _ in db_indexes.HOT_QUERIES:
+        if query_name != name:
+            continue
+        query_filter = dict(query_filter)
+        for key in ("email", "session_id", "token"):
+            if key in query_filter:
+                query_filter[key] = value
+        plan = db_indexes.explain_query(collection, query_filter, sort)
+        cursor = collection.find(query_filter)
+        if sort:
+            cursor = cursor.sort(sort)
+        stats = cursor.limit(20).explain().get("executionStats", {})
+        return {
+            "stages": plan["stages"],
+            "indexes": plan["indexes"],
+            "expected_index": expected_index,
+            "keys_examined": stats.get("totalKeysExamined"),
+            "docs_examined": stats.get("totalDocsExamined"),
+            "winning_plan": plan["winning_plan"],
+        }
+    return None
+
+def run(database, samples, args):
+    chat = database["chat_messages"]
+    login = database["login_logs"]
+    buckets = chat_schema.message_buckets(chat)
+    sessions = chat_schema.sessions(chat)
+    tokens = chat_schema.login_tokens(login)
+    rng = random.Random(args.seed)
+    user_info = {"email": "writer@bench.test", "name": "벤치마크"}
+    results = {}
+
+    def cold_sessions():
+        # 세션 목록 캐시를 비워 매번 Mongo 를 조회하게 한다
+        email = rng.choice(samples["emails"])
+        db_service.invalidate_user_sessions(user_email=email)
+        db_service.get_user_sessions(chat, email)
+
+    benches = [
+        ("get_user_sessions", cold_sessions, ("get_user_sessions", sessions, samples["emails"])),
+        ("get_user_sessions (cached)", lambda: db_service.get_user_sessions(chat, samples["emails"][0]), None),
+        ("get_session_messages", lambda: db_service.get_session_messages(chat, rng.choice(samples["sessions"])),
+         ("get_session_messages", buckets, samples["sessions"])),
+        ("get_session_messages_page", lambda: db_service.get_session_messages_page(chat, rng.choice(samples["sessions"])),
+         ("get_session_messages_page", buckets, samples["sessions"])),
+        ("get_chat_history", lambda: db_service.get_chat_history(chat, rng.choice(samples["emails"])),
+         ("get_chat_history", buckets, samples["emails"])),
+        ("validate_login_token", lambda: db_service.validate_login_token(login, rng.choice(samples["tokens"])),
+         ("validate_login_token", tokens, samples["tokens"])),
+    ]
+    for name, function, plan_target in benches:
+        if args.only and name.split(" ")[0] not in args.only:
+            continue
+        results[name] = measure(function, args.iterations, args.warmup)
+        if plan_target:
+            query_name, collection, values = plan_target
+            results[name]["plan"] = query_plan(collection, query_name, values[0])
+
+    if not args.only or "log_chat_message" in args.only:
+        session_id = db_service.create_chat_session(chat, user_info["email"], "벤치마크 쓰기")
+        content = _text(rng, args.message_chars)
+        # 호출 자체(큐 적재)와 큐가 실제로 Mongo 에 반영되는 시간을 따로 잰다
+        results["log_chat_message"] = measure(
+            lambda: db_service.log_chat_message(chat, "user", content, user_info, session_id),
+            args.iterations, args.warmup
+        )
+        flushes = []
+        for _ in range(max(1, args.iterations // args.write_batch)):
+            for _ in range(args.write_batch):
+                db_service.log_chat_message(chat, "assistant", content, user_info, session_id)
+            started = time.perf_counter()
+            db_service.flush_pending_writes()
+            flushes.append(time.perf_counter() - started)
+        results[f"log_chat_message (flush x{args.write_batch})"] = distribution(flushes)
+        db_service.delete_chat_session(chat, session_id)
+
+    if not args.only or "delete_chat_session" in args.only:
+        average = max(1, args.messages // args.sessions)
+        created = []
+        for _ in range(args.iterations):
+            session_id = db_service.create_chat_session(chat, user_info["email"], "삭제 대상")
+            now = datetime.now()
+            docs = [{"role": ROLES[i % 2], "content": _text(rng, args.message_chars), "timestamp": now + timedelta(seconds=i)}
+                    for i in range(average)]
+            buckets.insert_many([
+                chat_schema.new_bucket(session_id, user_info["email"], user_info["name"],
+                                       docs[start:start + args.bucket_size], start + args.bucket_size >= average)
+                for start in range(0, average, args.bucket_size)
+            ])
+            created.append(session_id)
+        results["delete_chat_session"] = measure(lambda: db_service.delete_chat_session(chat, created.pop()), len(created), 0)
+        results["delete_chat_session"]["messages_per_session"] = average
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="db_service micro-benchmark on a synthetic dataset")
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="로컬 mongod 주소")
+    parser.add_argument("--db", default="chat_db_bench", help="벤치마크 전용 DB 이름 (앱 DB 와 분리)")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=400000)
+    parser.add_argument("--message-chars", type=int, default=200, help="메시지 평균 길이")
+    parser.add_argument("--bucket-size", type=int, default=chat_schema.CHAT_BUCKET_SIZE, help="버킷 하나에 담을 메시지 수")
+    parser.add_argument("--sample-size", type=int, default=1000, help="조회 대상으로 뽑아 둘 세션/사용자 수")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--reload", action="store_true", help="같은 설정이어도 데이터셋을 다시 만든다")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--write-batch", type=int, default=50, help="flush 측정 시 한 번에 쌓을 메시지 수")
+    parser.add_argument("--only", nargs="*", help="일부 함수만 측정 (예: get_session_messages log_chat_message)")
+    parser.add_argument("--output", default=None, help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+    if args.sessions > args.messages:
+        parser.error("--messages 는 --sessions 이상이어야 합니다.")
+
+    client = MongoClient(args.uri)
+    database = client[args.db]
+    config = {
+        "users": args.users, "sessions": args.sessions, "messages": args.messages,
+        "message_chars": args.message_chars, "bucket_size": args.bucket_size, "sample_size": args.sample_size, "seed": args.seed,
+    }
+    samples = load_dataset(database, config, args.reload)
+    results = run(database, samples, args)
+
+    print(f"\n{'function':<34} {'n':>5} {'p50':>9} {'p90':>9} {'p95':>9} {'p99':>9} {'max':>9}  plan")
+    for name, stats in results.items():
+        plan = stats.get("plan")
+        plan_text = f"{'>'.join(plan['stages'])} {plan['indexes']} keys={plan['keys_examined']} docs={plan['docs_examined']}" if plan else ""
+        print(f"{name:<34} {stats['count']:>5} {stats['p50_ms']:>9} {stats['p90_ms']:>9} "
+              f"{stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['max_ms']:>9}  {plan_text}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"dataset": config, "results": results}, f, ensure_ascii=False, indent=2, default=str)
+            f.write("\n")
+        print(f"결과 저장: {args.output}")
+    db_service.flush_pending_writes()
+    client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# 부하 테스트용 가짜 OpenAI 호환 서버 (POST /v1/chat/completions)
+#
+#   python benchmarks/fake_openai_server.py --port 8765 --latency-ms 300 --tokens-per-second 80
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+#
+# - stream=True 이면 SSE 로 토큰 단위 조각을 tokens-per-second 속도로 보낸다
+# - response_format=json_object 이면 시스템 프롬프트를 보고 BMC/진단/자문단용 JSON 을 돌려준다
+# - --error-rate 비율만큼 429(Retry-After 포함)를 돌려줘 재시도 경로도 시험할 수 있다
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+
+CANNED_JSON = {
+    "bmc": {
+        "key_partners": "지역 카페, 결제 대행사",
+        "key_activities": "앱 개발, 제휴 영업",
+        "key_resources": "개발팀, 제휴 매장 네트워크",
+        "value_propositions": "동네 단골 혜택을 한 앱에서",
+        "customer_relationships": "포인트 적립, 푸시 알림",
+        "channels": "앱스토어, SNS 광고",
+        "customer_segments": "서울 20~39세 직장인",
+        "cost_structure": "개발비, 마케팅비, 서버비",
+        "revenue_streams": "매장 수수료, 프리미엄 구독"
+    },
+    "ratings": {
+        "marketability": 78,
+        "profitability": 64,
+        "innovation": 71,
+        "feasibility": 83,
+        "growth_potential": 69,
+        "comment": "시장성은 충분하나 수익 모델 검증이 필요합니다."
+    },
+    "panel": {
+        "discussion": [
+            {"speaker": "VC", "message": "수수료만으로 CAC 를 회수할 수 있나요?"},
+            {"speaker": "Marketer", "message": "동네 커뮤니티 바이럴이면 CAC 를 크게 낮출 수 있어요."},
+            {"speaker": "CTO", "message": "POS 연동이 가장 큰 기술 리스크입니다."},
+            {"speaker": "Moderator", "message": "초기 제휴 지역을 좁혀 검증하는 것이 좋겠습니다."}
+        ]
+    },
+}
+FILLER = ("창업 아이템의 타겟 고객과 시장 규모를 보면 초기 진입 전략이 중요합니다. "
+          "경쟁사 대비 차별점을 명확히 하고 작은 지역에서 검증한 뒤 확장하는 것을 권합니다. ")
+
+class Config:
+    def __init__(self, latency_ms=200.0, tokens_per_second=100.0, response_tokens=120, error_rate=0.0, retry_after=0.2):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+def _canned_kind(messages):
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system" and isinstance(m.get("content"), str))
+    if "비즈니스 모델 캔버스" in system:
+        return "bmc"
+    if "marketability" in system:
+        return "ratings"
+    if "자문단" in system:
+        return "panel"
+    return None
+
+def _text_tokens(count):
+    # 글자 2개를 한 토큰으로 흉내 낸다
+    text = (FILLER * (count // len(FILLER) + 2))[:count * 2]
+    return [text[i:i + 2] for i in range(0, len(text), 2)]
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        config = self.config
+        with config.lock:
+            config.requests += 1
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+        if config.error_rate and random.random() < config.error_rate:
+            with config.lock:
+                config.errors += 1
+            self._send_json(429, {"error": {"message": "rate limited (fake)", "type": "rate_limit_error"}},
+                            headers={"Retry-After": str(config.retry_after)})
+            return
+
+        time.sleep(config.latency_ms / 1000)
+        model = request.get("model", "gpt-4o")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        kind = _canned_kind(request.get("messages", []))
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            text = json.dumps(CANNED_JSON.get(kind, {}), ensure_ascii=False)
+            tokens = [text[i:i + 4] for i in range(0, len(text), 4)]
+        else:
+            tokens = _text_tokens(config.response_tokens)
+        delay = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+
+        if request.get("stream"):
+            self._stream(completion_id, model, tokens, delay)
+            return
+
+        time.sleep(delay * len(tokens))
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)}
+        })
+
+    def _stream(self, completion_id, model, tokens, delay):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(delta, finish_reason=None):
+            return json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }, ensure_ascii=False)
+
+        try:
+            send(chunk({"role": "assistant", "content": ""}))
+            for token in tokens:
+                time.sleep(delay)
+                send(chunk({"content": token}))
+            send(chunk({}, "stop"))
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 스트림을 중간에 닫은 경우
+            pass
+
+def start_server(host="127.0.0.1", port=0, **config):
+    """백그라운드 스레드에서 서버를 띄우고 (server, base_url) 을 돌려준다. port=0 이면 빈 포트 사용."""
+    handler = type("FakeOpenAIHandler", (Handler,), {"config": Config(**config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description="fake OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="첫 토큰까지의 지연")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--response-tokens", type=int, default=120, help="일반 답변 길이(토큰)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429 를 돌려줄 비율 (0~1)")
+    args = parser.parse_args()
+
+    handler = type("FakeOpenAIHandler", (Handler,), {"config": Config(
+        args.latency_ms, args.tokens_per_second, args.response_tokens, args.error_rate
+    )})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    print(f"fake OpenAI server: http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
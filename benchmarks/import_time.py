@@ -0,0 +1,127 @@
+# 앱 모듈 import 시간 측정 및 회귀 검사
+#
+#   python benchmarks/import_time.py                    # 측정 후 기준값과 비교 (회귀 시 exit 1)
+#   python benchmarks/import_time.py --update-baseline  # 현재 측정값을 기준값으로 저장
+#
+# 모듈마다 새 프로세스에서 import 해서 시간을 재고, 무거운 의존성(pandas, openai 등)이
+# 딸려 들어왔는지도 기록한다. "app (top-level)" 은 app.py 최상단 import 전체를 한 번에 잰 값이다.
+# 기준값은 측정한 머신 속도에 묶이므로, 표준 라이브러리 참조 import 를 같이 재서
+# 지금 머신이 기준값을 만든 머신보다 느리거나 빠른 만큼 허용치를 늘리거나 줄인다.
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_time_baseline.json")
+MODULES = [
+    "ui_components", "chat_service", "db_service", "mongo_utils", "auth_service",
+    "census_index", "segment_sizing", "pdf_extractor", "upload_cache", "doc_retrieval",
+    "llm_client", "warmup", "data_profiler",
+]
+# 머신 속도 보정용 참조 import (앱 코드와 무관하고 버전 간 변화가 적은 표준 라이브러리)
+REFERENCE = "(reference)"
+REFERENCE_IMPORTS = ["import asyncio", "import email.parser", "import http.client"]
+# 최상단에서 import 되면 안 되는 무거운 패키지
+HEAVY = ["pandas", "numpy", "matplotlib", "openai", "pypdf", "pyarrow", "PIL"]
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+{imports}
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({{"ms": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def app_top_level_imports():
+    # app.py 의 모듈 최상단 import 문만 (함수/블록 안의 지연 import 는 제외)
+    with open(os.path.join(ROOT, "app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    lines = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            lines.append(ast.unparse(node))
+    return lines
+
+def measure(import_lines, repeat):
+    # 파일 캐시 영향을 줄이려고 여러 번 재서 최솟값을 쓴다
+    code = PROBE.format(root=ROOT, imports="\n".join(import_lines), heavy=HEAVY)
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True, cwd=ROOT).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result["ms"] < best["ms"]:
+            best = result
+    best["ms"] = round(best["ms"], 1)
+    return best
+
+def run(repeat):
+    results = {REFERENCE: measure(REFERENCE_IMPORTS, repeat)}
+    results["app (top-level)"] = measure(app_top_level_imports(), repeat)
+    for module in MODULES:
+        results[module] = measure([f"import {module}"], repeat)
+    return results
+
+def speed_ratio(results, baseline):
+    # 참조 import 가 기준값보다 몇 배 걸렸는지 (기준값에 참조가 없으면 보정하지 않는다)
+    base = baseline.get(REFERENCE)
+    if not base or not base["ms"]:
+        return 1.0
+    return max(results[REFERENCE]["ms"], 0.1) / base["ms"]
+
+def compare(results, baseline, tolerance, slack_ms):
+    regressions = []
+    ratio = speed_ratio(results, baseline)
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or name == REFERENCE:
+            continue
+        limit = base["ms"] * ratio * tolerance + slack_ms
+        if result["ms"] > limit:
+            regressions.append(f"{name}: {result['ms']}ms > {limit:.1f}ms (기준 {base['ms']}ms × 속도 {ratio:.2f})")
+        new_heavy = sorted(set(result["heavy"]) - set(base["heavy"]))
+        if new_heavy:
+            regressions.append(f"{name}: 새로 import 되는 무거운 패키지 {new_heavy}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="import time benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=1.5, help="기준값 대비 허용 배수")
+    parser.add_argument("--slack-ms", type=float, default=50.0, help="기준값에 더하는 허용 오차(ms)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    try:
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+
+    print(f"{'module':<18} {'ms':>8} {'baseline':>9}  heavy")
+    for name, result in results.items():
+        base = baseline.get(name, {}).get("ms", "-")
+        print(f"{name:<18} {result['ms']:>8} {base:>9}  {','.join(result['heavy']) or '-'}")
+    print(f"\n기준값 대비 머신 속도 보정: ×{speed_ratio(results, baseline):.2f}")
+
+    if args.update_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"기준값 저장: {BASELINE_PATH}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance, args.slack_ms)
+    if regressions:
+        print("\n회귀 발견:")
+        for line in regressions:
+            print(f"- {line}")
+        sys.exit(1)
+    print("\n회귀 없음")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+# 오프라인 부하 테스트: 가짜 OpenAI 서버 + 로컬 MongoDB(또는 mongomock)로 여러 사용자 세션을 재생한다.
+#
+#   python benchmarks/load_test.py --users 20 --concurrency 8
+#   python benchmarks/load_test.py --mongo-uri mongodb://localhost:27017 --users 50 --concurrency 16
+#   python benchmarks/load_test.py --save-baseline benchmarks/load_test_baseline.json
+#   python benchmarks/load_test.py --baseline benchmarks/load_test_baseline.json   # 회귀 시 exit 1
+#
+# 사용자 한 명의 시나리오 (app.py 의 흐름을 chat_service / db_service 로 그대로 호출):
+#   로그인 토큰 발급/검증 → 세션 목록 → 새 세션 → 채팅 N 턴(스트리밍) → CSV 첨부 →
+#   BMC → 진단 → 자문단 토론 → 메시지 페이지 조회
+# 가짜 서버는 기본적으로 같은 프로세스에서 띄우고, --base-url 을 주면 외부 서버를 쓴다.
+import argparse
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+QUESTIONS = [
+    "서울 20대 직장인을 위한 동네 카페 구독 앱을 생각하고 있어요.",
+    "경쟁 서비스와 비교했을 때 차별점은 뭘까요?",
+    "초기 고객은 어떻게 모으면 좋을까요?",
+    "수익 모델은 수수료와 구독 중 어떤 게 나을까요?",
+    "첨부한 설문 결과에서 눈에 띄는 점이 있나요?",
+]
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def time(self, name, function, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            self.fail(name)
+            raise
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def fail(self, name):
+        with self._lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def report(self, elapsed):
+        result = {}
+        for name, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+
+            def quantile(q):
+                return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+            result[name] = {
+                "count": len(ordered),
+                "errors": self.errors.get(name, 0),
+                "throughput_per_s": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": quantile(0.5),
+                "p95_ms": quantile(0.95),
+                "p99_ms": quantile(0.99),
+                "max_ms": round(ordered[-1] * 1000, 2),
+            }
+        return result
+
+def patch_mongomock():
+    # mongomock 4.x 는 pymongo 4.11+ 가 bulk_write 에 넘기는 sort 인자를 모른다 (벤치마크 전용 호환 처리)
+    import mongomock.collection
+
+    builder = mongomock.collection.BulkOperationBuilder
+    for name in ("add_update", "add_replace"):
+        original = getattr(builder, name)
+        if "sort" in inspect.signature(original).parameters:
+            continue
+
+        def patched(self, *args, _original=original, sort=None, **kwargs):
+            return _original(self, *args, **kwargs)
+        setattr(builder, name, patched)
+
+def open_collection(mongo_uri):
+    if mongo_uri:
+        import pymongo
+
+        client = pymongo.MongoClient(mongo_uri)
+        import chat_schema
+
+        database = client["load_test"]
+        # 이전 실행의 세션/버킷/토큰이 남아 있으면 조회 비용이 실행마다 달라진다
+        for name in ("chat_messages", chat_schema.SESSIONS_COLLECTION,
+                     chat_schema.MESSAGE_BUCKETS_COLLECTION, chat_schema.LOGIN_TOKENS_COLLECTION):
+            database.drop_collection(name)
+    else:
+        import mongomock
+
+        patch_mongomock()
+        database = mongomock.MongoClient()["load_test"]
+    collection = database["chat_messages"]
+    try:
+        import db_indexes
+        db_indexes.ensure_indexes(collection, collection)
+    except Exception as e:
+        print(f"인덱스 생성 건너뜀: {str(e)}")
+    return collection
+
+def sample_csv(rng, rows=300):
+    lines = ["응답자,나이,성별,지역,월_카페지출,구독_의향,만족도"]
+    regions = ["서울", "경기", "부산", "대구", "인천"]
+    for i in range(rows):
+        lines.append(",".join([
+            f"r{i:04d}", str(rng.randint(18, 59)), rng.choice(["남", "여"]), rng.choice(regions),
+            str(rng.randint(1, 30) * 5000), rng.choice(["예", "아니오", "모름"]), str(rng.randint(1, 5))
+        ]))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def run_user(index, args, collection, recorder):
+    import chat_service
+    import conversation_context
+    import data_profiler
+    import db_service
+    import doc_retrieval
+    import llm_client
+    import segment_sizing
+
+    rng = random.Random(args.seed + index)
+    client = llm_client.get_client("sk-load-test")
+    user_info = {"email": f"user{index}@load.test", "name": f"사용자{index}"}
+
+    token = recorder.time("login.create_token", db_service.create_login_token, collection, user_info)
+    recorder.time("login.validate_token", db_service.validate_login_token, collection, token)
+    recorder.time("db.get_user_sessions", db_service.get_user_sessions, collection, user_info["email"])
+    session_id = recorder.time("db.create_chat_session", db_service.create_chat_session, collection, user_info["email"])
+
+    messages = []
+    state = conversation_context.new_context_state()
+    doc_index = doc_retrieval.DocumentIndex()
+    for turn in range(args.turns):
+        prompt = QUESTIONS[(index + turn) % len(QUESTIONS)]
+        messages.append({"role": "user", "content": prompt})
+        recorder.time("db.log_chat_message", db_service.log_chat_message, collection, "user", prompt, user_info, session_id)
+
+        if turn == args.turns // 2:
+            # 턴 중간에 설문 CSV 를 첨부한다 (app.py 와 같은 프로파일링 + 색인 경로)
+            def attach():
+                data = sample_csv(rng)
+                profile = data_profiler.profile_csv(data)
+                doc_index.add_document("survey.csv", doc_hash=f"survey-{index}", chunks=doc_retrieval.table_chunks(profile["head"]))
+                return data_profiler.format_profile(profile, "survey.csv")
+            summary = recorder.time("file.attach_csv", attach)
+            messages[-1]["content"] = f"{prompt}\n\n[첨부 데이터 요약]\n{summary}"
+        if len(doc_index):
+            hits = recorder.time("file.retrieve", doc_index.search, prompt)
+            if hits:
+                messages[-1]["content"] += f"\n\n[첨부 문서에서 찾은 관련 내용]:\n{doc_retrieval.format_chunks(hits)}"
+
+        started = time.perf_counter()
+        context, _ = conversation_context.build_context(client, messages, state)
+        first_token = None
+        parts = []
+        try:
+            for piece in chat_service.stream_ai_response(client, context):
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    recorder.add("chat.first_token", first_token - started)
+                parts.append(piece)
+        except Exception:
+            recorder.fail("chat.turn")
+            raise
+        recorder.add("chat.turn", time.perf_counter() - started)
+        answer = "".join(parts)
+        messages.append({"role": "assistant", "content": answer})
+        recorder.time("db.log_chat_message", db_service.log_chat_message, collection, "assistant", answer, user_info, session_id)
+
+    grounding = segment_sizing.grounding_for_messages(messages)
+    recorder.time("llm.generate_bmc", chat_service.generate_bmc, client, messages, grounding=grounding)
+    recorder.time("llm.analyze_ratings", chat_service.analyze_ratings, client, messages, grounding=grounding)
+    recorder.time("llm.panel_discussion", chat_service.generate_panel_discussion, client, messages, grounding=grounding)
+    recorder.time("db.get_session_messages_page", db_service.get_session_messages_page, collection, session_id)
+    recorder.time("db.get_user_sessions", db_service.get_user_sessions, collection, user_info["email"])
+
+def run(args):
+    if args.base_url:
+        base_url = args.base_url
+        server = None
+    else:
+        import fake_openai_server
+
+        server, base_url = fake_openai_server.start_server(
+            latency_ms=args.latency_ms, tokens_per_second=args.tokens_per_second,
+            response_tokens=args.response_tokens, error_rate=args.error_rate
+        )
+    os.environ["OPENAI_BASE_URL"] = base_url
+    collection = open_collection(args.mongo_uri)
+
+    import db_service
+    import llm_client
+
+    recorder = Recorder()
+    failures = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(recorder.time, "user.scenario", run_user, i, args, collection, recorder) for i in range(args.users)]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                failures.append(f"{type(e).__name__}: {str(e)}")
+    db_service.flush_pending_writes()
+    elapsed = time.perf_counter() - started
+    if server is not None:
+        server.shutdown()
+
+    return {
+        "config": {
+            "users": args.users, "concurrency": args.concurrency, "turns": args.turns,
+            "mongo": "mongod" if args.mongo_uri else "mongomock",
+            "latency_ms": args.latency_ms, "tokens_per_second": args.tokens_per_second,
+            "response_tokens": args.response_tokens, "error_rate": args.error_rate,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "operations": recorder.report(elapsed),
+        "failures": failures,
+        "llm": llm_client.stats(),
+        "write_queue": db_service.get_write_queue_stats(),
+    }
+
+def compare(result, baseline, tolerance, slack_ms):
+    regressions = []
+    for name, current in result["operations"].items():
+        base = baseline.get("operations", {}).get(name)
+        if not base:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            limit = base[key] * tolerance + slack_ms
+            if current[key] > limit:
+                regressions.append(f"{name} {key}: {current[key]}ms > {limit:.1f}ms (기준 {base[key]}ms)")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}: 오류 {current['errors']}건 (기준 {base['errors']}건)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="offline load test with a fake LLM and local MongoDB")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=3, help="사용자당 채팅 턴 수")
+    parser.add_argument("--mongo-uri", default=None, help="로컬 mongod 주소 (없으면 mongomock)")
+    parser.add_argument("--base-url", default=None, help="외부 가짜 OpenAI 서버 주소 (없으면 프로세스 안에서 띄움)")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--response-tokens", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="결과 JSON 저장 경로")
+    parser.add_argument("--baseline", default=None, help="비교할 기준 결과 JSON")
+    parser.add_argument("--save-baseline", default=None, help="이번 결과를 기준값으로 저장")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="기준값 대비 허용 배수")
+    parser.add_argument("--slack-ms", type=float, default=20.0, help="기준값에 더하는 허용 오차(ms)")
+    args = parser.parse_args()
+
+    result = run(args)
+    print(f"{args.users} users x {args.turns} turns, concurrency {args.concurrency}, "
+          f"{result['config']['mongo']}, {result['elapsed_s']}s")
+    print(f"{'operation':<30} {'count':>6} {'err':>4} {'ops/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, stats in result["operations"].items():
+        print(f"{name:<30} {stats['count']:>6} {stats['errors']:>4} {stats['throughput_per_s']:>8} "
+              f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+    print(f"llm: {result['llm']}")
+    for failure in result["failures"][:5]:
+        print(f"실패: {failure}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+                f.write("\n")
+            print(f"결과 저장: {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance, args.slack_ms)
+        if regressions:
+            print("\n회귀 발견:")
+            for line in regressions:
+                print(f"- {line}")
+            sys.exit(1)
+        print("\n회귀 없음")
+    if result["failures"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
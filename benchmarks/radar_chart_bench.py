@@ -0,0 +1,120 @@
+# 레이더 차트 렌더링 시간과 메모리(RSS)를 1000회 반복으로 측정한다.
+#
+#   python benchmarks/radar_chart_bench.py
+#   python benchmarks/radar_chart_bench.py --renders 1000 --distinct 20 --mode cached
+#
+# legacy:   plt.subplots 로 매번 새 figure, close 하지 않음 (기존 render_radar_chart 동작)
+# figure:   pyplot 없는 Figure, 캐시 없이 매번 렌더
+# cached:   ui_components.radar_chart_png (점수 튜플 기준 lru_cache)
+# svg:      ui_components.radar_chart_svg (matplotlib 없음)
+# 모드별로 새 프로세스에서 실행해 서로의 메모리 사용량이 섞이지 않게 한다.
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ["legacy", "figure", "cached", "svg"]
+
+def rss_mb():
+    # 현재 RSS (리눅스는 /proc, 그 외에는 최대 RSS 로 대체)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+def legacy_render(values):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    import ui_components
+
+    angles = np.linspace(0, 2 * np.pi, len(values), endpoint=False).tolist()
+    values = list(values) + [values[0]]
+    angles += angles[:1]
+    fig, ax = plt.subplots(figsize=(6, 6), subplot_kw=dict(polar=True))
+    ax.fill(angles, values, color='#10a37f', alpha=0.25)
+    ax.plot(angles, values, color='#10a37f', linewidth=2)
+    ax.set_yticklabels([])
+    ax.set_xticks(angles[:-1])
+    ax.set_xticklabels(ui_components.RADAR_LABELS, fontsize=12, fontweight='bold')
+    ax.set_ylim(0, 100)
+    fig.patch.set_alpha(0.0)
+    ax.patch.set_alpha(0.0)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    return buffer.getvalue()
+
+def run_mode(mode, renders, distinct, seed):
+    rss_start = rss_mb()
+    import_started = time.perf_counter()
+    import ui_components
+    import_ms = (time.perf_counter() - import_started) * 1000
+
+    rng = random.Random(seed)
+    # 실제 사용처럼 같은 점수 조합이 반복해서 다시 그려지는 상황
+    score_sets = [tuple(float(rng.randint(30, 95)) for _ in ui_components.RADAR_KEYS) for _ in range(distinct)]
+    render = {
+        "legacy": legacy_render,
+        "figure": lambda v: ui_components.radar_chart_png.__wrapped__(v),
+        "cached": ui_components.radar_chart_png,
+        "svg": ui_components.radar_chart_svg,
+    }[mode]
+
+    timings = []
+    for i in range(renders):
+        started = time.perf_counter()
+        render(score_sets[i % distinct])
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    return {
+        "mode": mode,
+        "renders": renders,
+        "import_ms": round(import_ms, 1),
+        "total_s": round(sum(timings) / 1000, 2),
+        "mean_ms": round(sum(timings) / len(timings), 2),
+        "p50_ms": round(timings[len(timings) // 2], 2),
+        "p99_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 2),
+        "rss_start_mb": round(rss_start, 1),
+        "rss_end_mb": round(rss_mb(), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="radar chart render benchmark")
+    parser.add_argument("--renders", type=int, default=1000)
+    parser.add_argument("--distinct", type=int, default=20, help="서로 다른 점수 조합 수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=MODES + ["all"], default="all")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON 한 줄로 출력")
+    args = parser.parse_args()
+
+    if args.mode != "all":
+        result = run_mode(args.mode, args.renders, args.distinct, args.seed)
+        print(json.dumps(result) if args.json else result)
+        return
+
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    print(f"{'mode':<8} {'import_ms':>9} {'total_s':>8} {'mean_ms':>8} {'p50_ms':>7} {'p99_ms':>7} {'rss_start':>10} {'rss_end':>8}")
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode, "--renders", str(args.renders),
+             "--distinct", str(args.distinct), "--seed", str(args.seed), "--json"],
+            check=True, capture_output=True, text=True
+        ).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"{r['mode']:<8} {r['import_ms']:>9} {r['total_s']:>8} {r['mean_ms']:>8} {r['p50_ms']:>7} "
+              f"{r['p99_ms']:>7} {r['rss_start_mb']:>10} {r['rss_end_mb']:>8}")
+
+if __name__ == "__main__":
+    main()
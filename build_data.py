@@ -0,0 +1,207 @@
+# 원본 통계 CSV -> 정제 CSV + 바이너리 스냅샷 빌드 (test1.ipynb 전처리를 스크립트로 옮김)
+#
+#   python build_data.py          # 원본이 바뀐 경우에만 다시 빌드
+#   python build_data.py --force  # 무조건 다시 빌드
+#
+# 스냅샷은 data/snapshots/ 아래 .npy 배열과 manifest.json 으로 저장되고,
+# 앱은 np.load(mmap_mode="r") 로 바로 매핑하므로 시작할 때 콤마 숫자 문자열을 파싱하지 않는다.
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+POPULATION_SOURCE = os.path.join(BASE_DIR, "original", "gender_population.csv")
+ECONOMIC_SOURCE = os.path.join(BASE_DIR, "original", "economical_gender_age.csv")
+POPULATION_CSV = os.path.join(BASE_DIR, "csv", "gender_population_202510.csv")
+SNAPSHOT_DIR = os.getenv("DATA_SNAPSHOT_DIR", os.path.join(BASE_DIR, "data", "snapshots"))
+MANIFEST_NAME = "manifest.json"
+# 변환 로직이 바뀌면 올려서 기존 스냅샷을 무효화한다
+BUILD_VERSION = 2
+
+GENDERS = ["전체", "남성", "여성"]
+AGE_BANDS = ["10세미만", "10대", "20대", "30대", "40대", "50대", "60대", "70대", "80대", "90대", "100세이상"]
+# 원본 열 이름의 성별 표기 -> 정제 데이터의 성별
+POPULATION_GENDER_KEYS = {"계": "전체", "남": "남성", "여": "여성"}
+SOURCE_AGE_BANDS = ["0~9세", "10~19세", "20~29세", "30~39세", "40~49세", "50~59세",
+                    "60~69세", "70~79세", "80~89세", "90~99세", "100세 이상"]
+AREA_NAMES = {
+    "서울특별시": "서울",
+    "부산광역시": "부산",
+    "대구광역시": "대구",
+    "인천광역시": "인천",
+    "광주광역시": "광주",
+    "대전광역시": "대전",
+    "울산광역시": "울산",
+    "세종특별자치시": "세종",
+    "경기도": "경기",
+    "강원특별자치도": "강원",
+    "충청북도": "충북",
+    "충청남도": "충남",
+    "전북특별자치도": "전북",
+    "전라남도": "전남",
+    "경상북도": "경북",
+    "경상남도": "경남",
+    "제주특별자치도": "제주",
+    "전국": "한국"
+}
+ECONOMIC_GENDERS = {"계": "전체", "남자": "남성", "여자": "여성"}
+ECONOMIC_METRICS = ["population", "active", "employed", "unemployed", "inactive",
+                    "participation_rate", "unemployment_rate", "employment_rate"]
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _to_int(text):
+    return int(text.replace(",", ""))
+
+def read_population(path=POPULATION_SOURCE):
+    """원본 인구 CSV 를 (area, gender, total, 연령대...) 행 목록으로 바꾼다.
+
+    노트북과 같게 지역명의 행정코드를 떼고 약칭으로 바꾸며, 성별별 총계는
+    '연령구간인구수' 열을 쓴다. 값은 원본 문자열 그대로 둔다.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+
+    prefix = header[1].split("_")[0]
+    columns = {name: i for i, name in enumerate(header)}
+    output = []
+    for key, gender in POPULATION_GENDER_KEYS.items():
+        total_column = f"{prefix}_{key}_총인구수" if key == "계" else f"{prefix}_{key}_연령구간인구수"
+        band_columns = [columns[f"{prefix}_{key}_{band}"] for band in SOURCE_AGE_BANDS]
+        for row in rows:
+            if not row:
+                continue
+            area = re.sub(r"\s*\(.*\)", "", row[0])
+            area = AREA_NAMES.get(area, area)
+            output.append([area, gender, row[columns[total_column]]] + [row[i] for i in band_columns])
+    return output
+
+def write_population_csv(rows, path=POPULATION_CSV):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["area", "gender", "total"] + AGE_BANDS)
+        writer.writerows(rows)
+
+def population_arrays(rows):
+    regions = []
+    for row in rows:
+        if row[0] not in regions:
+            regions.append(row[0])
+    counts = np.zeros((len(regions), len(GENDERS), len(AGE_BANDS)), dtype=np.int64)
+    for row in rows:
+        counts[regions.index(row[0]), GENDERS.index(row[1])] = [_to_int(v) for v in row[3:]]
+    return regions, counts
+
+def read_economic(path=ECONOMIC_SOURCE):
+    # 1행은 기준월, 2행이 실제 열 이름 (노트북의 iloc[1:] + 헤더 지정과 같음)
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = [row for row in csv.reader(f) if row]
+    period = rows[0][2]
+    rows = rows[2:]
+
+    brackets = []
+    for row in rows:
+        bracket = row[1].strip()
+        if bracket not in brackets:
+            brackets.append(bracket)
+    values = np.full((len(GENDERS), len(brackets), len(ECONOMIC_METRICS)), np.nan)
+    for row in rows:
+        gender = ECONOMIC_GENDERS.get(row[0].strip(), row[0].strip())
+        values[GENDERS.index(gender), brackets.index(row[1].strip())] = [float(v.replace(",", "")) for v in row[2:2 + len(ECONOMIC_METRICS)]]
+    return period, brackets, values
+
+def load_manifest(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _source_hashes():
+    return {
+        "population": _sha256(POPULATION_SOURCE),
+        "economic": _sha256(ECONOMIC_SOURCE),
+    }
+
+def is_up_to_date(snapshot_dir=SNAPSHOT_DIR, manifest=None):
+    manifest = manifest or load_manifest(snapshot_dir)
+    if not manifest or manifest.get("version") != BUILD_VERSION:
+        return False
+    if any(not os.path.exists(os.path.join(snapshot_dir, name)) for name in manifest["files"].values()):
+        return False
+    try:
+        return manifest["sources"] == _source_hashes()
+    except FileNotFoundError:
+        # 원본이 없는 배포 환경에서는 기존 스냅샷을 그대로 쓴다
+        return True
+
+def _save_array(snapshot_dir, name, array):
+    # 쓰는 도중에 읽히지 않도록 임시 파일에 쓴 뒤 교체한다
+    fd, tmp = tempfile.mkstemp(suffix=".npy", dir=snapshot_dir)
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, os.path.join(snapshot_dir, name))
+    return name
+
+def build(force=False, snapshot_dir=SNAPSHOT_DIR, write_csv=True):
+    """원본이 바뀌었으면 스냅샷을 다시 만든다. 빌드했으면 True."""
+    if not force and is_up_to_date(snapshot_dir):
+        return False
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    population_rows = read_population()
+    if write_csv:
+        write_population_csv(population_rows)
+    regions, counts = population_arrays(population_rows)
+    period, brackets, economic = read_economic()
+
+    manifest = {
+        "version": BUILD_VERSION,
+        "sources": _source_hashes(),
+        "files": {
+            "population_counts": _save_array(snapshot_dir, "population_counts.npy", counts),
+            "economic_values": _save_array(snapshot_dir, "economic_values.npy", economic),
+        },
+        "population": {"regions": regions, "genders": GENDERS, "age_bands": AGE_BANDS},
+        "economic": {"period": period, "genders": GENDERS, "brackets": brackets, "metrics": ECONOMIC_METRICS},
+    }
+    fd, tmp = tempfile.mkstemp(suffix=".json", dir=snapshot_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(snapshot_dir, MANIFEST_NAME))
+    return True
+
+def load_snapshot(name, snapshot_dir=SNAPSHOT_DIR):
+    """(manifest, 읽기 전용 메모리 매핑 배열). 스냅샷이 없거나 낡았으면 먼저 빌드한다."""
+    manifest = load_manifest(snapshot_dir)
+    if not is_up_to_date(snapshot_dir, manifest):
+        build(snapshot_dir=snapshot_dir, write_csv=False)
+        manifest = load_manifest(snapshot_dir)
+    return manifest, np.load(os.path.join(snapshot_dir, manifest["files"][name]), mmap_mode="r")
+
+def main():
+    parser = argparse.ArgumentParser(description="원본 통계 CSV 로 정제 CSV 와 스냅샷을 만든다")
+    parser.add_argument("--force", action="store_true", help="원본이 바뀌지 않았어도 다시 빌드")
+    args = parser.parse_args()
+
+    if build(force=args.force):
+        print(f"빌드 완료: {SNAPSHOT_DIR}")
+    else:
+        print("원본 변경 없음: 빌드를 건너뜁니다")
+
+if __name__ == "__main__":
+    main()
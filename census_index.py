@@ -0,0 +1,251 @@
+# 지역 × 성별 × 연령대 인구 인덱스 (build_data 스냅샷, 원본은 csv/gender_population_202510.csv)
+# 연령 축 누적합을 미리 만들어 두어 "서울 20~39세 여성" 같은 구간 인구를 O(1) 로 계산하고,
+# 분석 프롬프트에 넣을 TAM/SAM 수치를 만든다.
+import csv
+import os
+import re
+import threading
+
+CENSUS_CSV_PATH = os.getenv(
+    "CENSUS_CSV_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "csv", "gender_population_202510.csv")
+)
+CENSUS_LABEL = "2025년 10월 인구 통계"
+NATIONAL = "한국"
+GENDERS = ["전체", "남성", "여성"]
+AGE_BANDS = ["10세미만", "10대", "20대", "30대", "40대", "50대", "60대", "70대", "80대", "90대", "100세이상"]
+BAND_YEARS = 10
+MAX_AGE = BAND_YEARS * len(AGE_BANDS)
+
+REGION_ALIASES = {
+    "전국": NATIONAL, "국내": NATIONAL, "대한민국": NATIONAL,
+    "서울시": "서울", "서울특별시": "서울",
+    "경기도": "경기", "수도권": None, "광주광역시": "광주",
+    "강원도": "강원", "충청북도": "충북", "충청남도": "충남",
+    "전라북도": "전북", "전북특별자치도": "전북", "전라남도": "전남",
+    "경상북도": "경북", "경상남도": "경남", "제주도": "제주",
+}
+# 여러 지역을 묶어 부르는 이름
+REGION_GROUPS = {
+    "수도권": ["서울", "경기", "인천"],
+}
+
+# 다른 뜻으로 더 자주 쓰이는 지역 이름 (경기 불황, 경기도 광주시).
+# "경기도"/"광주광역시" 처럼 접미사가 붙거나, 지역 문맥이 있거나, 바로 뒤에 연령/성별 타겟이 올 때만 지역으로 본다
+AMBIGUOUS_REGIONS = {"경기", "광주"}
+# 지역 이름 바로 뒤에 올 수 있는 말 (서울대, 경기침체 같은 다른 단어와 구분)
+_REGION_TAIL = r"(?=$|[^가-힣]|에서|에|의|은|는|이|가|을|를|와|과|도|만|내|권|지역|거주|소재|사는|살|시|광역시|특별시|특별자치시|특별자치도)"
+_REGION_CONTEXT_RE = re.compile(r"\s*(?:지역|거주|도민|시민|권|내|소재|남부|북부|에\s*사는)")
+_REGION_LIST_SEP_RE = re.compile(r"\s*(?:[·,/]|와|과|및)?\s*")
+_AMBIGUOUS_CITY_RE = re.compile(r"시(?!민)")
+_FEMALE_WORDS = r"여성|여자|엄마|주부|여대생"
+_MALE_WORDS = r"남성|남자|아빠"
+_FEMALE_RE = re.compile(_FEMALE_WORDS)
+_MALE_RE = re.compile(_MALE_WORDS)
+# "경기 30대 여성", "광주 20~30대", "경기 여성" (경기 불황 과 구분)
+_TARGET_AFTER_RE = re.compile(rf"\s*(?:\d{{1,2}}\s*(?:세|살|대|[~\-–·,/])|{_FEMALE_WORDS}|{_MALE_WORDS})")
+_AGE_RANGE_RE = re.compile(r"(?<!\d)(\d{1,2})\s*(?:세|살)?\s*[~\-–]\s*(\d{1,3})\s*(세|살|대)")
+_AGE_DECADES_RE = re.compile(r"(?<!\d)(\d0)\s*(?:[·,/]\s*(\d0)\s*)*대")
+_AGE_DECADE_LIST_RE = re.compile(r"(\d0)(?=\s*(?:[·,/]|대))")
+
+class CensusIndex:
+    def __init__(self, regions, counts):
+        import numpy as np
+
+        # counts: (지역, 성별, 연령대) 배열 (인구는 int64, 추정 취업자 수 등은 float64)
+        self.regions = list(regions)
+        self.region_index = {name: i for i, name in enumerate(self.regions)}
+        self.counts = counts
+        self.prefix = np.zeros(counts.shape[:2] + (counts.shape[2] + 1,), dtype=counts.dtype)
+        np.cumsum(counts, axis=2, out=self.prefix[:, :, 1:])
+
+    def _cumulative(self, r, g, age):
+        # age 세 미만 인구. 연령대 안에서는 균등 분포로 보고 보간한다
+        age = min(max(age, 0), MAX_AGE)
+        band, within = divmod(age, BAND_YEARS)
+        value = float(self.prefix[r, g, band])
+        if within and band < self.counts.shape[2]:
+            value += self.counts[r, g, band] * within / BAND_YEARS
+        return value
+
+    def count(self, region=NATIONAL, gender="전체", age_from=0, age_to=None):
+        """age_from 세 이상 age_to 세 이하 인구 (age_to=None 이면 상한 없음)."""
+        r = self.region_index[region]
+        g = GENDERS.index(gender)
+        upper = MAX_AGE if age_to is None else age_to + 1
+        return int(round(self._cumulative(r, g, upper) - self._cumulative(r, g, age_from)))
+
+    def total(self, region=NATIONAL, gender="전체"):
+        return int(round(self.prefix[self.region_index[region], GENDERS.index(gender), -1]))
+
+def parse_csv(path=CENSUS_CSV_PATH):
+    import numpy as np
+
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        band_columns = [header.index(band) for band in AGE_BANDS]
+        rows = {}
+        for row in reader:
+            if not row:
+                continue
+            rows[(row[0], row[1])] = [int(row[i].replace(",", "")) for i in band_columns]
+
+    regions = []
+    for region, _ in rows:
+        if region not in regions:
+            regions.append(region)
+    counts = np.zeros((len(regions), len(GENDERS), len(AGE_BANDS)), dtype=np.int64)
+    for (region, gender), values in rows.items():
+        counts[regions.index(region), GENDERS.index(gender)] = values
+    return regions, counts
+
+_index = None
+_index_lock = threading.Lock()
+
+def load_index():
+    # build_data 스냅샷(.npy)을 메모리 매핑해서 쓰고, 스냅샷을 만들 수 없으면 CSV 를 직접 파싱한다
+    try:
+        import build_data
+
+        manifest, counts = build_data.load_snapshot("population_counts")
+        return CensusIndex(manifest["population"]["regions"], counts)
+    except Exception as e:
+        print(f"인구 스냅샷 로드 실패, CSV 로 대체: {str(e)}")
+        return CensusIndex(*parse_csv())
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_index()
+    return _index
+
+def _find_regions(text, regions):
+    # 지역 이름/별칭을 단어 단위로 찾는다 (긴 이름 먼저: "경기도" 가 "경기" 보다 우선)
+    names = {alias: target for alias, target in REGION_ALIASES.items()}
+    names.update({region: region for region in regions if region != NATIONAL and region not in names})
+    pattern = "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+    matches = list(re.finditer(rf"(?<![가-힣])(?:{pattern}){_REGION_TAIL}", text))
+
+    def listed_with_other_region(i):
+        # "서울·경기", "광주와 전남" 처럼 다른 지역과 나란히 쓰였는지
+        neighbors = [(matches[i - 1], matches[i])] if i > 0 else []
+        neighbors += [(matches[i], matches[i + 1])] if i + 1 < len(matches) else []
+        return any(
+            other.group(0) not in AMBIGUOUS_REGIONS and _REGION_LIST_SEP_RE.fullmatch(text, left.end(), right.start())
+            for left, right in neighbors
+            for other in [left if right is matches[i] else right]
+        )
+
+    found = []
+    for i, match in enumerate(matches):
+        name = match.group(0)
+        if name in AMBIGUOUS_REGIONS and not (
+            _REGION_CONTEXT_RE.match(text, match.end())
+            or _TARGET_AFTER_RE.match(text, match.end())
+            or listed_with_other_region(i)
+        ):
+            continue
+        # "경기도 광주시" 는 광주광역시가 아니다
+        if name in AMBIGUOUS_REGIONS and _AMBIGUOUS_CITY_RE.match(text, match.end()):
+            continue
+        target = names[name]
+        found.extend(REGION_GROUPS.get(name, []) if target is None else [target])
+    return found
+
+def parse_segment(text, regions):
+    """텍스트에서 지역/성별/연령 조건을 뽑는다. 아무 조건도 없으면 None."""
+    found_regions = _find_regions(text, regions)
+    found_regions = [r for i, r in enumerate(found_regions) if r in regions and r not in found_regions[:i]]
+    if len(found_regions) > 1 and NATIONAL in found_regions:
+        found_regions.remove(NATIONAL)
+
+    female, male = bool(_FEMALE_RE.search(text)), bool(_MALE_RE.search(text))
+    gender = "여성" if female and not male else "남성" if male and not female else "전체"
+
+    age_from, age_to = None, None
+    match = _AGE_RANGE_RE.search(text)
+    if match:
+        low, high, unit = int(match.group(1)), int(match.group(2)), match.group(3)
+        # "20~30대" 는 20세~39세, "20~39세" 는 그대로
+        age_from, age_to = low, high + BAND_YEARS - 1 if unit == "대" else high
+    else:
+        decades = []
+        for match in _AGE_DECADES_RE.finditer(text):
+            decades.extend(int(d) for d in _AGE_DECADE_LIST_RE.findall(match.group(0)))
+        if decades:
+            age_from, age_to = min(decades), max(decades) + BAND_YEARS - 1
+    if age_from is not None and not (0 <= age_from <= age_to < MAX_AGE):
+        age_from, age_to = None, None
+
+    if not found_regions and gender == "전체" and age_from is None:
+        return None
+    return {
+        "regions": found_regions,
+        "gender": gender,
+        "age_from": age_from,
+        "age_to": age_to,
+    }
+
+def segment_label(regions, gender, age_from, age_to):
+    parts = ["·".join(regions) if regions else "전국"]
+    if gender != "전체":
+        parts.append(gender)
+    if age_from is not None:
+        parts.append(f"{age_from}~{age_to}세")
+    return " ".join(parts)
+
+def market_size(segment, index=None):
+    index = index or get_index()
+    age_from = segment["age_from"] or 0
+    age_to = segment["age_to"]
+    gender = segment["gender"]
+    tam = index.count(NATIONAL, gender, age_from, age_to)
+    regions = [r for r in segment["regions"] if r != NATIONAL]
+    sam = sum(index.count(r, gender, age_from, age_to) for r in regions) if regions else None
+    return {
+        "tam": tam,
+        "tam_label": segment_label([], gender, segment["age_from"], age_to),
+        "sam": sam,
+        "sam_label": segment_label(regions, gender, segment["age_from"], age_to) if regions else None,
+        "national_total": index.total(NATIONAL),
+    }
+
+def format_grounding(sizes):
+    lines = [f"[인구 통계 기반 시장 규모 ({CENSUS_LABEL})]"]
+    share = sizes["tam"] / sizes["national_total"] * 100 if sizes["national_total"] else 0
+    lines.append(f"- TAM ({sizes['tam_label']} 인구): {sizes['tam']:,}명 (전국 인구의 {share:.1f}%)")
+    if sizes["sam"] is not None:
+        share = sizes["sam"] / sizes["tam"] * 100 if sizes["tam"] else 0
+        lines.append(f"- SAM ({sizes['sam_label']} 인구): {sizes['sam']:,}명 (TAM의 {share:.1f}%)")
+    lines.append("시장 전망의 시장 규모는 위 실제 인구 수치를 근거로 추정하고, 구매 전환율 등 가정은 따로 밝혀 주세요.")
+    return "\n".join(lines)
+
+def _message_text(message):
+    content = message.get("content")
+    if isinstance(content, list):
+        return " ".join(item.get("text", "") for item in content if item.get("type") == "text")
+    return content or ""
+
+def find_segment(messages, regions, lookback=6):
+    # 가장 최근에 타겟을 언급한 user 메시지의 세그먼트
+    user_messages = [m for m in messages if m.get("role") == "user"][-lookback:]
+    for message in reversed(user_messages):
+        # 첨부 문서 내용은 제외하고 사용자가 직접 쓴 부분만 본다
+        text = _message_text(message).split("\n\n[첨부")[0]
+        segment = parse_segment(text, regions)
+        if segment:
+            return segment
+    return None
+
+def grounding_for_messages(messages, lookback=6):
+    """최근 user 메시지에서 타겟 세그먼트를 찾아 TAM/SAM 근거 문단을 만든다. 못 찾으면 None."""
+    try:
+        index = get_index()
+    except Exception as e:
+        print(f"인구 통계 로드 실패: {str(e)}")
+        return None
+    segment = find_segment(messages, index.regions, lookback)
+    return format_grounding(market_size(segment, index)) if segment else None
@@ -0,0 +1,103 @@
+# 채팅 저장 스키마
+# - chat_sessions: 세션 문서 (제목, 요약, updated_at)
+# - chat_message_buckets: 세션별 메시지 묶음 (버킷 하나에 최대 CHAT_BUCKET_SIZE 개, CHAT_BUCKET_MAX_BYTES 까지)
+# - login_tokens: 이전 방식 로그인 토큰 + 서명 토큰 폐기 기록
+# - chat_messages: 세션 없이 기록된 메시지만 남는다 (기존 데이터는 migrate_schema.py 로 옮긴다)
+# db_service 함수들은 기존처럼 chat_messages / login_logs 컬렉션을 받고, 같은 DB 의 새 컬렉션은 여기서 찾는다.
+import os
+
+SESSIONS_COLLECTION = os.getenv("MONGO_SESSIONS_COLLECTION", "chat_sessions")
+MESSAGE_BUCKETS_COLLECTION = os.getenv("MONGO_MESSAGE_BUCKETS_COLLECTION", "chat_message_buckets")
+LOGIN_TOKENS_COLLECTION = os.getenv("MONGO_LOGIN_TOKENS_COLLECTION", "login_tokens")
+CHAT_BUCKET_SIZE = int(os.getenv("CHAT_BUCKET_SIZE", "50"))
+# 문서 크기 제한(16MB)보다 충분히 작게. 이미지가 인라인 base64 로 남은 메시지는 몇 개만으로도 MB 단위가 된다
+CHAT_BUCKET_MAX_BYTES = int(os.getenv("CHAT_BUCKET_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# 버킷 안의 메시지에 남기는 필드 (email/name/session_id 는 버킷 문서에 한 번만 저장)
+MESSAGE_FIELDS = ("role", "content", "timestamp", "partial")
+
+def sessions(collection):
+    return collection.database[SESSIONS_COLLECTION]
+
+def message_buckets(collection):
+    return collection.database[MESSAGE_BUCKETS_COLLECTION]
+
+def login_tokens(collection):
+    return collection.database[LOGIN_TOKENS_COLLECTION]
+
+def bucket_entry(doc):
+    return {field: doc[field] for field in MESSAGE_FIELDS if field in doc}
+
+def entry_size(entry):
+    import bson
+
+    return len(bson.encode(entry))
+
+def split_docs(docs, bucket_size=CHAT_BUCKET_SIZE, max_bytes=CHAT_BUCKET_MAX_BYTES):
+    """메시지를 버킷 하나에 들어갈 만큼씩 (개수와 BSON 크기 기준) 순서대로 나눈다."""
+    parts = []
+    part, part_bytes = [], 0
+    for doc in docs:
+        size = entry_size(bucket_entry(doc))
+        if part and (len(part) >= bucket_size or part_bytes + size > max_bytes):
+            parts.append(part)
+            part, part_bytes = [], 0
+        part.append(doc)
+        part_bytes += size
+    if part:
+        parts.append(part)
+    return parts
+
+def new_bucket(session_id, email, name, docs, is_open):
+    entries = [bucket_entry(doc) for doc in docs]
+    return {
+        "session_id": session_id,
+        "email": email,
+        "name": name,
+        "open": is_open,
+        "count": len(entries),
+        "bytes": sum(entry_size(entry) for entry in entries),
+        "first_at": min(entry["timestamp"] for entry in entries),
+        "last_at": max(entry["timestamp"] for entry in entries),
+        "messages": entries,
+    }
+
+def append_requests(session_id, email, name, docs, bucket_size=CHAT_BUCKET_SIZE, max_bytes=CHAT_BUCKET_MAX_BYTES):
+    """한 세션의 새 메시지를 열린 버킷에 붙이는 bulk_write 요청 목록 (순서대로 실행해야 한다)."""
+    from pymongo import UpdateMany, UpdateOne
+
+    requests = []
+    for part in split_docs(docs, bucket_size, max_bytes):
+        entries = [bucket_entry(doc) for doc in part]
+        size = sum(entry_size(entry) for entry in entries)
+        room = bucket_size - len(entries)
+        byte_room = max_bytes - size
+        # 자리가 모자란 열린 버킷은 닫아서, 새 메시지가 항상 가장 최근 버킷에만 붙게 한다
+        # (bytes 가 없는 이전 버킷도 $not 으로 걸려 닫힌다)
+        requests.append(UpdateMany(
+            {
+                "session_id": session_id,
+                "open": True,
+                "$or": [{"count": {"$gt": room}}, {"bytes": {"$not": {"$lte": byte_room}}}]
+            },
+            {"$set": {"open": False}}
+        ))
+        requests.append(UpdateOne(
+            {"session_id": session_id, "open": True, "count": {"$lte": room}, "bytes": {"$lte": byte_room}},
+            {
+                # 큐 순서가 곧 시간 순서다 ($sort 는 ms 단위로 같은 timestamp 의 순서를 보장하지 않음)
+                "$push": {"messages": {"$each": entries}},
+                "$inc": {"count": len(entries), "bytes": size},
+                "$min": {"first_at": min(doc["timestamp"] for doc in part)},
+                "$max": {"last_at": max(doc["timestamp"] for doc in part)},
+                "$setOnInsert": {"email": email, "name": name},
+            },
+            upsert=True
+        ))
+    return requests
+
+def unapplied_docs(docs, failed_index, bucket_size=CHAT_BUCKET_SIZE, max_bytes=CHAT_BUCKET_MAX_BYTES):
+    """ordered bulk_write 가 append_requests 의 failed_index 번째 요청에서 멈췄을 때 아직 붙지 않은 메시지."""
+    # 버킷에 붙일 묶음마다 (닫기, 붙이기) 요청 두 개. 실패한 요청 앞의 묶음까지는 반영됐다
+    applied = split_docs(docs, bucket_size, max_bytes)[:failed_index // 2]
+    return docs[sum(len(part) for part in applied):]
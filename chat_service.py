@@ -1,3 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import json
+import os
+import time
+
+import image_pipeline
+import profiler
+import result_cache
+
+DIAGNOSTIC_TIMEOUT = float(os.getenv("DIAGNOSTIC_TIMEOUT_SECONDS", "60"))
+DIAGNOSTIC_MAX_WORKERS = int(os.getenv("DIAGNOSTIC_MAX_WORKERS", "8"))
+
+# 진단 fan-out 용 공용 스레드 풀 (프로세스 전체에서 동시 호출 수를 제한)
+_diagnostics_pool = ThreadPoolExecutor(max_workers=DIAGNOSTIC_MAX_WORKERS, thread_name_prefix="diagnostics")
+
 ANALYSIS_FORMAT = """
 [분석 가이드라인]
 사용자가 창업 아이템을 제시하면, 다음 4가지 항목에 맞춰 체계적으로 분석해 주세요.
@@ -11,36 +26,43 @@ ANALYSIS_FORMAT = """
 데이터에 기반한 논리적인 추론을 하고, 예비 창업자에게 실질적인 도움이 되는 구체적인 조언을 제공하세요.
 """
 
-def get_ai_response(client, messages, persona="general", model="gpt-4o"):
-    persona_prompts = {
-        "general": """
-        당신은 균형 잡힌 시각을 가진 '전문 창업 컨설턴트'입니다.
-        말투: 전문적이고 격려하는, 정중한 해요체.
-        태도: 전반적인 사업 타당성을 골고루, 객관적으로 분석합니다.
-        """,
-        "vc": """
-        당신은 냉철하고 비판적인 '벤처 캐피탈리스트(VC)'입니다.
-        말투: 직설적이고 날카로운, 팩트 중심의 해요체. (빈말 절대 금지, 뼈 때리는 조언)
-        태도: 
-        - 수익 모델(BM)과 시장 규모(TAM/SAM/SOM)를 최우선으로 검증합니다.
-        - 리스크와 경쟁 우위를 집요하게 파고듭니다.
-        - 분석 마지막 줄에 💰 **투자 매력도 점수 (0~100점)**와 그 이유를 한 줄로 냉정하게 평가하세요.
-        """,
-        "marketer": """
-        당신은 트렌드에 민감한 '바이럴 마케팅 전문가'입니다.
-        말투: 활기차고 통통 튀는, 에너지 넘치는 해요체. (유행어 활용 가능)
-        태도:
-        - 타겟 고객의 숨겨진 욕망(Needs)과 바이럴 포인트(Hook)를 찾아냅니다.
-        - 경쟁사와 차별화된 브랜딩 및 킬러 콘텐츠 전략을 제안합니다.
-        - 분석 마지막 줄에 🔥 **시장광/바이럴 점수 (0~100점)**와 그 이유를 한 줄로 유쾌하게 평가하세요.
-        """
-    }
+PERSONA_PROMPTS = {
+    "general": """
+    당신은 균형 잡힌 시각을 가진 '전문 창업 컨설턴트'입니다.
+    말투: 전문적이고 격려하는, 정중한 해요체.
+    태도: 전반적인 사업 타당성을 골고루, 객관적으로 분석합니다.
+    """,
+    "vc": """
+    당신은 냉철하고 비판적인 '벤처 캐피탈리스트(VC)'입니다.
+    말투: 직설적이고 날카로운, 팩트 중심의 해요체. (빈말 절대 금지, 뼈 때리는 조언)
+    태도: 
+    - 수익 모델(BM)과 시장 규모(TAM/SAM/SOM)를 최우선으로 검증합니다.
+    - 리스크와 경쟁 우위를 집요하게 파고듭니다.
+    - 분석 마지막 줄에 💰 **투자 매력도 점수 (0~100점)**와 그 이유를 한 줄로 냉정하게 평가하세요.
+    """,
+    "marketer": """
+    당신은 트렌드에 민감한 '바이럴 마케팅 전문가'입니다.
+    말투: 활기차고 통통 튀는, 에너지 넘치는 해요체. (유행어 활용 가능)
+    태도:
+    - 타겟 고객의 숨겨진 욕망(Needs)과 바이럴 포인트(Hook)를 찾아냅니다.
+    - 경쟁사와 차별화된 브랜딩 및 킬러 콘텐츠 전략을 제안합니다.
+    - 분석 마지막 줄에 🔥 **시장광/바이럴 점수 (0~100점)**와 그 이유를 한 줄로 유쾌하게 평가하세요.
+    """
+}
 
-    selected_identity = persona_prompts.get(persona, persona_prompts["general"])
+def _build_analysis_messages(messages, persona, grounding=None):
+    selected_identity = PERSONA_PROMPTS.get(persona, PERSONA_PROMPTS["general"])
     
     full_system_prompt = f"{selected_identity}\n\n{ANALYSIS_FORMAT}"
+    if grounding:
+        # 실제 통계 수치 (예: census_index 의 TAM/SAM)
+        full_system_prompt += f"\n\n{grounding}"
 
-    messages_with_system = [{"role": "system", "content": full_system_prompt}] + messages
+    return [{"role": "system", "content": full_system_prompt}] + image_pipeline.inline_image_refs(messages)
+
+@profiler.timed("llm.get_ai_response")
+def get_ai_response(client, messages, persona="general", model="gpt-4o", grounding=None):
+    messages_with_system = _build_analysis_messages(messages, persona, grounding)
     
     response = client.chat.completions.create(
         model=model,
@@ -48,7 +70,51 @@ def get_ai_response(client, messages, persona="general", model="gpt-4o"):
     )
     return response.choices[0].message.content
 
-def generate_bmc(client, messages, model="gpt-4o"):
+@profiler.timed("llm.stream_ai_response")
+def stream_ai_response(client, messages, persona="general", model="gpt-4o", grounding=None):
+    # get_ai_response 의 스트리밍 버전: 응답 조각(delta)을 도착하는 대로 yield 한다.
+    messages_with_system = _build_analysis_messages(messages, persona, grounding)
+
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages_with_system,
+        stream=True
+    )
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+    finally:
+        stream.close()
+
+def _cached_json_completion(client, function_name, system_prompt, messages, model):
+    # 같은 대화/함수/모델/프롬프트면 이전 결과를 재사용한다
+    def compute():
+        messages_with_system = [{"role": "system", "content": system_prompt}] + image_pipeline.inline_image_refs(messages)
+
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages_with_system,
+            response_format={"type": "json_object"}
+        )
+        return response.choices[0].message.content
+
+    # JSON 으로 읽히지 않는 응답은 캐시하지 않고 그대로 에러를 낸다
+    return result_cache.get_or_compute(
+        function_name, model, system_prompt, messages, compute, validate=parse_json_response
+    )
+
+def _with_grounding(system_prompt, grounding):
+    # 실제 통계 수치 (예: segment_sizing 의 세그먼트 규모) 를 시스템 프롬프트 뒤에 붙인다
+    if grounding:
+        return f"{system_prompt}\n\n{grounding}"
+    return system_prompt
+
+@profiler.timed("llm.generate_bmc")
+def generate_bmc(client, messages, model="gpt-4o", grounding=None):
     bmc_system_prompt = """
     당신은 스타트업 비즈니스 모델 분석가입니다.
     지금까지의 대화 내용을 바탕으로 '비즈니스 모델 캔버스(Business Model Canvas)'의 9가지 요소를 정리해 주세요.
@@ -69,16 +135,10 @@ def generate_bmc(client, messages, model="gpt-4o"):
     각 항목은 핵심만 요약해서 작성하세요.
     """
     
-    messages_with_system = [{"role": "system", "content": bmc_system_prompt}] + messages
-    
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages_with_system,
-        response_format={"type": "json_object"}
-    )
-    return response.choices[0].message.content
+    return _cached_json_completion(client, "generate_bmc", _with_grounding(bmc_system_prompt, grounding), messages, model)
 
-def analyze_ratings(client, messages, model="gpt-4o"):
+@profiler.timed("llm.analyze_ratings")
+def analyze_ratings(client, messages, model="gpt-4o", grounding=None):
     rating_system_prompt = """
     당신은 스타트업 평가 위원입니다.
     지금까지의 대화 내용을 바탕으로 다음 5가지 항목에 대해 0~100점 사이의 점수를 매겨주세요.
@@ -101,17 +161,11 @@ def analyze_ratings(client, messages, model="gpt-4o"):
     }
     """
     
-    messages_with_system = [{"role": "system", "content": rating_system_prompt}] + messages
-    
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages_with_system,
-        response_format={"type": "json_object"}
-    )
-    return response.choices[0].message.content
+    return _cached_json_completion(client, "analyze_ratings", _with_grounding(rating_system_prompt, grounding), messages, model)
 
 
-def generate_panel_discussion(client, messages, model="gpt-4o"):
+@profiler.timed("llm.generate_panel_discussion")
+def generate_panel_discussion(client, messages, model="gpt-4o", grounding=None):
     panel_system_prompt = """
     당신은 '스타트업 가상 자문단'의 서기입니다.
     사용자가 창업 아이템을 제시하면, 3명의 전문가가 서로 논쟁하고 토의하는 '대본'을 작성해 주세요.
@@ -138,11 +192,60 @@ def generate_panel_discussion(client, messages, model="gpt-4o"):
     }
     """
     
-    messages_with_system = [{"role": "system", "content": panel_system_prompt}] + messages
-    
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages_with_system,
-        response_format={"type": "json_object"}
-    )
-    return response.choices[0].message.content
+    return _cached_json_completion(client, "generate_panel_discussion", _with_grounding(panel_system_prompt, grounding), messages, model)
+
+def parse_json_response(text):
+    # 모델이 ```json 코드 블록으로 감싸서 주는 경우 제거
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text.replace("```json", "").replace("```", "")
+    elif text.startswith("```"):
+        text = text.replace("```", "")
+    data = json.loads(text)
+    # 진단 결과는 모두 JSON 객체여야 한다 (리스트/문자열이면 화면에서 .get 이 깨진다)
+    if not isinstance(data, dict):
+        raise ValueError(f"JSON 객체가 아닌 응답입니다: {type(data).__name__}")
+    return data
+
+DIAGNOSTICS = {
+    "ratings": analyze_ratings,
+    "bmc": generate_bmc,
+    "panel": generate_panel_discussion
+}
+
+def _run_in_rerun(context, function, *args):
+    # 워커 스레드에는 리런 기록이 없으므로 요청 스레드의 기록을 붙여서 실행한다
+    with profiler.attach(context):
+        return function(*args)
+
+@profiler.timed("llm.run_all_diagnostics")
+def run_all_diagnostics(client, messages, timeout=DIAGNOSTIC_TIMEOUT, model="gpt-4o", grounding=None):
+    """진단 3종(ratings, bmc, panel)을 동시에 실행하고 끝나는 순서대로 (name, data, error)를 yield 한다.
+
+    각 호출은 timeout 초 안에 끝나야 하며, 실패/시간 초과는 error 로 전달되고 나머지 결과에는 영향을 주지 않는다.
+    """
+    if hasattr(client, "with_options"):
+        client = client.with_options(timeout=timeout)
+
+    context = profiler.current_rerun()
+    futures = {
+        _diagnostics_pool.submit(_run_in_rerun, context, function, client, messages, model, grounding): name
+        for name, function in DIAGNOSTICS.items()
+    }
+    deadline = time.monotonic() + timeout
+    pending = set(futures)
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = futures[future]
+            try:
+                yield name, parse_json_response(future.result()), None
+            except Exception as e:
+                yield name, None, e
+
+    for future in pending:
+        future.cancel()
+        yield futures[future], None, TimeoutError(f"{timeout:.0f}초 안에 응답이 오지 않았습니다.")
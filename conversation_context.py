@@ -0,0 +1,126 @@
+# 토큰 예산 기반 대화 컨텍스트 관리
+# 최근 대화는 그대로 보내고, 예산을 넘는 오래된 대화는 롤링 요약(세션 문서에 저장)으로 접는다.
+import os
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4o-mini")
+SUMMARY_MAX_CHARS = int(os.getenv("CONTEXT_SUMMARY_MAX_CHARS", "2000"))
+# 요약할 때는 최근 대화를 예산의 이 비율까지만 남긴다 (매 턴 요약하지 않도록 여유를 둠)
+KEEP_RATIO = 0.6
+MIN_RECENT_MESSAGES = 2
+IMAGE_TOKEN_COST = 765
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_INPUT_CHARS_PER_MESSAGE = 4000
+
+SUMMARY_SYSTEM_PROMPT = """
+당신은 창업 상담 대화의 기록 담당자입니다.
+[기존 요약]과 [새 대화]를 합쳐 하나의 갱신된 요약을 작성하세요.
+- 창업 아이템, 타겟 고객, 시장/경쟁 정보, 수익 모델, 사용자가 제공한 수치와 결정 사항을 빠짐없이 유지하세요.
+- 이미 다룬 분석의 결론만 남기고 반복되는 설명은 생략하세요.
+- {max_chars}자 이내의 개조식 한국어로 작성하세요.
+"""
+
+def new_context_state():
+    return {"summary": "", "summary_upto": 0}
+
+def _text_of(content):
+    if isinstance(content, list):
+        parts = []
+        for item in content:
+            if item.get("type") == "text":
+                parts.append(item.get("text", ""))
+            else:
+                parts.append("[이미지]")
+        return "\n".join(parts)
+    return content or ""
+
+def estimate_tokens(content):
+    # tiktoken 없이 쓰는 근사치: 영문/숫자는 4글자당 1토큰, 한글 등은 글자당 1토큰
+    if isinstance(content, list):
+        total = 0
+        for item in content:
+            if item.get("type") == "text":
+                total += estimate_tokens(item.get("text", ""))
+            else:
+                total += IMAGE_TOKEN_COST
+        return total
+    text = content or ""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+def estimate_message_tokens(message):
+    return estimate_tokens(message.get("content")) + MESSAGE_OVERHEAD_TOKENS
+
+def _conversation_start(messages, offset=0):
+    # 저장되지 않는 첫 인사말(assistant)은 건너뛰고 첫 user 메시지부터 센다
+    # (더 오래된 메시지가 남아있는 중간 페이지라면 건너뛸 인사말이 없다)
+    if offset:
+        return 0
+    for i, message in enumerate(messages):
+        if message.get("role") == "user":
+            return i
+    return len(messages)
+
+def _summary_message(summary):
+    return {"role": "system", "content": f"[이전 대화 요약]\n{summary}"}
+
+def _compose(summary, recent):
+    if summary:
+        return [_summary_message(summary)] + list(recent)
+    return list(recent)
+
+def summarize(client, previous_summary, messages, model=SUMMARY_MODEL):
+    lines = []
+    for message in messages:
+        text = _text_of(message.get("content"))[:SUMMARY_INPUT_CHARS_PER_MESSAGE]
+        lines.append(f"{message.get('role')}: {text}")
+
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT.format(max_chars=SUMMARY_MAX_CHARS)},
+            {"role": "user", "content": f"[기존 요약]\n{previous_summary or '(없음)'}\n\n[새 대화]\n" + "\n\n".join(lines)}
+        ]
+    )
+    return response.choices[0].message.content.strip()[:SUMMARY_MAX_CHARS * 2]
+
+def build_context(client, messages, state, offset=0, budget=CONTEXT_TOKEN_BUDGET):
+    """모델에 보낼 메시지 목록을 만든다.
+
+    state 는 {"summary", "summary_upto"} 딕셔너리로, summary_upto 는 요약에 접힌
+    (저장된) 메시지 개수다. offset 은 메모리에 올라오지 않은 더 오래된 메시지 수.
+    요약이 갱신되면 state 를 제자리에서 바꾸고 changed=True 를 돌려준다.
+    """
+    convo = messages[_conversation_start(messages, offset):]
+    summary = state.get("summary", "")
+    folded = max(0, state.get("summary_upto", 0) - offset)
+    unfolded = convo[folded:]
+
+    costs = [estimate_message_tokens(m) for m in unfolded]
+    summary_cost = estimate_tokens(summary) if summary else 0
+    if summary_cost + sum(costs) <= budget:
+        return _compose(summary, unfolded), False
+
+    # 최근 메시지를 예산의 KEEP_RATIO 까지 남기고 그 이전은 요약으로 접는다
+    target = max(0, int(budget * KEEP_RATIO) - min(summary_cost, SUMMARY_MAX_CHARS))
+    keep = 0
+    kept_cost = 0
+    for cost in reversed(costs):
+        if keep >= MIN_RECENT_MESSAGES and kept_cost + cost > target:
+            break
+        keep += 1
+        kept_cost += cost
+    cut = len(unfolded) - keep
+    if cut <= 0:
+        return _compose(summary, unfolded), False
+
+    try:
+        new_summary = summarize(client, summary, unfolded[:cut])
+    except Exception as e:
+        # 요약 실패 시에는 상태를 바꾸지 않고 최근 메시지만 보낸다
+        print(f"대화 요약 실패: {str(e)}")
+        return _compose(summary, unfolded[cut:]), False
+
+    state["summary"] = new_summary
+    state["summary_upto"] = offset + folded + cut
+    return _compose(new_summary, unfolded[cut:]), True
@@ -0,0 +1,251 @@
+# CSV/XLSX 스트리밍 컬럼 프로파일러
+# 파일 전체를 메모리에 올리지 않고 청크 단위로 읽으며 컬럼별 통계를 누적한다.
+# 모델에는 앞 50행 대신 전체 데이터의 요약(프로파일)을 보낸다.
+from collections import Counter
+import codecs
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+import profiler
+
+PROFILE_CHUNK_ROWS = int(os.getenv("PROFILE_CHUNK_ROWS", "50000"))
+PROFILE_SAMPLE_SIZE = int(os.getenv("PROFILE_SAMPLE_SIZE", "10000"))
+PROFILE_TOP_K = int(os.getenv("PROFILE_TOP_K", "5"))
+PROFILE_MAX_CATEGORIES = int(os.getenv("PROFILE_MAX_CATEGORIES", "5000"))
+PROFILE_MAX_CORR_COLUMNS = int(os.getenv("PROFILE_MAX_CORR_COLUMNS", "20"))
+PROFILE_HEAD_ROWS = int(os.getenv("PROFILE_HEAD_ROWS", "2000"))
+SNIFF_BYTES = 64 * 1024
+
+def sniff_encoding(data):
+    # 예외로 재시도하지 않고 앞부분만 보고 인코딩을 정한다
+    if data.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    head = data[:SNIFF_BYTES]
+    for encoding in ("utf-8", "cp949"):
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            # final=False: 잘린 마지막 멀티바이트 문자는 오류로 보지 않는다
+            decoder.decode(head, final=len(head) == len(data))
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+class ColumnStats:
+    def __init__(self, name, rng):
+        self.name = name
+        self.rng = rng
+        self.count = 0
+        self.nulls = 0
+        self.kind = None
+        self.dtypes = []
+        self.numeric_count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.sample_keys = np.empty(0)
+        self.sample_values = np.empty(0)
+        self.categories = Counter()
+
+    def update(self, series):
+        self.count += len(series)
+        values = series.dropna()
+        self.nulls += len(series) - len(values)
+        if values.empty:
+            return
+        if str(values.dtype) not in self.dtypes:
+            self.dtypes.append(str(values.dtype))
+
+        kind = "numeric" if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values) else "categorical"
+        if self.kind is None:
+            self.kind = kind
+        elif self.kind != kind:
+            self.kind = "mixed"
+
+        if kind == "numeric":
+            array = values.to_numpy(dtype=float)
+            self.numeric_count += len(array)
+            self.total += array.sum()
+            self.total_sq += np.square(array).sum()
+            low, high = array.min(), array.max()
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+            # bottom-k 표본: 무작위 키가 가장 작은 k 개를 유지하면 균등 표본이 된다
+            keys = np.concatenate([self.sample_keys, self.rng.random(len(array))])
+            samples = np.concatenate([self.sample_values, array])
+            if len(keys) > PROFILE_SAMPLE_SIZE:
+                keep = np.argpartition(keys, PROFILE_SAMPLE_SIZE)[:PROFILE_SAMPLE_SIZE]
+                keys, samples = keys[keep], samples[keep]
+            self.sample_keys, self.sample_values = keys, samples
+        else:
+            self.categories.update(values.astype(str).value_counts().to_dict())
+            if len(self.categories) > PROFILE_MAX_CATEGORIES:
+                # 카디널리티가 큰 컬럼은 상위 값만 남긴다 (근사치)
+                self.categories = Counter(dict(self.categories.most_common(PROFILE_MAX_CATEGORIES // 2)))
+
+    def summary(self):
+        result = {
+            "name": self.name,
+            "kind": self.kind or "empty",
+            "dtype": "/".join(self.dtypes) or "-",
+            "count": self.count,
+            "null_rate": round(self.nulls / self.count, 4) if self.count else 0.0,
+        }
+        if self.numeric_count:
+            mean = self.total / self.numeric_count
+            variance = max(0.0, self.total_sq / self.numeric_count - mean * mean)
+            q = np.quantile(self.sample_values, [0.25, 0.5, 0.75]) if len(self.sample_values) else [None] * 3
+            result.update({
+                "mean": mean,
+                "std": variance ** 0.5,
+                "min": self.minimum,
+                "p25": q[0],
+                "p50": q[1],
+                "p75": q[2],
+                "max": self.maximum,
+            })
+        if self.categories:
+            result["distinct"] = len(self.categories)
+            result["top"] = self.categories.most_common(PROFILE_TOP_K)
+        return result
+
+class Profiler:
+    def __init__(self, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.columns = {}
+        self.rows = 0
+        self.head = None
+        self.corr_columns = None
+        self.corr_n = 0
+        self.corr_sum = None
+        self.corr_cross = None
+
+    def update(self, chunk):
+        if self.head is None:
+            self.head = chunk.head(PROFILE_HEAD_ROWS).copy()
+        elif len(self.head) < PROFILE_HEAD_ROWS:
+            self.head = pd.concat([self.head, chunk.head(PROFILE_HEAD_ROWS - len(self.head))], ignore_index=True)
+        self.rows += len(chunk)
+
+        for name in chunk.columns:
+            key = str(name)
+            if key not in self.columns:
+                self.columns[key] = ColumnStats(key, self.rng)
+            self.columns[key].update(chunk[name])
+
+        # 상관계수: 첫 청크에서 숫자형인 컬럼들로 X^T X 를 누적한다
+        if self.corr_columns is None:
+            numeric = [c for c in chunk.columns if pd.api.types.is_numeric_dtype(chunk[c]) and not pd.api.types.is_bool_dtype(chunk[c])]
+            self.corr_columns = numeric[:PROFILE_MAX_CORR_COLUMNS]
+            k = len(self.corr_columns)
+            self.corr_sum = np.zeros(k)
+            self.corr_cross = np.zeros((k, k))
+        if len(self.corr_columns) >= 2:
+            block = chunk[self.corr_columns].apply(pd.to_numeric, errors="coerce").dropna().to_numpy(dtype=float)
+            self.corr_n += len(block)
+            self.corr_sum += block.sum(axis=0)
+            self.corr_cross += block.T @ block
+
+    def correlations(self, threshold=0.3, limit=10):
+        if self.corr_n < 3 or len(self.corr_columns) < 2:
+            return []
+        mean = self.corr_sum / self.corr_n
+        cov = self.corr_cross / self.corr_n - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.outer(std, std)
+        pairs = []
+        for i in range(len(self.corr_columns)):
+            for j in range(i + 1, len(self.corr_columns)):
+                r = corr[i, j]
+                if np.isfinite(r) and abs(r) >= threshold:
+                    pairs.append((str(self.corr_columns[i]), str(self.corr_columns[j]), float(r)))
+        pairs.sort(key=lambda pair: abs(pair[2]), reverse=True)
+        return pairs[:limit]
+
+    def result(self):
+        return {
+            "rows": self.rows,
+            "columns": [stats.summary() for stats in self.columns.values()],
+            "correlations": self.correlations(),
+            "head": self.head if self.head is not None else pd.DataFrame(),
+        }
+
+@profiler.timed("file.profile_csv")
+def profile_csv(data):
+    encoding = sniff_encoding(data)
+    column_profiler = Profiler()
+    for chunk in pd.read_csv(io.BytesIO(data), encoding=encoding, chunksize=PROFILE_CHUNK_ROWS):
+        column_profiler.update(chunk)
+    result = column_profiler.result()
+    result["encoding"] = encoding
+    return result
+
+@profiler.timed("file.profile_xlsx")
+def profile_xlsx(data):
+    from openpyxl import load_workbook
+
+    # read_only 모드는 행을 스트리밍으로 읽는다
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        column_profiler = Profiler()
+        if header is not None:
+            columns = [str(c) if c is not None else f"column_{i + 1}" for i, c in enumerate(header)]
+            batch = []
+            for row in rows:
+                batch.append(row[:len(columns)])
+                if len(batch) >= PROFILE_CHUNK_ROWS:
+                    column_profiler.update(pd.DataFrame(batch, columns=columns).infer_objects())
+                    batch = []
+            if batch:
+                column_profiler.update(pd.DataFrame(batch, columns=columns).infer_objects())
+        result = column_profiler.result()
+        result["sheet"] = sheet.title
+        return result
+    finally:
+        workbook.close()
+
+def _fmt(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        if not np.isfinite(value):
+            return "-"
+        if abs(value) >= 1000 or value == int(value):
+            return f"{value:,.0f}"
+        return f"{value:,.3g}"
+    return str(value)
+
+def format_profile(profile, name, preview_rows=5):
+    lines = [f"📊 데이터 프로파일: {name} (총 {profile['rows']:,}행 × {len(profile['columns'])}열, 전체 데이터 기준)"]
+    lines.append("| 컬럼 | 유형 | 결측률 | 통계 / 상위 값 |")
+    lines.append("|---|---|---|---|")
+    for column in profile["columns"]:
+        if "mean" in column:
+            stats = (f"평균 {_fmt(column['mean'])}, 표준편차 {_fmt(column['std'])}, "
+                     f"최소 {_fmt(column['min'])}, 사분위 {_fmt(column['p25'])}/{_fmt(column['p50'])}/{_fmt(column['p75'])}, "
+                     f"최대 {_fmt(column['max'])}")
+        elif "top" in column:
+            top = ", ".join(f"{value}({count:,})" for value, count in column["top"])
+            stats = f"고유값 {column['distinct']:,}개 · 상위: {top}"
+        else:
+            stats = "-"
+        lines.append(f"| {column['name']} | {column['kind']} ({column['dtype']}) | {column['null_rate'] * 100:.1f}% | {stats} |")
+
+    if profile["correlations"]:
+        lines.append("")
+        lines.append("상관관계 (|r| ≥ 0.3): " + ", ".join(f"{a}~{b} r={r:.2f}" for a, b, r in profile["correlations"]))
+
+    head = profile["head"]
+    if preview_rows and not head.empty:
+        lines.append("")
+        lines.append(f"미리보기 (앞 {min(preview_rows, len(head))}행):")
+        lines.append(head.head(preview_rows).to_markdown(index=False))
+    return "\n".join(lines)
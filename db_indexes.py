@@ -0,0 +1,226 @@
+# chat_db 인덱스 부트스트랩 및 쿼리 플랜 점검
+#
+#   python db_indexes.py           # 인덱스 생성
+#   python db_indexes.py --check   # 인덱스 생성 후 핫 쿼리 explain 점검 (실패 시 exit 1)
+from datetime import datetime
+import os
+import threading
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+import chat_schema
+
+CHAT_INDEXES = [
+    # get_chat_history: 세션 없이 기록된 메시지 {email} + sort timestamp
+    IndexModel([("email", ASCENDING), ("timestamp", DESCENDING)],
+               name="history_by_email"),
+    # delete_chat_session: 지우려는 이미지를 다른 메시지가 아직 참조하는지
+    IndexModel([("content.image_url.url", ASCENDING)], name="messages_by_image",
+               partialFilterExpression={"content.image_url.url": {"$exists": True}}),
+]
+
+SESSION_INDEXES = [
+    # get_user_sessions: {email} + sort updated_at
+    IndexModel([("email", ASCENDING), ("updated_at", DESCENDING)], name="sessions_by_user"),
+]
+
+BUCKET_INDEXES = [
+    # get_session_messages(_page) / count / delete / write-behind 버킷 추가: {session_id} + sort (first_at, _id)
+    IndexModel([("session_id", ASCENDING), ("first_at", ASCENDING), ("_id", ASCENDING)],
+               name="buckets_by_session"),
+    # get_chat_history: {email} + sort last_at
+    IndexModel([("email", ASCENDING), ("last_at", DESCENDING)], name="buckets_by_email"),
+    # delete_chat_session: 지우려는 이미지를 다른 세션의 버킷이 아직 참조하는지
+    IndexModel([("messages.content.image_url.url", ASCENDING)], name="buckets_by_image",
+               partialFilterExpression={"messages.content.image_url.url": {"$exists": True}}),
+]
+
+# 더 넓은 인덱스로 대체되어 남겨둘 필요가 없는 인덱스
+RETIRED_CHAT_INDEXES = ["messages_by_session"]
+# 스키마 분리 이전 인덱스. migrate_schema.py 가 옮긴 뒤 --drop-legacy 로 지운다 (이전 데이터를 읽는 데 필요).
+LEGACY_CHAT_INDEXES = ["sessions_by_user", "session_messages_page"]
+LEGACY_LOGIN_INDEXES = ["login_token_lookup", "revoked_tokens", "login_token_ttl"]
+
+CACHE_INDEXES = [
+    # result_cache 문서는 expires_at 시각에 자동 삭제
+    IndexModel([("expires_at", ASCENDING)], name="cache_ttl", expireAfterSeconds=0),
+]
+
+LOGIN_INDEXES = [
+    IndexModel([("email", ASCENDING), ("login_time", DESCENDING)], name="logins_by_email"),
+]
+
+TOKEN_INDEXES = [
+    # validate_login_token (이전 방식 토큰): {token, expires_at}
+    IndexModel([("token", ASCENDING), ("expires_at", ASCENDING)], name="login_token_lookup",
+               partialFilterExpression={"token": {"$exists": True}}),
+    # 서명 토큰 폐기 목록 동기화: {revoked, revoked_at}
+    IndexModel([("revoked_at", ASCENDING)], name="revoked_tokens",
+               partialFilterExpression={"revoked": True}),
+    # 만료된 토큰/폐기 기록은 expires_at 시각에 자동 삭제
+    IndexModel([("expires_at", ASCENDING)], name="login_token_ttl", expireAfterSeconds=0),
+]
+
+# (이름, 필터, 정렬, 기대 인덱스, 대상 컬렉션) - db_service 의 쿼리 모양과 같아야 한다.
+HOT_QUERIES = [
+    ("get_user_sessions",
+     {"email": "explain@example.com"},
+     [("updated_at", DESCENDING)],
+     "sessions_by_user", "sessions"),
+    ("get_session_messages",
+     {"session_id": "000000000000000000000000"},
+     [("first_at", ASCENDING), ("_id", ASCENDING)],
+     "buckets_by_session", "buckets"),
+    ("get_session_messages_page",
+     {"session_id": "000000000000000000000000"},
+     [("first_at", DESCENDING), ("_id", DESCENDING)],
+     "buckets_by_session", "buckets"),
+    ("get_chat_history",
+     {"email": "explain@example.com"},
+     [("last_at", DESCENDING)],
+     "buckets_by_email", "buckets"),
+    ("get_chat_history (no session)",
+     {"email": "explain@example.com", "type": "message", "session_id": {"$exists": False}},
+     [("timestamp", DESCENDING)],
+     "history_by_email", "chat"),
+    ("delete_chat_session (shared images)",
+     {"messages.content.image_url.url": {"$in": ["gridfs://explain"], "$exists": True}},
+     None,
+     "buckets_by_image", "buckets"),
+    ("delete_chat_session (shared images, no session)",
+     {"content.image_url.url": {"$in": ["gridfs://explain"], "$exists": True}},
+     None,
+     "messages_by_image", "chat"),
+    ("validate_login_token",
+     {"token": "explain", "expires_at": {"$gt": datetime(2000, 1, 1)}},
+     None,
+     "login_token_lookup", "tokens"),
+]
+
+VERIFY_ON_STARTUP = os.getenv("MONGO_VERIFY_INDEXES", "").lower() in ("1", "true", "yes")
+# 옮기지 않은 이전 스키마 데이터가 있으면 앱을 시작하지 않는다 (db_service 는 새 컬렉션만 읽는다)
+CHECK_MIGRATION = os.getenv("MONGO_CHECK_MIGRATION", "1").lower() in ("1", "true", "yes")
+
+_ensured = False
+_ensure_lock = threading.Lock()
+
+def drop_indexes(collection, names):
+    existing = collection.index_information()
+    for name in names:
+        if name in existing:
+            collection.drop_index(name)
+
+def ensure_indexes(login_collection, chat_collection, cache_collection=None):
+    created = []
+    if chat_collection is not None:
+        created += chat_collection.create_indexes(CHAT_INDEXES)
+        drop_indexes(chat_collection, RETIRED_CHAT_INDEXES)
+        created += chat_schema.sessions(chat_collection).create_indexes(SESSION_INDEXES)
+        created += chat_schema.message_buckets(chat_collection).create_indexes(BUCKET_INDEXES)
+    if login_collection is not None:
+        created += login_collection.create_indexes(LOGIN_INDEXES)
+        created += chat_schema.login_tokens(login_collection).create_indexes(TOKEN_INDEXES)
+    if cache_collection is not None:
+        created += cache_collection.create_indexes(CACHE_INDEXES)
+    return created
+
+def check_migrated(chat_collection):
+    # 순환 import 를 피하려고 여기서 불러온다 (migrate_schema 가 이 모듈을 쓴다)
+    import migrate_schema
+
+    try:
+        pending = migrate_schema.unmigrated_sessions(chat_collection)
+    except Exception as e:
+        print(f"마이그레이션 상태 확인 실패: {str(e)}")
+        return
+    if pending:
+        raise RuntimeError(
+            "chat_messages 에 옮기지 않은 이전 세션이 있습니다 "
+            f"({', '.join(pending)} ...). 앱을 멈추고 python migrate_schema.py 를 먼저 실행하세요."
+        )
+
+def ensure_indexes_once(login_collection, chat_collection, cache_collection=None):
+    # 프로세스당 한 번만 실행 (create_indexes 는 멱등이지만 리런마다 왕복할 필요는 없음)
+    global _ensured
+    if _ensured or chat_collection is None:
+        return
+    with _ensure_lock:
+        if _ensured:
+            return
+        if CHECK_MIGRATION:
+            check_migrated(chat_collection)
+        try:
+            ensure_indexes(login_collection, chat_collection, cache_collection)
+            if VERIFY_ON_STARTUP:
+                check_query_plans(chat_collection, login_collection)
+            _ensured = True
+        except Exception as e:
+            print(f"인덱스 생성 실패: {str(e)}")
+            if VERIFY_ON_STARTUP:
+                raise
+
+def _plan_stages(plan):
+    # winningPlan 트리를 순회하며 stage 노드를 모은다 (classic / SBE / sharded 공통)
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan)
+        for value in plan.values():
+            if isinstance(value, (dict, list)):
+                stages += _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            stages += _plan_stages(item)
+    return stages
+
+def explain_query(collection, query_filter, sort=None):
+    cursor = collection.find(query_filter)
+    if sort:
+        cursor = cursor.sort(sort)
+    explain = cursor.limit(20).explain()
+    winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+    stages = _plan_stages(winning)
+    return {
+        "winning_plan": winning,
+        "stages": [s["stage"] for s in stages],
+        "indexes": [s["indexName"] for s in stages if "indexName" in s],
+    }
+
+def check_query_plans(chat_collection, login_collection=None, queries=None):
+    targets = {"chat": chat_collection}
+    if chat_collection is not None:
+        targets["sessions"] = chat_schema.sessions(chat_collection)
+        targets["buckets"] = chat_schema.message_buckets(chat_collection)
+    if login_collection is not None:
+        targets["tokens"] = chat_schema.login_tokens(login_collection)
+    failures = []
+    for name, query_filter, sort, expected_index, target in queries or HOT_QUERIES:
+        if targets.get(target) is None:
+            continue
+        plan = explain_query(targets[target], query_filter, sort)
+        if "COLLSCAN" in plan["stages"]:
+            failures.append(f"{name}: COLLSCAN (stages={plan['stages']})")
+        elif expected_index not in plan["indexes"]:
+            failures.append(f"{name}: 기대 인덱스 {expected_index} 대신 {plan['indexes']} 사용")
+        elif sort and "SORT" in plan["stages"]:
+            failures.append(f"{name}: 인메모리 SORT 발생 (stages={plan['stages']})")
+
+    if failures:
+        raise RuntimeError("핫 쿼리가 인덱스를 사용하지 않습니다:\n  " + "\n  ".join(failures))
+    return True
+
+if __name__ == "__main__":
+    import sys
+    from mongo_utils import get_mongo_collections, get_cache_collection
+
+    login_collection, chat_collection = get_mongo_collections()
+    if chat_collection is None:
+        sys.exit("MONGO_URI 가 설정되지 않았습니다.")
+
+    print("생성/확인된 인덱스:", ensure_indexes(login_collection, chat_collection, get_cache_collection()))
+    if "--check" in sys.argv:
+        try:
+            check_query_plans(chat_collection, login_collection)
+        except RuntimeError as e:
+            sys.exit(str(e))
+        print("모든 핫 쿼리가 기대 인덱스를 사용합니다.")
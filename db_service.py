@@ -1,4 +1,21 @@
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import os
+import threading
+import time
+from write_behind import chat_writer
+import chat_schema
+import image_pipeline
+import login_tokens
+import profiler
+
+# 사이드바 세션 목록 캐시 (사용자별). 세션 생성/삭제/제목변경/메시지 기록 시 갱신된다.
+SESSION_LIST_CACHE_TTL = float(os.getenv("SESSION_LIST_CACHE_TTL", "300"))
+SESSION_LIST_CACHE_MAX_USERS = int(os.getenv("SESSION_LIST_CACHE_MAX_USERS", "1024"))
+SESSION_LIST_PROJECTION = {"title": 1, "created_at": 1, "updated_at": 1}
+
+_session_list_cache = OrderedDict()
+_session_list_lock = threading.Lock()
 
 def log_user_login(collection, user_info):
     collection.insert_one({
@@ -8,71 +25,216 @@ def log_user_login(collection, user_info):
         "login_time": datetime.now()
     })
 
-def log_chat_message(collection, role, content, user_info):
-    collection.insert_one({
-        "role": role,
-        "content": content,
-        "email": user_info.get("email", "anonymous"),
-        "name": user_info.get("name", "익명"),
-        "timestamp": datetime.now()
-    })
+def flush_pending_writes(timeout=10.0):
+    return chat_writer.flush(timeout)
+
+def get_write_queue_stats():
+    return chat_writer.stats()
 
+def _read_your_writes():
+    # 아직 큐에 남아있는 메시지가 있으면 읽기 전에 먼저 반영한다
+    if chat_writer.pending():
+        chat_writer.flush()
+
+@profiler.timed("db.get_chat_history")
 def get_chat_history(collection, user_email, limit=50):
-    cursor = collection.find({"email": user_email}).sort("timestamp", -1).limit(limit)
-    
+    _read_your_writes()
+    # 최근에 갱신된 버킷부터, 남은 버킷이 지금까지 모은 최신 limit 개보다 오래될 때까지 모은다.
+    # timestamp 는 ms 단위라 같은 배치의 메시지끼리 겹칠 수 있어 버킷 순서/위치로 동점을 가른다.
+    found = []
+    cursor = chat_schema.message_buckets(collection).find(
+        {"email": user_email}, {"messages": {"$slice": -limit}, "first_at": 1, "last_at": 1}
+    ).sort("last_at", -1)
+    for bucket in cursor:
+        if len(found) >= limit and bucket["last_at"] < found[limit - 1][0][0]:
+            break
+        found += [
+            ((doc["timestamp"], bucket["first_at"], bucket["_id"], index), doc)
+            for index, doc in enumerate(bucket["messages"])
+        ]
+        found = sorted(found, key=lambda item: item[0], reverse=True)[:limit]
+
+    # 세션 없이 기록된 메시지는 chat_messages 에 그대로 있다
+    for doc in collection.find(
+        {"email": user_email, "type": "message", "session_id": {"$exists": False}}, MESSAGE_PROJECTION
+    ).sort("timestamp", -1).limit(limit):
+        found.append(((doc["timestamp"],), doc))
+    found = sorted(found, key=lambda item: item[0])[-limit:]
+
     messages = []
-    for doc in cursor:
+    for _, doc in found:
         messages.append({
             "role": doc["role"],
             "content": doc["content"]
         })
-    
-    return messages[::-1]
+    return messages
 
+@profiler.timed("db.create_chat_session")
 def create_chat_session(collection, user_email, title=None):
     if not title:
         title = "새로운 대화"
         
     session = {
-        "type": "session",
         "email": user_email,
         "title": title,
         "created_at": datetime.now(),
         "updated_at": datetime.now()
     }
-    result = collection.insert_one(session)
+    result = chat_schema.sessions(collection).insert_one(session)
+    invalidate_user_sessions(user_email=user_email)
     return str(result.inserted_id)
 
+def invalidate_user_sessions(user_email=None, session_id=None):
+    with _session_list_lock:
+        for key in list(_session_list_cache):
+            email, _ = key
+            _, sessions = _session_list_cache[key]
+            if (user_email is not None and email == user_email) or \
+               (session_id is not None and any(session["id"] == session_id for session in sessions)):
+                del _session_list_cache[key]
+
+def _touch_cached_session(user_email, session_id, updated_at):
+    # 메시지가 기록된 세션을 캐시 안에서 맨 위로 올린다 (Mongo 재조회 없이)
+    with _session_list_lock:
+        for key in list(_session_list_cache):
+            if key[0] != user_email:
+                continue
+            expires_at, sessions = _session_list_cache[key]
+            index = next((i for i, session in enumerate(sessions) if session["id"] == session_id), None)
+            if index is None:
+                del _session_list_cache[key]
+                continue
+            session = dict(sessions[index], updated_at=updated_at)
+            _session_list_cache[key] = (expires_at, [session] + sessions[:index] + sessions[index + 1:])
+
+@profiler.timed("db.get_user_sessions")
 def get_user_sessions(collection, user_email, limit=20):
-    cursor = collection.find({"email": user_email, "type": "session"}).sort("updated_at", -1).limit(limit)
+    key = (user_email, limit)
+    now = time.monotonic()
+    with _session_list_lock:
+        entry = _session_list_cache.get(key)
+        if entry is not None and entry[0] > now:
+            _session_list_cache.move_to_end(key)
+            return list(entry[1])
+
+    _read_your_writes()
+    cursor = chat_schema.sessions(collection).find(
+        {"email": user_email}, SESSION_LIST_PROJECTION
+    ).sort("updated_at", -1).limit(limit)
     sessions = []
     for doc in cursor:
         sessions.append({
             "id": str(doc["_id"]),
             "title": doc.get("title", "새로운 대화"),
-            "created_at": doc["created_at"]
+            "created_at": doc["created_at"],
+            "updated_at": doc.get("updated_at", doc["created_at"])
         })
-    return sessions
 
+    with _session_list_lock:
+        _session_list_cache[key] = (now + SESSION_LIST_CACHE_TTL, sessions)
+        _session_list_cache.move_to_end(key)
+        while len(_session_list_cache) > SESSION_LIST_CACHE_MAX_USERS:
+            _session_list_cache.popitem(last=False)
+    return list(sessions)
+
+MESSAGE_PROJECTION = {"role": 1, "content": 1, "timestamp": 1}
+# 버킷 순서 (오래된 순). 버킷 안의 메시지는 timestamp 순으로 저장된다.
+BUCKET_ORDER = [("first_at", 1), ("_id", 1)]
+
+@profiler.timed("db.get_session_messages")
 def get_session_messages(collection, session_id):
-    cursor = collection.find({"session_id": session_id}).sort("timestamp", 1)
-    
+    _read_your_writes()
+    cursor = chat_schema.message_buckets(collection).find(
+        {"session_id": session_id}, {"messages": 1}
+    ).sort(BUCKET_ORDER)
+
     messages = []
-    for doc in cursor:
+    for bucket in cursor:
+        for doc in bucket["messages"]:
+            messages.append({
+                "role": doc["role"],
+                "content": doc["content"]
+            })
+    return messages
+
+@profiler.timed("db.count_session_messages")
+def count_session_messages(collection, session_id):
+    _read_your_writes()
+    cursor = chat_schema.message_buckets(collection).find({"session_id": session_id}, {"count": 1})
+    return sum(bucket["count"] for bucket in cursor)
+
+@profiler.timed("db.get_session_messages_page")
+def get_session_messages_page(collection, session_id, limit=50, before=None):
+    # 최신 메시지부터 limit 개를 가져와 오래된 순으로 돌려준다.
+    # before 에 이전 페이지의 cursor (버킷 first_at, 버킷 _id, 버킷 안 위치)를 넘기면 그보다 오래된 메시지를 가져온다.
+    _read_your_writes()
+    query = {"session_id": session_id}
+    if before:
+        before_at, before_id, _ = before
+        query["$or"] = [
+            {"first_at": {"$lt": before_at}},
+            {"first_at": before_at, "_id": {"$lte": before_id}}
+        ]
+    cursor = chat_schema.message_buckets(collection).find(
+        query, {"messages": 1, "first_at": 1}
+    ).sort([(field, -1) for field, _ in BUCKET_ORDER])
+
+    # (위치, 메시지) 를 최신 순으로 limit + 1 개까지 모은다
+    found = []
+    for bucket in cursor:
+        entries = bucket["messages"]
+        end = before[2] if before and bucket["_id"] == before[1] else len(entries)
+        for index in range(end - 1, -1, -1):
+            found.append(((bucket["first_at"], bucket["_id"], index), entries[index]))
+        if len(found) > limit:
+            break
+    has_more = len(found) > limit
+    found = found[:limit]
+
+    messages = []
+    for _, doc in reversed(found):
         messages.append({
             "role": doc["role"],
             "content": doc["content"]
         })
-    return messages
+    return {
+        "messages": messages,
+        "cursor": found[-1][0] if found else before,
+        "has_more": has_more
+    }
 
 def update_session_title(collection, session_id, title):
     from bson.objectid import ObjectId
-    collection.update_one(
+    chat_schema.sessions(collection).update_one(
         {"_id": ObjectId(session_id)},
         {"$set": {"title": title}}
     )
+    invalidate_user_sessions(session_id=session_id)
 
-def log_chat_message(collection, role, content, user_info, session_id=None):
+@profiler.timed("db.get_session_summary")
+def get_session_summary(collection, session_id):
+    from bson.objectid import ObjectId
+    doc = chat_schema.sessions(collection).find_one(
+        {"_id": ObjectId(session_id)},
+        {"summary": 1, "summary_upto": 1}
+    )
+    if not doc:
+        return {"summary": "", "summary_upto": 0}
+    return {
+        "summary": doc.get("summary", ""),
+        "summary_upto": doc.get("summary_upto", 0)
+    }
+
+def update_session_summary(collection, session_id, summary, summary_upto):
+    from bson.objectid import ObjectId
+    # 늦게 도착한 이전 요약이 더 최신 요약을 덮어쓰지 않도록 summary_upto 로 보호
+    chat_schema.sessions(collection).update_one(
+        {"_id": ObjectId(session_id), "summary_upto": {"$not": {"$gte": summary_upto}}},
+        {"$set": {"summary": summary, "summary_upto": summary_upto}}
+    )
+
+@profiler.timed("db.log_chat_message")
+def log_chat_message(collection, role, content, user_info, session_id=None, partial=False):
     doc = {
         "type": "message",
         "role": role,
@@ -83,42 +245,96 @@ def log_chat_message(collection, role, content, user_info, session_id=None):
     }
     if session_id:
         doc["session_id"] = session_id
+    if partial:
+        # 스트리밍 도중 끊긴 응답
+        doc["partial"] = True
 
-    collection.insert_one(doc)
-    
+    # 버킷 추가와 세션 updated_at 갱신은 write-behind 큐에서 묶어서 처리한다
+    chat_writer.enqueue_message(collection, doc, session_id)
     if session_id:
-        from bson.objectid import ObjectId
-        collection.update_one(
-            {"_id": ObjectId(session_id)},
-            {"$set": {"updated_at": datetime.now()}}
-        )
+        _touch_cached_session(doc["email"], session_id, doc["timestamp"])
 
+# 메시지 안의 이미지 참조 경로 (db_indexes 의 buckets_by_image / messages_by_image 인덱스)
+BUCKET_IMAGE_FIELD = "messages.content.image_url.url"
+MESSAGE_IMAGE_FIELD = "content.image_url.url"
+
+@profiler.timed("db.delete_chat_session")
 def delete_chat_session(collection, session_id):
     from bson.objectid import ObjectId
-    collection.delete_one({"_id": ObjectId(session_id)})
-    collection.delete_many({"session_id": session_id})
+    _read_your_writes()
+    buckets = chat_schema.message_buckets(collection)
+    refs = set()
+    for bucket in buckets.find({"session_id": session_id}, {"messages.content": 1}):
+        refs |= image_pipeline.image_refs(bucket["messages"])
+    chat_schema.sessions(collection).delete_one({"_id": ObjectId(session_id)})
+    buckets.delete_many({"session_id": session_id})
+    invalidate_user_sessions(session_id=session_id)
+    if refs:
+        # 같은 이미지는 내용 해시로 한 번만 저장되므로, 다른 메시지가 아직 쓰는 것은 남긴다
+        # ($exists 는 partial 인덱스를 쓰게 하려고 같이 넣는다)
+        refs -= set(buckets.distinct(BUCKET_IMAGE_FIELD, {BUCKET_IMAGE_FIELD: {"$in": list(refs), "$exists": True}}))
+        refs -= set(collection.distinct(MESSAGE_IMAGE_FIELD, {MESSAGE_IMAGE_FIELD: {"$in": list(refs), "$exists": True}}))
+        image_pipeline.delete_images(refs)
+
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "60"))
+_last_revocation_sync = None
+_revocation_sync_lock = threading.Lock()
+
+def _sync_revocations(collection):
+    # 다른 프로세스에서 폐기된 토큰을 주기적으로 가져온다 (페이지 로드마다 조회하지 않음)
+    global _last_revocation_sync
+    now = datetime.now()
+    if _last_revocation_sync is not None and (now - _last_revocation_sync).total_seconds() < REVOCATION_SYNC_SECONDS:
+        return
+    with _revocation_sync_lock:
+        since = _last_revocation_sync
+        _last_revocation_sync = now
+    query = {"revoked": True, "expires_at": {"$gt": now}}
+    if since is not None:
+        query["revoked_at"] = {"$gte": since - timedelta(seconds=REVOCATION_SYNC_SECONDS)}
+    try:
+        for doc in chat_schema.login_tokens(collection).find(query, {"jti": 1, "expires_at": 1}):
+            login_tokens.revoke(doc["jti"], doc["expires_at"].timestamp())
+    except Exception as e:
+        print(f"토큰 폐기 목록 동기화 실패: {str(e)}")
 
+@profiler.timed("db.create_login_token")
 def create_login_token(collection, user_info):
+    # 서명 키가 있으면 DB 에 저장하지 않는 서명 토큰을 발급한다
+    if login_tokens.is_enabled():
+        return login_tokens.issue(user_info)
+
     import secrets
-    from datetime import timedelta
     
     token = secrets.token_urlsafe(32)
     expires_at = datetime.now() + timedelta(days=1)
     
     doc = {
-        "type": "login_token",
         "token": token,
         "email": user_info["email"],
         "name": user_info["name"],
         "created_at": datetime.now(),
         "expires_at": expires_at
     }
-    collection.insert_one(doc)
+    chat_schema.login_tokens(collection).insert_one(doc)
     return token
 
+@profiler.timed("db.validate_login_token")
 def validate_login_token(collection, token):
-    doc = collection.find_one({
-        "type": "login_token",
+    if login_tokens.is_signed_token(token):
+        claims = login_tokens.verify(token)
+        if claims is None:
+            return None
+        _sync_revocations(collection)
+        if login_tokens.is_revoked(claims["j"]):
+            return None
+        return {
+            "email": claims["e"],
+            "name": claims["n"]
+        }
+
+    # 이전 방식(DB 저장) 토큰
+    doc = chat_schema.login_tokens(collection).find_one({
         "token": token,
         "expires_at": {"$gt": datetime.now()}
     })
@@ -130,5 +346,21 @@ def validate_login_token(collection, token):
         }
     return None
 
+@profiler.timed("db.delete_login_token")
 def delete_login_token(collection, token):
-    collection.delete_one({"type": "login_token", "token": token})
+    if login_tokens.is_signed_token(token):
+        claims = login_tokens.verify(token)
+        if claims is None:
+            return
+        # 이 프로세스에서는 즉시, 다른 프로세스에는 다음 동기화 때 반영된다
+        login_tokens.revoke(claims["j"], claims["x"])
+        chat_schema.login_tokens(collection).insert_one({
+            "revoked": True,
+            "jti": claims["j"],
+            "email": claims["e"],
+            "revoked_at": datetime.now(),
+            "expires_at": datetime.fromtimestamp(claims["x"])
+        })
+        return
+
+    chat_schema.login_tokens(collection).delete_one({"token": token})
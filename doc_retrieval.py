@@ -0,0 +1,119 @@
+# 첨부 문서용 로컬 BM25 검색 인덱스 (세션별, 네트워크 의존 없음)
+# 문서를 청크로 나눠 역색인을 만들고, 질문마다 관련도가 높은 상위 k 개 청크만 프롬프트에 넣는다.
+import math
+import os
+import re
+from collections import Counter
+
+CHUNK_CHARS = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "800"))
+CHUNK_OVERLAP = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", "150"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+|[가-힣]+")
+
+def tokenize(text):
+    # 형태소 분석기 없이 한국어를 다루기 위해 한글 어절은 글자 bigram 도 함께 색인한다
+    tokens = []
+    for word in _TOKEN_RE.findall(text.lower()):
+        tokens.append(word)
+        if len(word) > 2 and "가" <= word[0] <= "힣":
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+def chunk_text(text, size=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    text = text.strip()
+    if not text:
+        return []
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            # 가능하면 줄바꿈/문장 경계에서 자른다
+            boundary = max(text.rfind("\n", start + size // 2, end), text.rfind(". ", start + size // 2, end))
+            if boundary > start:
+                end = boundary + 1
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [chunk for chunk in chunks if chunk]
+
+def table_chunks(df, rows_per_chunk=20):
+    # 표는 행 묶음 단위로 나누고 각 조각에 헤더를 유지한다
+    chunks = []
+    for start in range(0, len(df), rows_per_chunk):
+        part = df.iloc[start:start + rows_per_chunk]
+        chunks.append(f"(행 {start + 1}~{start + len(part)})\n" + part.to_markdown(index=False))
+    return chunks
+
+class DocumentIndex:
+    def __init__(self):
+        self.chunks = []
+        self.postings = {}
+        self.chunk_lengths = []
+        self.total_length = 0
+        self.documents = {}
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def has_document(self, doc_hash):
+        return doc_hash in self.documents
+
+    def add_document(self, name, text=None, doc_hash=None, chunks=None):
+        """문서를 색인한다. 이미 색인한 문서(doc_hash 기준)는 건너뛴다.
+
+        text 를 주면 CHUNK_CHARS 단위로 자르고, 표처럼 미리 나눈 경우 chunks 를 직접 넘긴다.
+        """
+        key = doc_hash or name
+        if key in self.documents:
+            return 0
+        if chunks is None:
+            chunks = chunk_text(text or "")
+
+        first = len(self.chunks)
+        for chunk in chunks:
+            chunk_id = len(self.chunks)
+            terms = Counter(tokenize(chunk))
+            self.chunks.append({"document": name, "text": chunk})
+            self.chunk_lengths.append(sum(terms.values()))
+            self.total_length += self.chunk_lengths[-1]
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[chunk_id] = tf
+        self.documents[key] = {"name": name, "first_chunk": first, "chunks": len(chunks)}
+        return len(chunks)
+
+    def search(self, query, k=RETRIEVAL_TOP_K):
+        if not self.chunks:
+            return []
+        n = len(self.chunks)
+        avg_length = self.total_length / n if self.total_length else 1.0
+        scores = {}
+        for term, query_tf in Counter(tokenize(query)).items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.chunk_lengths[chunk_id] / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + query_tf * idf * tf * (BM25_K1 + 1) / norm
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [dict(self.chunks[chunk_id], score=round(score, 3), chunk_id=chunk_id) for chunk_id, score in ranked]
+
+    def leading_chunks(self, doc_hash, k=RETRIEVAL_TOP_K):
+        # 검색어와 겹치는 내용이 없을 때(예: "이 파일 요약해줘") 문서 앞부분을 대신 쓴다
+        document = self.documents.get(doc_hash)
+        if not document:
+            return []
+        first = document["first_chunk"]
+        return [dict(self.chunks[i], score=0.0, chunk_id=i) for i in range(first, first + min(k, document["chunks"]))]
+
+def format_chunks(chunks):
+    lines = []
+    for chunk in sorted(chunks, key=lambda c: c["chunk_id"]):
+        lines.append(f"--- ({chunk['document']} #{chunk['chunk_id']}) ---\n{chunk['text']}")
+    return "\n\n".join(lines)
@@ -0,0 +1,228 @@
+# 업로드 이미지 수집 파이프라인
+# 축소/재압축 -> 내용 해시로 중복 제거 -> GridFS 저장. 메시지에는 gridfs://<id> 참조만 남긴다.
+# 세션을 지우면 다른 메시지가 참조하지 않는 이미지도 함께 지운다 (db_service.delete_chat_session).
+from collections import OrderedDict
+import base64
+import hashlib
+import io
+import os
+import threading
+
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1568"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_BUCKET_NAME = os.getenv("IMAGE_BUCKET_NAME", "chat_images")
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_MB", "64")) * 1024 * 1024
+IMAGE_ID_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_ID_CACHE_MAX_ENTRIES", "4096"))
+IMAGE_REF_PREFIX = "gridfs://"
+
+_bucket = None
+_files = None
+_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_bytes = 0
+# 원본 해시 -> GridFS id (LRU). 빠진 항목은 files 컬렉션의 인덱스로 다시 찾는다
+_ids_by_source_hash = OrderedDict()
+
+def configure(db):
+    global _bucket, _files
+    if db is None or _bucket is not None:
+        return
+    import gridfs
+
+    with _lock:
+        if _bucket is not None:
+            return
+        _bucket = gridfs.GridFSBucket(db, bucket_name=IMAGE_BUCKET_NAME)
+        _files = db[f"{IMAGE_BUCKET_NAME}.files"]
+        try:
+            _files.create_index("metadata.source_sha256", name="image_by_source_hash")
+        except Exception as e:
+            print(f"이미지 인덱스 생성 실패: {str(e)}")
+
+def prepare_image(raw_bytes):
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(raw_bytes))
+    source_format = (image.format or "").upper()
+    image = ImageOps.exif_transpose(image)
+    resized = max(image.size) > IMAGE_MAX_DIMENSION
+    if resized:
+        image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    output = io.BytesIO()
+    if has_alpha:
+        image.save(output, format="PNG", optimize=True)
+        mime = "image/png"
+    else:
+        image.convert("RGB").save(output, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+        mime = "image/jpeg"
+    data = output.getvalue()
+
+    # 이미 충분히 작은 원본이 재압축본보다 작으면 원본을 그대로 쓴다
+    source_mime = {"JPEG": "image/jpeg", "PNG": "image/png"}.get(source_format)
+    if not resized and source_mime and len(raw_bytes) <= len(data):
+        data, mime = raw_bytes, source_mime
+
+    return {
+        "data": data,
+        "mime": mime,
+        "width": image.size[0],
+        "height": image.size[1],
+        "sha256": hashlib.sha256(data).hexdigest()
+    }
+
+def to_data_url(data, mime):
+    return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
+
+def _cache_put(image_id, data, mime):
+    global _cache_bytes
+    with _lock:
+        if image_id in _cache:
+            _cache.move_to_end(image_id)
+            return
+        _cache[image_id] = (data, mime)
+        _cache_bytes += len(data)
+        while _cache_bytes > IMAGE_CACHE_MAX_BYTES and len(_cache) > 1:
+            _, (old_data, _) = _cache.popitem(last=False)
+            _cache_bytes -= len(old_data)
+
+def _cached_source_id(source_hash):
+    with _lock:
+        image_id = _ids_by_source_hash.get(source_hash)
+        if image_id is not None:
+            _ids_by_source_hash.move_to_end(source_hash)
+        return image_id
+
+def _remember_source(source_hash, image_id):
+    with _lock:
+        _ids_by_source_hash[source_hash] = image_id
+        _ids_by_source_hash.move_to_end(source_hash)
+        while len(_ids_by_source_hash) > IMAGE_ID_CACHE_MAX_ENTRIES:
+            _ids_by_source_hash.popitem(last=False)
+
+def ingest_image(raw_bytes):
+    """업로드된 원본 바이트를 처리해 {"url", "data", "mime"} 를 돌려준다.
+
+    GridFS 가 설정돼 있으면 url 은 gridfs://<id> 참조, 아니면 data URL 이다.
+    같은 원본은 다시 처리/업로드하지 않는다.
+    """
+    source_hash = hashlib.sha256(raw_bytes).hexdigest()
+
+    if _bucket is not None:
+        image_id = _cached_source_id(source_hash)
+        if image_id is None:
+            existing = _files.find_one({"metadata.source_sha256": source_hash}, {"_id": 1})
+            if existing:
+                image_id = str(existing["_id"])
+        if image_id is not None:
+            try:
+                data, mime = load_image(image_id)
+            except Exception as e:
+                # 그 사이 세션 삭제로 지워졌으면 새로 올린다
+                print(f"이미지 재사용 실패, 다시 저장: {str(e)}")
+                image_id = None
+        if image_id is not None:
+            _remember_source(source_hash, image_id)
+            return {"url": IMAGE_REF_PREFIX + image_id, "data": data, "mime": mime}
+
+    prepared = prepare_image(raw_bytes)
+    if _bucket is None:
+        return {"url": to_data_url(prepared["data"], prepared["mime"]), "data": prepared["data"], "mime": prepared["mime"]}
+
+    file_id = _bucket.upload_from_stream(
+        prepared["sha256"],
+        prepared["data"],
+        metadata={
+            "source_sha256": source_hash,
+            "sha256": prepared["sha256"],
+            "mime": prepared["mime"],
+            "width": prepared["width"],
+            "height": prepared["height"]
+        }
+    )
+    image_id = str(file_id)
+    _remember_source(source_hash, image_id)
+    _cache_put(image_id, prepared["data"], prepared["mime"])
+    return {"url": IMAGE_REF_PREFIX + image_id, "data": prepared["data"], "mime": prepared["mime"]}
+
+def is_image_ref(url):
+    return isinstance(url, str) and url.startswith(IMAGE_REF_PREFIX)
+
+def load_image(image_id):
+    # 화면에 그리거나 모델에 보낼 때만 GridFS 에서 가져온다 (LRU 캐시)
+    with _lock:
+        entry = _cache.get(image_id)
+        if entry is not None:
+            _cache.move_to_end(image_id)
+            return entry
+    if _bucket is None:
+        raise RuntimeError("이미지 저장소(GridFS)가 설정되지 않았습니다.")
+
+    from bson.objectid import ObjectId
+
+    stream = _bucket.open_download_stream(ObjectId(image_id))
+    data = stream.read()
+    mime = (stream.metadata or {}).get("mime", "image/jpeg")
+    _cache_put(image_id, data, mime)
+    return data, mime
+
+def load_image_from_url(url):
+    if is_image_ref(url):
+        return load_image(url[len(IMAGE_REF_PREFIX):])[0]
+    return url
+
+def inline_image_refs(messages):
+    # OpenAI 로 보내기 직전에 gridfs:// 참조를 data URL 로 바꾼다 (원본 목록은 건드리지 않음)
+    result = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list) and any(
+            item.get("type") == "image_url" and is_image_ref(item["image_url"]["url"]) for item in content
+        ):
+            new_content = []
+            for item in content:
+                if item.get("type") == "image_url" and is_image_ref(item["image_url"]["url"]):
+                    data, mime = load_image(item["image_url"]["url"][len(IMAGE_REF_PREFIX):])
+                    item = {"type": "image_url", "image_url": {"url": to_data_url(data, mime)}}
+                new_content.append(item)
+            message = dict(message, content=new_content)
+        result.append(message)
+    return result
+
+def image_refs(messages):
+    """메시지 목록에 들어 있는 gridfs:// 참조."""
+    refs = set()
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            refs.update(
+                item["image_url"]["url"] for item in content
+                if item.get("type") == "image_url" and is_image_ref(item["image_url"]["url"])
+            )
+    return refs
+
+def delete_images(refs):
+    # 참조하는 메시지가 더 없는지는 호출하는 쪽에서 확인한다
+    global _cache_bytes
+    if _bucket is None or not refs:
+        return 0
+    import gridfs.errors
+    from bson.objectid import ObjectId
+
+    image_ids = {ref[len(IMAGE_REF_PREFIX):] for ref in refs if is_image_ref(ref)}
+    deleted = 0
+    for image_id in image_ids:
+        try:
+            _bucket.delete(ObjectId(image_id))
+            deleted += 1
+        except gridfs.errors.NoFile:
+            pass
+    with _lock:
+        for image_id in image_ids:
+            entry = _cache.pop(image_id, None)
+            if entry is not None:
+                _cache_bytes -= len(entry[0])
+        for source_hash in [key for key, image_id in _ids_by_source_hash.items() if image_id in image_ids]:
+            del _ids_by_source_hash[source_hash]
+    return deleted
@@ -0,0 +1,216 @@
+# 프로세스 전체에서 공유하는 OpenAI 클라이언트
+# - keep-alive 커넥션 풀을 재사용하고 타임아웃을 건다
+# - 429/5xx/연결 오류는 지터를 준 지수 백오프로 제한된 횟수만 재시도한다 (Retry-After 우선)
+# - 프로세스 전체 동시 호출 수를 세마포어로 제한해, 사용자가 몰리면 실패 대신 대기/안내로 처리한다
+# openai 패키지는 import 비용이 커서 처음 클라이언트가 필요할 때 불러온다.
+import atexit
+import os
+import random
+import threading
+import time
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+
+_clients = {}
+_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "retries": 0, "errors": 0, "rejected": 0, "in_flight": 0, "waiting": 0, "max_wait_ms": 0.0}
+
+class LLMBusyError(RuntimeError):
+    # 동시 호출 한도에서 LLM_QUEUE_TIMEOUT 이상 기다린 경우
+    pass
+
+def _bump(key, delta=1):
+    with _stats_lock:
+        _stats[key] += delta
+
+def _acquire():
+    _bump("waiting")
+    started = time.monotonic()
+    try:
+        acquired = _slots.acquire(timeout=LLM_QUEUE_TIMEOUT)
+    finally:
+        _bump("waiting", -1)
+    waited_ms = (time.monotonic() - started) * 1000
+    with _stats_lock:
+        _stats["max_wait_ms"] = max(_stats["max_wait_ms"], round(waited_ms, 1))
+    if not acquired:
+        _bump("rejected")
+        raise LLMBusyError("지금 AI 요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해 주세요.")
+    _bump("in_flight")
+
+def _release():
+    _bump("in_flight", -1)
+    _slots.release()
+
+def _is_retryable(error):
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+def _retry_after(error):
+    # 서버가 알려준 대기 시간 (retry-after-ms, retry-after 초 또는 HTTP 날짜)
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        # HTTP 날짜 형식은 드물고 email.utils import 가 무거워서 필요할 때만 불러온다
+        from email.utils import parsedate_to_datetime
+
+        try:
+            return parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+
+def _backoff(attempt, error):
+    delay = _retry_after(error)
+    if delay is None or delay < 0:
+        # full jitter: 0 ~ base * 2^attempt 사이에서 무작위
+        delay = random.uniform(0, LLM_RETRY_BASE_DELAY * (2 ** attempt))
+    return min(delay, LLM_RETRY_MAX_DELAY)
+
+class _LimitedStream:
+    """스트리밍 응답이 끝나거나 닫힐 때까지 동시 호출 슬롯을 잡고 있는다."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._released = False
+
+    def _finish(self):
+        if not self._released:
+            self._released = True
+            _release()
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self._finish()
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        self._finish()
+
+def _call(create, kwargs):
+    _bump("calls")
+    attempt = 0
+    while True:
+        _acquire()
+        try:
+            result = create(**kwargs)
+        except Exception as e:
+            _release()
+            if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                _bump("errors")
+                raise
+            # 기다리는 동안에는 슬롯을 다른 요청에 양보한다
+            time.sleep(_backoff(attempt, e))
+            attempt += 1
+            _bump("retries")
+            continue
+
+        if kwargs.get("stream"):
+            return _LimitedStream(result)
+        _release()
+        return result
+
+class _Completions:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, **kwargs):
+        return _call(self._client.chat.completions.create, kwargs)
+
+class _Chat:
+    def __init__(self, client):
+        self.completions = _Completions(client)
+
+class LLMClient:
+    """chat.completions.create 에 재시도/동시성 제한을 씌운 OpenAI 클라이언트 래퍼."""
+
+    def __init__(self, client):
+        self._client = client
+        self.chat = _Chat(client)
+
+    def with_options(self, **options):
+        # 커넥션 풀은 그대로 공유하고 옵션(timeout 등)만 바꾼 복사본
+        return LLMClient(self._client.with_options(**options))
+
+    def __getattr__(self, name):
+        # 감싸지 않은 다른 API 는 원래 클라이언트로 넘긴다
+        return getattr(self._client, name)
+
+def _create_openai_client(api_key):
+    # HTTP 클라이언트 타입은 SDK 가 내보내는 것만 쓴다 (SDK 버전에 따라 내부 HTTP 패키지가 다르다)
+    from openai import DEFAULT_CONNECTION_LIMITS, DefaultHttpxClient, OpenAI, Timeout
+
+    Limits = type(DEFAULT_CONNECTION_LIMITS)
+    timeout = Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+    http_client = DefaultHttpxClient(
+        limits=Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+        ),
+        timeout=timeout
+    )
+    # 재시도는 _call 에서 직접 하므로 SDK 자체 재시도는 끈다
+    return OpenAI(api_key=api_key, http_client=http_client, max_retries=0, timeout=timeout)
+
+def get_client(api_key):
+    client = _clients.get(api_key)
+    if client is None:
+        with _lock:
+            client = _clients.get(api_key)
+            if client is None:
+                client = LLMClient(_create_openai_client(api_key))
+                _clients[api_key] = client
+    return client
+
+def stats():
+    with _stats_lock:
+        return dict(_stats, max_concurrency=LLM_MAX_CONCURRENCY)
+
+def close_clients():
+    with _lock:
+        for client in _clients.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+        _clients.clear()
+
+atexit.register(close_clients)
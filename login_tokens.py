@@ -0,0 +1,84 @@
+# HMAC 서명 로그인 토큰
+# 토큰 자체에 email/name/만료시각이 들어 있어 DB 조회 없이 검증한다.
+# 로그아웃된 토큰은 메모리의 폐기 목록(TTL)으로 막는다. LOGIN_TOKEN_SECRET 이 있을 때만 켜진다.
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+
+TOKEN_VERSION = "v1"
+LOGIN_TOKEN_TTL_SECONDS = int(os.getenv("LOGIN_TOKEN_TTL_SECONDS", str(24 * 3600)))
+
+# 버전.페이로드.서명 (base64url 문자만 허용)
+_TOKEN_RE = re.compile(r"[A-Za-z0-9]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+")
+
+_revoked = {}
+_revoked_lock = threading.Lock()
+
+def _secret():
+    # 전용 비밀키만 쓴다 (OAuth client secret 을 재사용하면 그 키를 교체할 때 모두 로그아웃된다).
+    # 없으면 서명 토큰을 끄고 DB 토큰 방식으로 동작한다
+    return os.getenv("LOGIN_TOKEN_SECRET", "").strip().encode("utf-8")
+
+def is_enabled():
+    return bool(_secret())
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(message):
+    return _b64encode(hmac.new(_secret(), message.encode("ascii"), hashlib.sha256).digest())
+
+def is_signed_token(token):
+    return isinstance(token, str) and token.startswith(TOKEN_VERSION + ".")
+
+def issue(user_info, ttl=LOGIN_TOKEN_TTL_SECONDS):
+    claims = {
+        "e": user_info["email"],
+        "n": user_info["name"],
+        "x": int(time.time()) + ttl,
+        "j": secrets.token_urlsafe(12)
+    }
+    payload = _b64encode(json.dumps(claims, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    message = f"{TOKEN_VERSION}.{payload}"
+    return f"{message}.{_sign(message)}"
+
+def verify(token):
+    # 서명/만료가 유효하면 claims, 아니면 None (폐기 여부는 is_revoked 로 따로 확인)
+    if not is_signed_token(token) or not is_enabled():
+        return None
+    # URL 로 들어온 값이라 비 ASCII/깨진 토큰은 서명 계산 전에 걸러낸다
+    if not _TOKEN_RE.fullmatch(token):
+        return None
+    version, payload, signature = token.split(".")
+    try:
+        if not hmac.compare_digest(signature, _sign(f"{version}.{payload}")):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(claims, dict) or not isinstance(claims.get("x"), (int, float)):
+        return None
+    if claims["x"] <= time.time():
+        return None
+    return claims
+
+def revoke(jti, expires_at):
+    with _revoked_lock:
+        _revoked[jti] = expires_at
+
+def is_revoked(jti):
+    now = time.time()
+    with _revoked_lock:
+        # 만료된 토큰은 어차피 검증에서 걸러지므로 목록에서 뺀다
+        for key in [key for key, expires_at in _revoked.items() if expires_at <= now]:
+            del _revoked[key]
+        return jti in _revoked
@@ -0,0 +1,258 @@
+# chat_messages 한 컬렉션에 섞여 있던 세션/메시지와 login_logs 의 로그인 토큰을
+# chat_sessions / chat_message_buckets / login_tokens 로 옮긴다 (chat_schema.py 참고).
+#
+#   python migrate_schema.py --dry-run      # 옮길 문서 수만 센다
+#   python migrate_schema.py                # 옮긴다
+#   python migrate_schema.py --drop-legacy  # 옮긴 뒤 개수를 검증하고 이전 문서/인덱스를 지운다
+#
+# 이미 버킷이 있는 세션은 버킷에 없는 이전 메시지만 timestamp 순으로 합쳐서 버킷을 다시 만들고,
+# 빠진 메시지가 없으면 건드리지 않는다. 그래서 다시 실행해도 새 스키마에 기록된 메시지는 지워지지 않는다.
+# 합치는 동안 같은 세션에 새 메시지가 붙으면 놓칠 수 있으므로 앱을 멈춘 상태에서 실행한다.
+# 앱은 시작할 때 옮기지 않은 이전 세션이 남아 있으면 뜨지 않는다 (db_indexes.check_migrated).
+from datetime import datetime
+import argparse
+import json
+import sys
+
+from pymongo import ReplaceOne
+
+import chat_schema
+import db_indexes
+
+BATCH_SIZE = 1000
+
+def _copy(source, target, query, dry_run):
+    # type 필드만 빼고 _id 그대로 upsert 하므로 여러 번 실행해도 중복되지 않는다
+    copied = 0
+    requests = []
+    for doc in source.find(query):
+        doc.pop("type", None)
+        requests.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+        copied += 1
+        if len(requests) >= BATCH_SIZE:
+            if not dry_run:
+                target.bulk_write(requests, ordered=False)
+            requests = []
+    if requests and not dry_run:
+        target.bulk_write(requests, ordered=False)
+    return copied
+
+def migrate_sessions(chat_collection, dry_run=False):
+    return _copy(chat_collection, chat_schema.sessions(chat_collection), {"type": "session"}, dry_run)
+
+def migrate_login_tokens(login_collection, dry_run=False):
+    # 이미 만료된 토큰/폐기 기록은 옮기지 않는다
+    query = {"type": "login_token", "expires_at": {"$gt": datetime.now()}}
+    return _copy(login_collection, chat_schema.login_tokens(login_collection), query, dry_run)
+
+def _message_key(entry):
+    # 버킷 메시지에는 _id 가 없으므로 내용으로 같은 메시지인지 판단한다
+    return (entry["timestamp"], entry["role"], json.dumps(entry["content"], ensure_ascii=False, sort_keys=True, default=str))
+
+def merge_session(legacy_docs, existing_buckets):
+    """이미 있는 버킷과 이전 메시지를 합친 메시지 목록. 새로 쓸 것이 없으면 None."""
+    existing = [entry for bucket in existing_buckets for entry in bucket["messages"]]
+    merged = []
+    seen = set()
+    changed = False
+    for position, entry in enumerate(existing + [chat_schema.bucket_entry(doc) for doc in legacy_docs]):
+        key = _message_key(entry)
+        if key in seen:
+            # 버킷 안의 중복은 이전 실행이 옛 버킷을 지우기 전에 멈춘 경우다
+            changed = changed or position < len(existing)
+            continue
+        seen.add(key)
+        merged.append(entry)
+        changed = changed or position >= len(existing)
+    if not changed:
+        return None
+    # 같은 timestamp 끼리는 기존 버킷 순서, 그다음 이전 메시지 순서를 유지한다
+    merged.sort(key=lambda entry: entry["timestamp"])
+    return merged
+
+def migrate_messages(chat_collection, bucket_size=chat_schema.CHAT_BUCKET_SIZE, dry_run=False,
+                     max_bytes=chat_schema.CHAT_BUCKET_MAX_BYTES):
+    buckets = chat_schema.message_buckets(chat_collection)
+    # 이전 session_messages_page 인덱스 순서대로 읽으면 세션별 메시지가 연속해서 나온다
+    cursor = chat_collection.find({"session_id": {"$exists": True}}).sort(
+        [("session_id", 1), ("timestamp", 1), ("_id", 1)]
+    )
+    stats = {"messages": 0, "sessions": 0, "buckets": 0, "skipped": 0}
+    pending = {}
+
+    def flush():
+        if not pending:
+            return
+        existing = {}
+        for bucket in buckets.find({"session_id": {"$in": list(pending)}}).sort(
+            [("session_id", 1), ("first_at", 1), ("_id", 1)]
+        ):
+            existing.setdefault(bucket["session_id"], []).append(bucket)
+
+        new_buckets = []
+        stale_ids = []
+        for session_id, docs in pending.items():
+            session_buckets = existing.get(session_id, [])
+            merged = merge_session(docs, session_buckets)
+            if merged is None:
+                stats["skipped"] += 1
+                continue
+            first = session_buckets[0] if session_buckets else docs[0]
+            parts = chat_schema.split_docs(merged, bucket_size, max_bytes)
+            for i, part in enumerate(parts):
+                new_buckets.append(chat_schema.new_bucket(
+                    session_id, first.get("email", "anonymous"), first.get("name", "익명"), part, i == len(parts) - 1
+                ))
+            stale_ids += [bucket["_id"] for bucket in session_buckets]
+            stats["buckets"] += len(parts)
+
+        # 새 버킷을 먼저 넣고 옛 버킷을 지운다 (중간에 멈추면 다음 실행에서 중복을 정리한다)
+        if not dry_run and new_buckets:
+            buckets.insert_many(new_buckets, ordered=False)
+        if not dry_run and stale_ids:
+            buckets.delete_many({"_id": {"$in": stale_ids}})
+        pending.clear()
+
+    session_id = None
+    docs = []
+    pending_messages = 0
+    for doc in cursor:
+        if doc["session_id"] != session_id:
+            if docs:
+                pending[session_id] = docs
+                pending_messages += len(docs)
+                stats["sessions"] += 1
+                if pending_messages >= BATCH_SIZE:
+                    flush()
+                    pending_messages = 0
+            session_id = doc["session_id"]
+            docs = []
+        docs.append(doc)
+        stats["messages"] += 1
+    if docs:
+        pending[session_id] = docs
+        stats["sessions"] += 1
+    flush()
+    return stats
+
+def verify(chat_collection, login_collection):
+    # 새 컬렉션에 이전 문서 수 이상이 들어갔는지 확인한다 (마이그레이션 이후 새로 기록된 것은 더 많을 수 있음)
+    failures = []
+    legacy_sessions = chat_collection.count_documents({"type": "session"})
+    sessions = chat_schema.sessions(chat_collection).count_documents({})
+    if sessions < legacy_sessions:
+        failures.append(f"세션 {sessions} < 이전 {legacy_sessions}")
+
+    legacy_messages = chat_collection.count_documents({"session_id": {"$exists": True}})
+    totals = list(chat_schema.message_buckets(chat_collection).aggregate(
+        [{"$group": {"_id": None, "messages": {"$sum": "$count"}}}]
+    ))
+    messages = totals[0]["messages"] if totals else 0
+    if messages < legacy_messages:
+        failures.append(f"메시지 {messages} < 이전 {legacy_messages}")
+
+    if login_collection is not None:
+        legacy_tokens = login_collection.count_documents({"type": "login_token", "expires_at": {"$gt": datetime.now()}})
+        tokens = chat_schema.login_tokens(login_collection).count_documents({})
+        if tokens < legacy_tokens:
+            failures.append(f"로그인 토큰 {tokens} < 이전 {legacy_tokens}")
+    return failures
+
+def unmigrated_sessions(chat_collection, limit=10):
+    """아직 새 컬렉션으로 옮겨지지 않은 이전 세션 id (최대 limit 개).
+
+    chat_sessions 에 없는 이전 세션 문서, 이전 메시지 수가 버킷 메시지 수보다 많은 세션을 센다.
+    --drop-legacy 로 이전 문서를 지우고 나면 빈 쿼리 두 번으로 끝난다.
+    """
+    sessions = chat_schema.sessions(chat_collection)
+    missing = []
+    batch = []
+
+    def check_sessions():
+        found = set(sessions.distinct("_id", {"_id": {"$in": batch}}))
+        missing.extend(str(session_id) for session_id in batch if session_id not in found)
+        batch.clear()
+
+    for doc in chat_collection.find({"type": "session"}, {"_id": 1}):
+        batch.append(doc["_id"])
+        if len(batch) >= BATCH_SIZE:
+            check_sessions()
+            if len(missing) >= limit:
+                return missing[:limit]
+    if batch:
+        check_sessions()
+
+    # 세션 문서 _id 는 ObjectId, 메시지의 session_id 는 그 문자열이라 str 로 맞춰 중복을 뺀다
+    missing = list(dict.fromkeys(missing))
+    legacy_counts = {}
+    for row in chat_collection.aggregate([
+        {"$match": {"session_id": {"$exists": True}}},
+        {"$group": {"_id": "$session_id", "count": {"$sum": 1}}},
+    ]):
+        legacy_counts[row["_id"]] = row["count"]
+        if len(legacy_counts) >= BATCH_SIZE:
+            missing = list(dict.fromkeys(missing + _short_sessions(chat_collection, legacy_counts)))
+            legacy_counts = {}
+            if len(missing) >= limit:
+                return missing[:limit]
+    if legacy_counts:
+        missing = list(dict.fromkeys(missing + _short_sessions(chat_collection, legacy_counts)))
+    return missing[:limit]
+
+def _short_sessions(chat_collection, legacy_counts):
+    # 합친 버킷에는 이전 메시지가 모두 들어 있으므로 버킷 쪽 메시지 수가 적으면 덜 옮겨진 것이다
+    bucket_counts = {
+        row["_id"]: row["count"]
+        for row in chat_schema.message_buckets(chat_collection).aggregate([
+            {"$match": {"session_id": {"$in": list(legacy_counts)}}},
+            {"$group": {"_id": "$session_id", "count": {"$sum": "$count"}}},
+        ])
+    }
+    return [
+        str(session_id) for session_id, count in legacy_counts.items()
+        if bucket_counts.get(session_id, 0) < count
+    ]
+
+def drop_legacy(chat_collection, login_collection):
+    removed = chat_collection.delete_many({"type": "session"}).deleted_count
+    removed += chat_collection.delete_many({"session_id": {"$exists": True}}).deleted_count
+    db_indexes.drop_indexes(chat_collection, db_indexes.LEGACY_CHAT_INDEXES)
+    if login_collection is not None:
+        removed += login_collection.delete_many({"type": "login_token"}).deleted_count
+        db_indexes.drop_indexes(login_collection, db_indexes.LEGACY_LOGIN_INDEXES)
+    return removed
+
+def main():
+    parser = argparse.ArgumentParser(description="chat_messages 를 세션/메시지 버킷/로그인 토큰 컬렉션으로 나눈다")
+    parser.add_argument("--dry-run", action="store_true", help="쓰지 않고 옮길 문서 수만 센다")
+    parser.add_argument("--bucket-size", type=int, default=chat_schema.CHAT_BUCKET_SIZE, help="버킷 하나에 담을 메시지 수")
+    parser.add_argument("--max-bytes", type=int, default=chat_schema.CHAT_BUCKET_MAX_BYTES, help="버킷 하나의 최대 BSON 크기")
+    parser.add_argument("--drop-legacy", action="store_true", help="옮긴 뒤 검증하고 이전 문서와 인덱스를 지운다")
+    args = parser.parse_args()
+
+    from mongo_utils import get_mongo_collections
+
+    login_collection, chat_collection = get_mongo_collections()
+    if chat_collection is None:
+        sys.exit("MONGO_URI 가 설정되지 않았습니다.")
+    if not args.dry_run:
+        db_indexes.ensure_indexes(login_collection, chat_collection)
+
+    label = "(dry-run) " if args.dry_run else ""
+    print(f"{label}세션 {migrate_sessions(chat_collection, args.dry_run)}개")
+    stats = migrate_messages(chat_collection, args.bucket_size, args.dry_run, args.max_bytes)
+    print(
+        f"{label}메시지 {stats['messages']}개 -> 세션 {stats['sessions']}개, 버킷 {stats['buckets']}개"
+        f" (이미 옮겨진 세션 {stats['skipped']}개 건너뜀)"
+    )
+    if login_collection is not None:
+        print(f"{label}로그인 토큰 {migrate_login_tokens(login_collection, args.dry_run)}개")
+
+    if args.drop_legacy and not args.dry_run:
+        failures = verify(chat_collection, login_collection)
+        if failures:
+            sys.exit("검증 실패, 이전 데이터를 지우지 않습니다:\n  " + "\n  ".join(failures))
+        print(f"이전 문서 {drop_legacy(chat_collection, login_collection)}개 삭제")
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,199 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
 import os
 from dotenv import load_dotenv
 import certifi
 import platform
+import threading
+import atexit
+import time
 
 load_dotenv()
-mongo_uri = os.getenv("MONGO_URI") 
+mongo_uri = os.getenv("MONGO_URI")
 
-def get_mongo_collections():
-    if not mongo_uri:
-        return None, None
-    
+# 풀 설정 (환경변수로 조정 가능)
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "chat_db")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_HEARTBEAT_FREQUENCY_MS = int(os.getenv("MONGO_HEARTBEAT_FREQUENCY_MS", "10000"))
+MONGO_HEALTH_CHECK_INTERVAL = float(os.getenv("MONGO_HEALTH_CHECK_INTERVAL", "30"))
+
+_client = None
+_client_lock = threading.Lock()
+_last_health_check = 0.0
+_last_health_ok = None
+_health_thread = None
+
+class ConnectionChurnListener(monitoring.ConnectionPoolListener):
+    # 커넥션 생성/종료 횟수를 세어 커넥션 churn을 측정한다.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.pools_created = 0
+            self.connections_created = 0
+            self.connections_closed = 0
+            self.checkouts = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pools_created": self.pools_created,
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed,
+                "connections_open": self.connections_created - self.connections_closed,
+                "checkouts": self.checkouts,
+            }
+
+    def pool_created(self, event):
+        with self._lock:
+            self.pools_created += 1
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+
+    def connection_checked_in(self, event):
+        pass
+
+churn_listener = ConnectionChurnListener()
+_clients_created = 0
+
+def _client_options():
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "heartbeatFrequencyMS": MONGO_HEARTBEAT_FREQUENCY_MS,
+        "event_listeners": [churn_listener],
+        "tls": True,
+    }
     if platform.system() == "Windows":
-        client = MongoClient(mongo_uri, tls=True, tlsCAFile=certifi.where())
+        options["tlsCAFile"] = certifi.where()
     else:
-        client = MongoClient(mongo_uri, tls=True, tlsAllowInvalidCertificates=True)
+        options["tlsAllowInvalidCertificates"] = True
+    return options
+
+def create_mongo_client(uri=None, **overrides):
+    global _clients_created
+    options = _client_options()
+    options.update(overrides)
+    # 값이 None 인 옵션은 제거 (예: 로컬 mongod 용 tls 옵션 해제)
+    options = {k: v for k, v in options.items() if v is not None}
+    _clients_created += 1
+    return MongoClient(uri or mongo_uri, **options)
+
+def get_mongo_client():
+    # 프로세스 전체에서 하나의 클라이언트(커넥션 풀)를 공유한다.
+    global _client
+    if not mongo_uri:
+        return None
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_mongo_client()
+    else:
+        _maybe_health_check()
+    return _client
+
+def _maybe_health_check():
+    global _last_health_check, _health_thread
+    now = time.monotonic()
+    if now - _last_health_check < MONGO_HEALTH_CHECK_INTERVAL:
+        return
+    with _client_lock:
+        if now - _last_health_check < MONGO_HEALTH_CHECK_INTERVAL:
+            return
+        if _health_thread is not None and _health_thread.is_alive():
+            return
+        _last_health_check = now
+        # ping 은 서버가 느리면 수 초 걸리므로 요청 스레드가 아닌 백그라운드에서 한다.
+        # 실패해도 클라이언트는 닫지 않는다 (pymongo 가 서버 모니터링으로 알아서 다시 연결한다)
+        _health_thread = threading.Thread(target=_run_health_check, name="mongo-health-check", daemon=True)
+        _health_thread.start()
+
+def _run_health_check():
+    global _last_health_ok
+    _last_health_ok = check_mongo_health()
 
-    db = client["chat_db"]
+def check_mongo_health(client=None):
+    client = client or _client
+    if client is None:
+        return False
+    try:
+        client.admin.command("ping")
+        return True
+    except Exception as e:
+        print(f"MongoDB 헬스 체크 실패: {str(e)}")
+        return False
+
+def get_database():
+    client = get_mongo_client()
+    if client is None:
+        return None
+    return client[MONGO_DB_NAME]
+
+def get_mongo_collections():
+    db = get_database()
+    if db is None:
+        return None, None
     return db["login_logs"], db["chat_messages"]
 
+def get_cache_collection():
+    db = get_database()
+    if db is None:
+        return None
+    return db["result_cache"]
+
+def get_pool_stats():
+    stats = churn_listener.snapshot()
+    stats["clients_created"] = _clients_created
+    stats["last_health_ok"] = _last_health_ok
+    return stats
+
+def close_mongo_client():
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+atexit.register(close_mongo_client)
+
 def save_message_to_mongo(collection, role, content):
     if collection is not None:
         collection.insert_one({
             "role": role,
             "content": content
-        })
\ No newline at end of file
+        })
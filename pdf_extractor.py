@@ -0,0 +1,149 @@
+# PDF 텍스트 추출 엔진
+# 페이지 묶음을 프로세스 풀에서 병렬로 추출하고, 페이지별 텍스트를 파일 내용 해시로 캐시한다.
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import atexit
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+
+import profiler
+
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "300"))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "2000000"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+# 이보다 짧은 문서는 프로세스 풀을 쓰지 않는다 (프로세스 통신 비용이 더 큼)
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+PDF_PAGE_CACHE_MAX_CHARS = int(os.getenv("PDF_PAGE_CACHE_MAX_CHARS", "20000000"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_chars = 0
+_cache_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Streamlit 서버는 스레드가 많으므로 fork 대신 spawn 사용
+                _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+                atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+def _discard_pool(pool):
+    # 워커 하나가 죽으면 (큰 PDF 로 OOM 등) 풀 전체가 BrokenProcessPool 이 되어 다시 쓸 수 없다
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _extract_in_pool(path, ranges):
+    # 풀이 깨졌으면 새로 만들어 한 번만 다시 시도한다
+    for attempt in range(2):
+        pool = _get_pool()
+        try:
+            return list(pool.map(_extract_range, [path] * len(ranges), *zip(*ranges)))
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            if attempt:
+                raise
+
+def _extract_range(path, start, stop):
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+def _cache_get(key):
+    with _cache_lock:
+        text = _cache.get(key)
+        if text is not None:
+            _cache.move_to_end(key)
+        return text
+
+def _cache_put(key, text):
+    global _cache_chars
+    with _cache_lock:
+        if key in _cache:
+            return
+        _cache[key] = text
+        _cache_chars += len(text)
+        while _cache_chars > PDF_PAGE_CACHE_MAX_CHARS and len(_cache) > 1:
+            _, old = _cache.popitem(last=False)
+            _cache_chars -= len(old)
+
+def _missing_ranges(pages):
+    # 연속된 페이지 번호를 PDF_PAGES_PER_TASK 크기의 구간으로 묶는다
+    ranges = []
+    for page in pages:
+        if ranges and ranges[-1][1] == page and ranges[-1][1] - ranges[-1][0] < PDF_PAGES_PER_TASK:
+            ranges[-1][1] = page + 1
+        else:
+            ranges.append([page, page + 1])
+    return ranges
+
+@profiler.timed("file.pdf_extract")
+def extract_text(data, max_pages=PDF_MAX_PAGES, max_chars=PDF_MAX_CHARS):
+    """PDF 바이트에서 텍스트를 추출한다.
+
+    {"text", "pages", "page_count", "truncated", "sha256"} 를 돌려준다.
+    이미 추출한 페이지는 캐시에서 가져오고, 나머지만 (길면 병렬로) 추출한다.
+    """
+    from pypdf import PdfReader
+
+    digest = hashlib.sha256(data).hexdigest()
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(data)
+        path = tmp.name
+    try:
+        page_count = len(PdfReader(path).pages)
+        wanted = min(page_count, max_pages)
+        texts = {}
+        missing = []
+        for page in range(wanted):
+            cached = _cache_get((digest, page))
+            if cached is None:
+                missing.append(page)
+            else:
+                texts[page] = cached
+
+        ranges = _missing_ranges(missing)
+        if len(missing) >= PDF_PARALLEL_MIN_PAGES and PDF_WORKERS > 1:
+            results = _extract_in_pool(path, ranges)
+        else:
+            results = (_extract_range(path, start, stop) for start, stop in ranges)
+
+        for chunk in results:
+            for page, text in chunk:
+                texts[page] = text
+                _cache_put((digest, page), text)
+    finally:
+        os.remove(path)
+
+    parts = []
+    total = 0
+    pages = 0
+    truncated = wanted < page_count
+    for page in range(wanted):
+        text = texts.get(page, "")
+        if total + len(text) > max_chars:
+            truncated = True
+            break
+        parts.append(text)
+        total += len(text)
+        pages += 1
+
+    return {
+        "text": "\n".join(parts),
+        "pages": pages,
+        "page_count": page_count,
+        "truncated": truncated,
+        "sha256": digest
+    }
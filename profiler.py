@@ -0,0 +1,208 @@
+# 가벼운 구간(span) 프로파일러
+# 구간별 소요 시간을 프로세스 전역 히스토그램에 쌓고, 리런 단위 기록은 스레드별로 모은다.
+# Prometheus 텍스트 / JSON 스냅샷으로 내보내 p50/p99 를 볼 수 있다.
+from collections import deque
+import contextlib
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "1") == "1"
+PROFILER_SAMPLES = int(os.getenv("PROFILER_SAMPLES", "2048"))
+PROFILER_EXPORT_PATH = os.getenv("PROFILER_EXPORT_PATH", "")
+PROFILER_EXPORT_INTERVAL = float(os.getenv("PROFILER_EXPORT_INTERVAL_SECONDS", "60"))
+METRIC_NAME = "app_span_seconds"
+# Prometheus 히스토그램 버킷 상한 (초)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # 분위수 계산용 최근 표본 (고정 크기)
+        self.samples = deque(maxlen=PROFILER_SAMPLES)
+        self.errors = 0
+
+    def observe(self, seconds, error=False):
+        index = len(BUCKETS)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+        if error:
+            self.errors += 1
+
+    def quantile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+_histograms = {}
+_lock = threading.Lock()
+_local = threading.local()
+_last_export = 0.0
+
+def _record(name, seconds, error=False, started=None):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds, error)
+
+    rerun = getattr(_local, "rerun", None)
+    if rerun is not None and started is not None:
+        rerun["spans"].append({
+            "name": name,
+            "start_ms": round((started - rerun["started"]) * 1000, 2),
+            "ms": round(seconds * 1000, 2),
+            "depth": getattr(_local, "depth", 0),
+            "error": error,
+        })
+
+@contextlib.contextmanager
+def span(name):
+    if not PROFILER_ENABLED:
+        yield
+        return
+    _local.depth = getattr(_local, "depth", 0) + 1
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        # 제너레이터가 다른 스레드에서 소비될 수도 있으므로 depth 가 없을 때를 대비한다
+        _local.depth = max(0, getattr(_local, "depth", 1) - 1)
+        _record(name, time.perf_counter() - started, error, started)
+
+def timed(name=None):
+    """함수(제너레이터 포함) 실행 시간을 span 으로 기록하는 데코레이터."""
+    def decorator(function):
+        span_name = name or f"{function.__module__}.{function.__name__}"
+
+        if inspect.isgeneratorfunction(function):
+            # 스트리밍 응답은 마지막 조각까지 소비된 시점까지를 잰다
+            @functools.wraps(function)
+            def generator_wrapper(*args, **kwargs):
+                with span(span_name):
+                    yield from function(*args, **kwargs)
+            return generator_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def begin_rerun():
+    # 이전 리런이 st.stop()/st.rerun() 으로 끝나 end_rerun 이 불리지 않았다면 여기서 마무리한다
+    if getattr(_local, "rerun", None) is not None:
+        end_rerun()
+    _local.depth = 0
+    _local.rerun = {"started": time.perf_counter(), "spans": []}
+
+def end_rerun():
+    """현재 리런을 마무리하고 {"total_ms", "spans"} 를 돌려준다."""
+    global _last_export
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return None
+    _local.rerun = None
+    elapsed = time.perf_counter() - rerun["started"]
+    # 자식 구간이 먼저 끝나므로 시작 순서로 다시 정렬한다
+    spans = sorted(rerun["spans"], key=lambda item: (item["start_ms"], item["depth"]))
+    _local.last_rerun = {"total_ms": round(elapsed * 1000, 2), "spans": spans}
+    if PROFILER_ENABLED:
+        _record("rerun", elapsed)
+
+    if PROFILER_EXPORT_PATH and time.monotonic() - _last_export >= PROFILER_EXPORT_INTERVAL:
+        _last_export = time.monotonic()
+        try:
+            write_snapshot(PROFILER_EXPORT_PATH)
+        except OSError as e:
+            print(f"프로파일 스냅샷 저장 실패: {str(e)}")
+    return _local.last_rerun
+
+def current_rerun():
+    # 워커 스레드로 넘길 현재 리런 기록 (리런 밖이면 None)
+    return getattr(_local, "rerun", None), getattr(_local, "depth", 0)
+
+@contextlib.contextmanager
+def attach(context):
+    """current_rerun() 으로 받은 기록을 이 스레드에 붙여, 워커의 span 도 요청 리런에 남긴다."""
+    rerun, depth = context or (None, 0)
+    saved = getattr(_local, "rerun", None), getattr(_local, "depth", 0)
+    _local.rerun, _local.depth = rerun, depth
+    try:
+        yield
+    finally:
+        _local.rerun, _local.depth = saved
+
+def last_rerun():
+    return getattr(_local, "last_rerun", None)
+
+def summary():
+    with _lock:
+        items = list(_histograms.items())
+    result = {}
+    for name, histogram in sorted(items):
+        result[name] = {
+            "count": histogram.count,
+            "errors": histogram.errors,
+            "mean_ms": round(histogram.total / histogram.count * 1000, 2) if histogram.count else 0.0,
+            "p50_ms": round(histogram.quantile(0.5) * 1000, 2),
+            "p90_ms": round(histogram.quantile(0.9) * 1000, 2),
+            "p99_ms": round(histogram.quantile(0.99) * 1000, 2),
+            "max_ms": round(histogram.max * 1000, 2),
+        }
+    return result
+
+def to_json():
+    return json.dumps({"generated_at": time.time(), "spans": summary()}, ensure_ascii=False, indent=2)
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+def to_prometheus():
+    lines = [
+        f"# HELP {METRIC_NAME} Time spent per instrumented stage.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    with _lock:
+        items = [(name, list(h.counts), h.count, h.total) for name, h in sorted(_histograms.items())]
+    for name, counts, count, total in items:
+        stage = _label(name)
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS, counts):
+            cumulative += bucket
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {total:.6f}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+def write_snapshot(path):
+    # 확장자가 .prom 이면 Prometheus 텍스트, 그 외에는 JSON
+    text = to_prometheus() if path.endswith(".prom") else to_json()
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def reset():
+    with _lock:
+        _histograms.clear()
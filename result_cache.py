@@ -0,0 +1,128 @@
+# BMC / 진단 / 자문단 결과 캐시
+# 키 = sha256(대화, 함수, 모델, 시스템 프롬프트). 1차: 프로세스 내 LRU, 2차: MongoDB (TTL 인덱스)
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+import threading
+import time
+
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_lock = threading.Lock()
+_memory = OrderedDict()
+_mongo_collection = None
+_counters = {
+    "memory_hits": 0,
+    "mongo_hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "errors": 0,
+}
+
+def configure(collection):
+    global _mongo_collection
+    _mongo_collection = collection
+
+def make_key(function_name, model, system_prompt, messages):
+    payload = json.dumps(
+        {"function": function_name, "model": model, "system": system_prompt, "messages": messages},
+        ensure_ascii=False, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _count(name):
+    with _lock:
+        _counters[name] += 1
+
+def _remember(key, value, expires_at):
+    with _lock:
+        _memory[key] = (value, expires_at)
+        _memory.move_to_end(key)
+        while len(_memory) > RESULT_CACHE_MAX_ENTRIES:
+            _memory.popitem(last=False)
+
+def get(key):
+    now = time.time()
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > now:
+                _memory.move_to_end(key)
+                _counters["memory_hits"] += 1
+                return value
+            del _memory[key]
+
+    if _mongo_collection is not None:
+        try:
+            doc = _mongo_collection.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.now()}},
+                {"value": 1, "expires_at": 1}
+            )
+        except Exception as e:
+            print(f"결과 캐시 조회 실패: {str(e)}")
+            _count("errors")
+            doc = None
+        if doc:
+            _remember(key, doc["value"], doc["expires_at"].timestamp())
+            _count("mongo_hits")
+            return doc["value"]
+
+    _count("misses")
+    return None
+
+def put(key, value, function_name=None):
+    _remember(key, value, time.time() + RESULT_CACHE_TTL_SECONDS)
+    _count("stores")
+    if _mongo_collection is None:
+        return
+    now = datetime.now()
+    try:
+        _mongo_collection.replace_one(
+            {"_id": key},
+            {
+                "value": value,
+                "function": function_name,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=RESULT_CACHE_TTL_SECONDS)
+            },
+            upsert=True
+        )
+    except Exception as e:
+        print(f"결과 캐시 저장 실패: {str(e)}")
+        _count("errors")
+
+def _is_valid(value, validate):
+    try:
+        validate(value)
+        return True
+    except Exception:
+        return False
+
+def get_or_compute(function_name, model, system_prompt, messages, compute, validate=None):
+    # validate 에서 예외가 나는 결과(잘린 JSON 등)는 저장하지 않고, 이미 저장된 것도 다시 계산한다
+    key = make_key(function_name, model, system_prompt, messages)
+    value = get(key)
+    if value is not None and validate is not None and not _is_valid(value, validate):
+        value = None
+    if value is None:
+        value = compute()
+        if validate is not None:
+            validate(value)
+        put(key, value, function_name)
+    return value
+
+def stats():
+    with _lock:
+        result = dict(_counters)
+        result["memory_entries"] = len(_memory)
+    lookups = result["memory_hits"] + result["mongo_hits"] + result["misses"]
+    result["hit_rate"] = round((result["memory_hits"] + result["mongo_hits"]) / lookups, 3) if lookups else 0.0
+    return result
+
+def clear_memory():
+    with _lock:
+        _memory.clear()
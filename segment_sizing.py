@@ -0,0 +1,147 @@
+# 경제활동 통계(성별 × 연령계층)를 지역 인구(지역 × 성별 × 연령대)에 붙여
+# 세그먼트별 경제활동인구/취업자/실업자 수를 추정한다. 결과는 메모이즈되어 요청마다 다시 계산하지 않는다.
+import functools
+import threading
+
+import census_index
+
+METRICS = ["population", "active", "employed", "unemployed"]
+# 인구 연령대 -> (경제활동 통계 연령계층, 적용 비율)
+# 10대는 15~19세 통계만 있고 10~14세는 조사 대상이 아니므로 비율을 절반만 적용한다
+BAND_BRACKETS = {
+    "10세미만": (None, 0.0),
+    "10대": ("15 - 19세", 0.5),
+    "20대": ("20 - 29세", 1.0),
+    "30대": ("30 - 39세", 1.0),
+    "40대": ("40 - 49세", 1.0),
+    "50대": ("50 - 59세", 1.0),
+    "60대": ("60세이상", 1.0),
+    "70대": ("60세이상", 1.0),
+    "80대": ("60세이상", 1.0),
+    "90대": ("60세이상", 1.0),
+    "100세이상": ("60세이상", 1.0),
+}
+
+class SegmentSizer:
+    def __init__(self, regions, population, brackets, economic, economic_metrics, period=""):
+        import numpy as np
+
+        # 성별 × 연령대 비율 행렬을 만든 뒤 (지역, 성별, 연령대) 인구에 한 번에 곱한다
+        participation = np.zeros((len(census_index.GENDERS), len(census_index.AGE_BANDS)))
+        employment = np.zeros_like(participation)
+        p_col = economic_metrics.index("participation_rate")
+        e_col = economic_metrics.index("employment_rate")
+        for band_index, band in enumerate(census_index.AGE_BANDS):
+            bracket, factor = BAND_BRACKETS[band]
+            if bracket is None:
+                continue
+            b = brackets.index(bracket)
+            participation[:, band_index] = economic[:, b, p_col] / 100 * factor
+            employment[:, band_index] = economic[:, b, e_col] / 100 * factor
+
+        population = np.asarray(population, dtype=np.float64)
+        active = population * participation[None]
+        employed = population * employment[None]
+        self.period = period
+        self.regions = list(regions)
+        self.indexes = {
+            "population": census_index.CensusIndex(regions, population),
+            "active": census_index.CensusIndex(regions, active),
+            "employed": census_index.CensusIndex(regions, employed),
+            "unemployed": census_index.CensusIndex(regions, active - employed),
+        }
+
+    def figures(self, region, gender="전체", age_from=0, age_to=None):
+        result = {metric: index.count(region, gender, age_from, age_to) for metric, index in self.indexes.items()}
+        population = result["population"]
+        result["employment_rate"] = result["employed"] / population if population else 0.0
+        result["participation_rate"] = result["active"] / population if population else 0.0
+        return result
+
+    def crosstab(self, metric, gender="전체"):
+        import numpy as np
+
+        # 지역 × 연령대 표 (지역 순서는 self.regions, 연령대 순서는 census_index.AGE_BANDS)
+        return np.rint(self.indexes[metric].counts[:, census_index.GENDERS.index(gender), :]).astype(np.int64)
+
+_sizer = None
+_sizer_failed = False
+_sizer_lock = threading.Lock()
+
+def _load_sizer():
+    import build_data
+
+    try:
+        manifest, population = build_data.load_snapshot("population_counts")
+        _, economic = build_data.load_snapshot("economic_values")
+    except Exception as e:
+        # 스냅샷 파일이 깨졌으면 원본으로 한 번 다시 빌드한다
+        print(f"세그먼트 스냅샷 로드 실패, 다시 빌드: {str(e)}")
+        build_data.build(force=True, write_csv=False)
+        manifest, population = build_data.load_snapshot("population_counts")
+        _, economic = build_data.load_snapshot("economic_values")
+    meta = manifest["economic"]
+    return SegmentSizer(manifest["population"]["regions"], population,
+                        meta["brackets"], economic, meta["metrics"], meta.get("period", ""))
+
+def get_sizer():
+    """SegmentSizer. 통계를 불러올 수 없으면 None (실패도 기억해서 요청마다 다시 빌드하지 않는다)."""
+    global _sizer, _sizer_failed
+    if _sizer is None and not _sizer_failed:
+        with _sizer_lock:
+            if _sizer is None and not _sizer_failed:
+                try:
+                    _sizer = _load_sizer()
+                except Exception as e:
+                    print(f"세그먼트 통계 로드 실패, 근거 수치 없이 진행: {str(e)}")
+                    _sizer_failed = True
+    return _sizer
+
+def _require_sizer():
+    sizer = get_sizer()
+    if sizer is None:
+        raise RuntimeError("세그먼트 통계를 불러올 수 없습니다.")
+    return sizer
+
+@functools.lru_cache(maxsize=4096)
+def segment_figures(region, gender="전체", age_from=0, age_to=None):
+    return _require_sizer().figures(region, gender, age_from, age_to)
+
+@functools.lru_cache(maxsize=64)
+def crosstab(metric, gender="전체"):
+    """{지역: {연령대: 값}} 교차표. 예: crosstab("employed", "여성")["경기"]["30대"]"""
+    sizer = _require_sizer()
+    table = sizer.crosstab(metric, gender)
+    return {
+        region: dict(zip(census_index.AGE_BANDS, (int(v) for v in table[i])))
+        for i, region in enumerate(sizer.regions)
+    }
+
+def _format_line(label, figures):
+    return (f"- {label}: 인구 {figures['population']:,}명 / 경제활동인구 약 {figures['active']:,}명 "
+            f"/ 취업자 약 {figures['employed']:,}명 (고용률 {figures['employment_rate'] * 100:.1f}%) "
+            f"/ 실업자 약 {figures['unemployed']:,}명")
+
+@functools.lru_cache(maxsize=1024)
+def _segment_grounding(regions, gender, age_from, age_to):
+    sizer = _require_sizer()
+    lines = [f"[타겟 세그먼트 실제 규모 ({census_index.CENSUS_LABEL} · {sizer.period} 경제활동 통계 기반 추정)]"]
+    label = census_index.segment_label([], gender, age_from, age_to)
+    lines.append(_format_line(label, segment_figures(census_index.NATIONAL, gender, age_from or 0, age_to)))
+    for region in regions:
+        if region == census_index.NATIONAL:
+            continue
+        label = census_index.segment_label([region], gender, age_from, age_to)
+        lines.append(_format_line(label, segment_figures(region, gender, age_from or 0, age_to)))
+    lines.append("고객 세그먼트와 시장성 판단에는 위 실제 수치를 근거로 사용하세요.")
+    return "\n".join(lines)
+
+def grounding_for_messages(messages, lookback=6):
+    """최근 대화의 타겟 세그먼트에 대한 인구/취업자 수 근거 문단. 타겟이 없으면 None."""
+    sizer = get_sizer()
+    if sizer is None:
+        return None
+    segment = census_index.find_segment(messages, sizer.regions, lookback)
+    if not segment:
+        return None
+    return _segment_grounding(tuple(segment["regions"]), segment["gender"], segment["age_from"], segment["age_to"])
@@ -0,0 +1,31 @@
+import inspect
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _patch_mongomock(mongomock):
+    # mongomock 4.x 는 pymongo 4.11+ 가 bulk_write 에 넘기는 sort 인자를 모른다
+    builder = mongomock.collection.BulkOperationBuilder
+    for name in ("add_update", "add_replace"):
+        original = getattr(builder, name)
+        if "sort" in inspect.signature(original).parameters:
+            continue
+
+        def patched(self, *args, _original=original, sort=None, **kwargs):
+            return _original(self, *args, **kwargs)
+        setattr(builder, name, patched)
+
+@pytest.fixture
+def mongo_db():
+    mongomock = pytest.importorskip("mongomock")
+    import mongomock.collection
+
+    _patch_mongomock(mongomock)
+    return mongomock.MongoClient()["test"]
+
+@pytest.fixture
+def chat_collection(mongo_db):
+    return mongo_db["chat_messages"]
@@ -0,0 +1,46 @@
+import pytest
+
+import census_index
+
+REGIONS = ["한국", "서울", "부산", "대구", "인천", "광주", "대전", "울산", "세종",
+           "경기", "강원", "충북", "충남", "전북", "전남", "경북", "경남", "제주"]
+
+@pytest.mark.parametrize("text, regions, gender, age_from, age_to", [
+    ("서울 20대 여성", ["서울"], "여성", 20, 29),
+    ("서울·경기 20대 여성", ["서울", "경기"], "여성", 20, 29),
+    ("부산에 사는 40대", ["부산"], "전체", 40, 49),
+    ("광주와 전남 30~40대", ["광주", "전남"], "전체", 30, 49),
+    ("수도권 직장인", ["서울", "경기", "인천"], "전체", None, None),
+    ("경기도 주부", ["경기"], "여성", None, None),
+    ("경기 지역 주부", ["경기"], "여성", None, None),
+    ("광주광역시 카페", ["광주"], "전체", None, None),
+    ("경기 30대 여성 취업자", ["경기"], "여성", 30, 39),
+    ("광주 20~30대 남성", ["광주"], "남성", 20, 39),
+    ("경기 여성 창업", ["경기"], "여성", None, None),
+    ("경기 불황 속 30대 여성", [], "여성", 30, 39),
+    ("광주시민 대상", ["광주"], "전체", None, None),
+    ("경기도 광주시 주민", ["경기"], "전체", None, None),
+    ("전국 20·30대 여성", ["한국"], "여성", 20, 39),
+    ("전국 서울 남성", ["서울"], "남성", None, None),
+    ("20~39세 남자", [], "남성", 20, 39),
+    ("20~30대", [], "전체", 20, 39),
+    ("2030대 남성", [], "남성", None, None),
+    ("10대 여자", [], "여성", 10, 19),
+])
+def test_parse_segment(text, regions, gender, age_from, age_to):
+    segment = census_index.parse_segment(text, REGIONS)
+    assert segment == {"regions": regions, "gender": gender, "age_from": age_from, "age_to": age_to}
+
+@pytest.mark.parametrize("text", [
+    "경기 불황 속 카페 창업",
+    "100대 기업 대상 B2B",
+    "서울대 학생 창업",
+    "광주시 카페",
+    "남녀 모두",
+    "",
+])
+def test_parse_segment_without_target(text):
+    assert census_index.parse_segment(text, REGIONS) is None
+
+def test_parse_segment_ignores_unknown_regions():
+    assert census_index.parse_segment("서울 카페", ["한국", "부산"]) is None
@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import chat_schema
+import db_indexes
+import migrate_schema
+
+START = datetime(2025, 1, 1)
+
+def message(i, content=None, session_id="s1"):
+    return {
+        "type": "message",
+        "session_id": session_id,
+        "email": "kim@example.com",
+        "name": "김철수",
+        "role": "user" if i % 2 == 0 else "assistant",
+        "content": content or f"메시지 {i}",
+        "timestamp": START + timedelta(seconds=i),
+    }
+
+def session_contents(chat_collection, session_id="s1"):
+    buckets = chat_schema.message_buckets(chat_collection).find({"session_id": session_id}).sort(
+        [("first_at", 1), ("_id", 1)]
+    )
+    return [entry["content"] for bucket in buckets for entry in bucket["messages"]]
+
+def append(chat_collection, docs, **kwargs):
+    requests = chat_schema.append_requests("s1", "kim@example.com", "김철수", docs, **kwargs)
+    chat_schema.message_buckets(chat_collection).bulk_write(requests, ordered=True)
+
+def test_append_rolls_over_full_bucket(chat_collection):
+    docs = [message(i) for i in range(7)]
+    append(chat_collection, docs[:2], bucket_size=3)
+    append(chat_collection, docs[2:4], bucket_size=3)
+    append(chat_collection, docs[4:], bucket_size=3)
+
+    buckets = list(chat_schema.message_buckets(chat_collection).find().sort("first_at", 1))
+    # 붙일 자리가 없는 열린 버킷은 닫히고 새 버킷이 열린다
+    assert [bucket["count"] for bucket in buckets] == [2, 2, 3]
+    assert [bucket["open"] for bucket in buckets] == [False, False, True]
+    assert session_contents(chat_collection) == [doc["content"] for doc in docs]
+    assert buckets[1]["first_at"] == docs[2]["timestamp"]
+    assert buckets[1]["last_at"] == docs[3]["timestamp"]
+
+def test_append_fills_open_bucket(chat_collection):
+    append(chat_collection, [message(0)], bucket_size=3)
+    append(chat_collection, [message(1)], bucket_size=3)
+    assert chat_schema.message_buckets(chat_collection).count_documents({}) == 1
+
+def test_append_rolls_over_by_bytes(chat_collection):
+    big = "x" * 1000
+    docs = [message(i, content=big) for i in range(5)]
+    append(chat_collection, docs[:2], max_bytes=2500)
+    append(chat_collection, docs[2:], max_bytes=2500)
+
+    buckets = list(chat_schema.message_buckets(chat_collection).find().sort("first_at", 1))
+    assert [bucket["count"] for bucket in buckets] == [2, 2, 1]
+    assert all(bucket["bytes"] <= 2500 for bucket in buckets)
+    assert len(session_contents(chat_collection)) == 5
+
+def test_migrate_messages_is_idempotent(chat_collection):
+    chat_collection.insert_many([message(i) for i in range(5)] + [message(i, session_id="s2") for i in range(3)])
+
+    stats = migrate_schema.migrate_messages(chat_collection, bucket_size=2)
+    assert stats == {"messages": 8, "sessions": 2, "buckets": 5, "skipped": 0}
+    before = list(chat_schema.message_buckets(chat_collection).find().sort("_id", 1))
+
+    stats = migrate_schema.migrate_messages(chat_collection, bucket_size=2)
+    assert stats["skipped"] == 2
+    assert list(chat_schema.message_buckets(chat_collection).find().sort("_id", 1)) == before
+
+def test_migrate_keeps_messages_written_after_go_live(chat_collection):
+    chat_collection.insert_many([message(i) for i in range(3)])
+    # 마이그레이션 전에 새 스키마로 기록된 메시지
+    append(chat_collection, [message(10, content="새 메시지")])
+
+    migrate_schema.migrate_messages(chat_collection)
+    assert session_contents(chat_collection) == ["메시지 0", "메시지 1", "메시지 2", "새 메시지"]
+    append(chat_collection, [message(11, content="그 다음 메시지")])
+
+    stats = migrate_schema.migrate_messages(chat_collection)
+    assert stats["skipped"] == 1
+    assert session_contents(chat_collection)[-2:] == ["새 메시지", "그 다음 메시지"]
+    assert chat_schema.message_buckets(chat_collection).count_documents({"open": True}) == 1
+
+def test_migrate_splits_large_sessions_by_bytes(chat_collection):
+    chat_collection.insert_many([message(i, content="x" * 1000) for i in range(6)])
+
+    stats = migrate_schema.migrate_messages(chat_collection, max_bytes=2500)
+    assert stats["buckets"] == 3
+    assert all(bucket["bytes"] <= 2500 for bucket in chat_schema.message_buckets(chat_collection).find())
+
+def test_migrate_dry_run_writes_nothing(chat_collection):
+    chat_collection.insert_many([message(i) for i in range(3)])
+    stats = migrate_schema.migrate_messages(chat_collection, dry_run=True)
+    assert stats["buckets"] == 1
+    assert chat_schema.message_buckets(chat_collection).count_documents({}) == 0
+
+def test_migrate_cleans_up_interrupted_run(chat_collection):
+    chat_collection.insert_many([message(i) for i in range(3)])
+    migrate_schema.migrate_messages(chat_collection)
+    # 새 버킷은 들어갔지만 옛 버킷을 지우기 전에 멈춘 상태
+    buckets = chat_schema.message_buckets(chat_collection)
+    for bucket in list(buckets.find()):
+        bucket.pop("_id")
+        buckets.insert_one(bucket)
+
+    stats = migrate_schema.migrate_messages(chat_collection)
+    assert stats["skipped"] == 0
+    assert session_contents(chat_collection) == ["메시지 0", "메시지 1", "메시지 2"]
+
+def test_unmigrated_sessions(chat_collection):
+    chat_collection.insert_one({"_id": "s1", "type": "session", "email": "kim@example.com", "title": "t"})
+    chat_collection.insert_many([message(i) for i in range(3)])
+    assert migrate_schema.unmigrated_sessions(chat_collection) == ["s1"]
+
+    migrate_schema.migrate_sessions(chat_collection)
+    assert migrate_schema.unmigrated_sessions(chat_collection) == ["s1"]
+    migrate_schema.migrate_messages(chat_collection)
+    assert migrate_schema.unmigrated_sessions(chat_collection) == []
+
+    # 마이그레이션 뒤 새 스키마에 붙은 메시지는 문제가 되지 않는다
+    append(chat_collection, [message(10)])
+    assert migrate_schema.unmigrated_sessions(chat_collection) == []
+
+def test_startup_refuses_unmigrated_data(chat_collection, monkeypatch):
+    created = []
+    monkeypatch.setattr(db_indexes, "_ensured", False)
+    monkeypatch.setattr(db_indexes, "ensure_indexes", lambda *args: created.append(args))
+    chat_collection.insert_many([message(i) for i in range(2)])
+
+    with pytest.raises(RuntimeError):
+        db_indexes.ensure_indexes_once(None, chat_collection)
+    assert created == []
+
+    migrate_schema.migrate_messages(chat_collection)
+    db_indexes.ensure_indexes_once(None, chat_collection)
+    assert len(created) == 1
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pytest
+
+import chat_service
+import profiler
+import result_cache
+
+@pytest.fixture(autouse=True)
+def memory_only():
+    result_cache.configure(None)
+    result_cache.clear_memory()
+
+class FakeClient:
+    """시스템 프롬프트에 든 문구에 따라 미리 정한 JSON 문자열을 돌려주는 OpenAI 클라이언트 대역."""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        system = messages[0]["content"]
+        for prompt, reply in self.replies.items():
+            if prompt in system:
+                return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+        raise AssertionError("unexpected prompt")
+
+def client_with(ratings, bmc, panel):
+    return FakeClient({
+        "스타트업 평가 위원": ratings,
+        "비즈니스 모델 분석가": bmc,
+        "가상 자문단": panel,
+    })
+
+MESSAGES = [{"role": "user", "content": "반려동물 수제 간식 구독"}]
+
+def test_parse_json_response_rejects_non_object():
+    assert chat_service.parse_json_response('```json\n{"a": 1}\n```') == {"a": 1}
+    with pytest.raises(ValueError):
+        chat_service.parse_json_response("[1, 2]")
+
+def test_run_all_reports_non_object_as_error():
+    client = client_with('{"comment": "좋아요"}', '["not", "an", "object"]', '{"discussion": []}')
+    results = {name: (data, error) for name, data, error in chat_service.run_all_diagnostics(client, MESSAGES, timeout=10)}
+    assert results["ratings"] == ({"comment": "좋아요"}, None)
+    assert results["panel"] == ({"discussion": []}, None)
+    assert results["bmc"][0] is None
+    assert isinstance(results["bmc"][1], ValueError)
+
+def test_run_all_records_worker_spans_in_rerun():
+    client = client_with('{"comment": ""}', '{}', '{"discussion": []}')
+    profiler.begin_rerun()
+    list(chat_service.run_all_diagnostics(client, MESSAGES, timeout=10))
+    rerun = profiler.end_rerun()
+    spans = {item["name"]: item for item in rerun["spans"]}
+    parent = spans["llm.run_all_diagnostics"]
+    for name in ("llm.analyze_ratings", "llm.generate_bmc", "llm.generate_panel_discussion"):
+        assert spans[name]["depth"] == parent["depth"] + 1
+    # 워커 스레드의 기록은 다음 리런으로 새지 않는다
+    assert profiler.current_rerun() == (None, 0)
+
+class FakeStream:
+    def __init__(self, deltas):
+        self.chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))] if delta != "" else [])
+            for delta in deltas
+        ]
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+def streaming_client(stream):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return stream
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))), calls
+
+def test_stream_ai_response_yields_deltas_and_closes():
+    # "" 는 choices 가 빈 조각 (usage 등), None 은 내용 없는 delta
+    stream = FakeStream(["📊 잠재", "", None, " 고객"])
+    client, calls = streaming_client(stream)
+    assert "".join(chat_service.stream_ai_response(client, MESSAGES, persona="vc")) == "📊 잠재 고객"
+    assert calls[0]["stream"] is True
+    assert "벤처 캐피탈리스트" in calls[0]["messages"][0]["content"]
+    assert stream.closed
+
+def test_stream_ai_response_closes_when_abandoned():
+    stream = FakeStream(["a", "b", "c"])
+    client, _ = streaming_client(stream)
+    chunks = chat_service.stream_ai_response(client, MESSAGES)
+    assert next(chunks) == "a"
+    chunks.close()
+    assert stream.closed
@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import conversation_context
+from conversation_context import build_context, new_context_state
+
+class SummaryClient:
+    def __init__(self, reply="요약", error=None):
+        self.reply = reply
+        self.error = error
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages):
+        self.calls.append(messages[1]["content"])
+        if self.error:
+            raise self.error
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.reply))])
+
+def conversation(count):
+    # 메시지 하나는 한글 10자 = 15 토큰 (estimate_message_tokens)
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i:02d}" + "가" * 8}
+        for i in range(count)
+    ]
+
+GREETING = {"role": "assistant", "content": "무엇을 도와드릴까요?"}
+
+def test_under_budget_skips_greeting():
+    messages = [GREETING] + conversation(4)
+    context, changed = build_context(SummaryClient(), messages, new_context_state(), budget=1000)
+    assert not changed
+    assert context == messages[1:]
+
+def test_over_budget_folds_oldest_into_summary():
+    client = SummaryClient()
+    state = new_context_state()
+    messages = [GREETING] + conversation(10)
+    # 10개 * 15 = 150 토큰 > 100, 최근은 60 토큰(4개)까지만 남긴다
+    context, changed = build_context(client, messages, state, budget=100)
+    assert changed
+    assert state == {"summary": "요약", "summary_upto": 6}
+    assert context[0]["role"] == "system" and "요약" in context[0]["content"]
+    assert context[1:] == messages[-4:]
+    assert "00가" in client.calls[0] and "06가" not in client.calls[0]
+
+    # 접힌 메시지는 다시 요약하지 않는다
+    messages.append({"role": "user", "content": "10" + "가" * 8})
+    context, changed = build_context(client, messages, state, budget=100)
+    assert not changed
+    assert len(client.calls) == 1
+    assert context[1:] == messages[-5:]
+
+def test_summary_upto_counts_from_the_oldest_stored_message():
+    client = SummaryClient()
+    # 앞쪽 20개는 메모리에 없고, summary_upto=22 이므로 이 페이지의 처음 2개가 이미 접혀 있다
+    state = {"summary": "이전 요약", "summary_upto": 22}
+    page = conversation(6)
+    context, changed = build_context(client, page, state, offset=20, budget=1000)
+    assert not changed
+    assert context[1:] == page[2:]
+
+    page += conversation(8)[6:]
+    context, changed = build_context(client, page, state, offset=20, budget=80)
+    assert changed
+    assert state["summary_upto"] > 22
+    assert context[1:] == page[state["summary_upto"] - 20:]
+    assert "[기존 요약]\n이전 요약" in client.calls[0]
+
+def test_summary_failure_keeps_state(capsys):
+    state = new_context_state()
+    messages = conversation(10)
+    context, changed = build_context(SummaryClient(error=RuntimeError("boom")), messages, state, budget=100)
+    assert not changed
+    assert state == new_context_state()
+    assert context == messages[-4:]
+    assert "대화 요약 실패" in capsys.readouterr().out
+
+def test_estimate_tokens_counts_images():
+    content = [{"type": "text", "text": "abcd"}, {"type": "image_url", "image_url": {"url": "x"}}]
+    assert conversation_context.estimate_tokens(content) == 2 + conversation_context.IMAGE_TOKEN_COST
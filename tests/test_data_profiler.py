@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_profiler
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # 청크 경계와 표본 크기 제한이 실제로 쓰이도록 작게 잡는다
+    monkeypatch.setattr(data_profiler, "PROFILE_CHUNK_ROWS", 700)
+    monkeypatch.setattr(data_profiler, "PROFILE_SAMPLE_SIZE", 2000)
+
+def sample_frame(rows=5000, seed=1):
+    rng = np.random.default_rng(seed)
+    price = rng.uniform(1000, 50000, rows).round()
+    return pd.DataFrame({
+        "price": price,
+        # price 와 강한 양의 상관, noise 와는 무관
+        "revenue": price * 3 + rng.normal(0, 2000, rows),
+        "noise": rng.normal(0, 1, rows),
+        "region": rng.choice(["서울", "경기", "부산"], rows, p=[0.5, 0.3, 0.2]),
+    })
+
+def column(profile, name):
+    return next(c for c in profile["columns"] if c["name"] == name)
+
+def test_numeric_stats_match_full_data(small_chunks):
+    df = sample_frame()
+    profile = data_profiler.profile_csv(df.to_csv(index=False).encode("utf-8"))
+    assert profile["rows"] == len(df)
+
+    price = column(profile, "price")
+    assert price["kind"] == "numeric"
+    assert price["mean"] == pytest.approx(df["price"].mean())
+    assert price["std"] == pytest.approx(df["price"].std(ddof=0))
+    assert (price["min"], price["max"]) == (df["price"].min(), df["price"].max())
+    # 사분위는 2000개 표본 기준이라 범위의 2% 안에서 맞으면 된다
+    spread = df["price"].max() - df["price"].min()
+    for key, q in (("p25", 0.25), ("p50", 0.5), ("p75", 0.75)):
+        assert abs(price[key] - df["price"].quantile(q)) < spread * 0.02
+
+def test_correlations_accumulate_across_chunks(small_chunks):
+    df = sample_frame()
+    profile = data_profiler.profile_csv(df.to_csv(index=False).encode("utf-8"))
+    pairs = {(a, b): r for a, b, r in profile["correlations"]}
+    assert pairs[("price", "revenue")] == pytest.approx(np.corrcoef(df["price"], df["revenue"])[0, 1])
+    # |r| < 0.3 인 쌍은 빠진다
+    assert ("price", "noise") not in pairs and ("revenue", "noise") not in pairs
+
+def test_categorical_top_values_and_nulls(small_chunks):
+    df = sample_frame(rows=1000)
+    df.loc[:99, "region"] = None
+    profile = data_profiler.profile_csv(df.to_csv(index=False).encode("utf-8"))
+    region = column(profile, "region")
+    assert region["kind"] == "categorical"
+    assert region["null_rate"] == 0.1
+    assert region["distinct"] == 3
+    assert region["top"] == list(df["region"].value_counts().items())
+
+def test_cp949_csv():
+    data = "지역,매출\n서울,10\n부산,20\n".encode("cp949")
+    profile = data_profiler.profile_csv(data)
+    assert profile["encoding"] == "cp949"
+    assert column(profile, "지역")["top"][0][0] in ("서울", "부산")
+    assert column(profile, "매출")["mean"] == 15
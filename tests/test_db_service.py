@@ -0,0 +1,111 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+import pytest
+
+import chat_schema
+import db_service
+
+START = datetime(2025, 1, 1)
+
+def write_session(chat_collection, count, session_id="s1", bucket_size=3):
+    # 2개씩 나눠 붙여서 (버킷은 3개) 버킷 경계가 페이지 중간에 오도록 한다
+    docs = [
+        {"role": "user", "content": f"메시지 {i}", "timestamp": START + timedelta(seconds=i)}
+        for i in range(count)
+    ]
+    buckets = chat_schema.message_buckets(chat_collection)
+    for start in range(0, count, 2):
+        requests = chat_schema.append_requests(
+            session_id, "kim@example.com", "김철수", docs[start:start + 2], bucket_size=bucket_size
+        )
+        buckets.bulk_write(requests, ordered=True)
+    return [doc["content"] for doc in docs]
+
+def read_pages(chat_collection, limit, session_id="s1"):
+    pages = []
+    before = None
+    while True:
+        page = db_service.get_session_messages_page(chat_collection, session_id, limit=limit, before=before)
+        pages.append([message["content"] for message in page["messages"]])
+        if not page["has_more"]:
+            return pages
+        before = page["cursor"]
+
+def test_page_cursor_crosses_bucket_boundaries(chat_collection):
+    contents = write_session(chat_collection, 11)
+    assert chat_schema.message_buckets(chat_collection).count_documents({}) > 3
+
+    for limit in (1, 2, 4, 5, 11):
+        pages = read_pages(chat_collection, limit)
+        # 최신 페이지부터 오며, 이어 붙이면 빠짐도 중복도 없다
+        assert [content for page in reversed(pages) for content in page] == contents
+        assert all(len(page) == limit for page in pages[:-1])
+
+    assert db_service.count_session_messages(chat_collection, "s1") == 11
+    assert [m["content"] for m in db_service.get_session_messages(chat_collection, "s1")] == contents
+
+def test_page_of_empty_session(chat_collection):
+    page = db_service.get_session_messages_page(chat_collection, "none", limit=5)
+    assert page == {"messages": [], "cursor": None, "has_more": False}
+
+def test_page_ignores_other_sessions(chat_collection):
+    write_session(chat_collection, 4, session_id="other")
+    contents = write_session(chat_collection, 5)
+    assert [content for page in reversed(read_pages(chat_collection, 2)) for content in page] == contents
+
+@pytest.fixture
+def empty_session_cache(monkeypatch):
+    monkeypatch.setattr(db_service, "_session_list_cache", OrderedDict())
+
+def titles(chat_collection, email="kim@example.com"):
+    return [session["title"] for session in db_service.get_user_sessions(chat_collection, email)]
+
+def test_session_list_is_cached_until_invalidated(chat_collection, empty_session_cache):
+    db_service.create_chat_session(chat_collection, "kim@example.com", "첫 대화")
+    assert titles(chat_collection) == ["첫 대화"]
+
+    # 다른 경로로 들어온 세션은 캐시가 살아있는 동안 보이지 않는다
+    chat_schema.sessions(chat_collection).insert_one(
+        {"email": "kim@example.com", "title": "직접", "created_at": START, "updated_at": START}
+    )
+    assert titles(chat_collection) == ["첫 대화"]
+    db_service.invalidate_user_sessions(user_email="kim@example.com")
+    assert titles(chat_collection) == ["첫 대화", "직접"]
+
+def test_session_changes_invalidate_the_list(chat_collection, empty_session_cache):
+    session_id = db_service.create_chat_session(chat_collection, "kim@example.com", "첫 대화")
+    assert titles(chat_collection) == ["첫 대화"]
+    other_id = db_service.create_chat_session(chat_collection, "kim@example.com", "둘째 대화")
+    assert sorted(titles(chat_collection)) == ["둘째 대화", "첫 대화"]
+
+    db_service.update_session_title(chat_collection, session_id, "이름 바꾼 대화")
+    assert sorted(titles(chat_collection)) == ["둘째 대화", "이름 바꾼 대화"]
+
+    db_service.delete_chat_session(chat_collection, other_id)
+    assert titles(chat_collection) == ["이름 바꾼 대화"]
+
+def test_logged_message_moves_session_to_top(chat_collection, empty_session_cache, monkeypatch):
+    first = db_service.create_chat_session(chat_collection, "kim@example.com", "첫 대화")
+    second = db_service.create_chat_session(chat_collection, "kim@example.com", "둘째 대화")
+    # 같은 ms 에 만들어질 수 있으므로 순서를 정해 둔다
+    for session_id, updated_at in ((first, START), (second, START + timedelta(minutes=1))):
+        chat_schema.sessions(chat_collection).update_one(
+            {"_id": ObjectId(session_id)}, {"$set": {"updated_at": updated_at}}
+        )
+    assert titles(chat_collection) == ["둘째 대화", "첫 대화"]
+
+    queued = []
+    monkeypatch.setattr(db_service.chat_writer, "enqueue_message", lambda *args: queued.append(args))
+    db_service.log_chat_message(chat_collection, "user", "안녕", {"email": "kim@example.com"}, first)
+    # Mongo 를 다시 읽지 않고 캐시 안에서 순서만 바꾼다
+    chat_schema.sessions(chat_collection).delete_many({})
+    assert titles(chat_collection) == ["첫 대화", "둘째 대화"]
+    assert len(queued) == 1
+
+def test_session_cache_is_bounded(chat_collection, empty_session_cache, monkeypatch):
+    monkeypatch.setattr(db_service, "SESSION_LIST_CACHE_MAX_USERS", 2)
+    for email in ("a@example.com", "b@example.com", "c@example.com"):
+        db_service.get_user_sessions(chat_collection, email)
+    assert [key[0] for key in db_service._session_list_cache] == ["b@example.com", "c@example.com"]
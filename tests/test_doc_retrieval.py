@@ -0,0 +1,35 @@
+from doc_retrieval import DocumentIndex, chunk_text, tokenize
+
+def test_tokenize_adds_korean_bigrams():
+    assert tokenize("반려동물 간식 DTC 2024") == ["반려동물", "반려", "려동", "동물", "간식", "dtc", "2024"]
+
+def test_bigrams_match_inflected_korean_words():
+    index = DocumentIndex()
+    index.add_document("market.txt", chunks=[
+        "반려동물 시장은 매년 성장하고 있으며 수제 간식 수요가 늘고 있다.",
+        "카페 창업은 초기 인테리어 비용과 임대료 부담이 크다.",
+        "온라인 쇼핑몰의 재구매율은 배송 속도에 크게 좌우된다.",
+    ])
+    # "반려동물의" 처럼 조사가 붙은 어절도 bigram 으로 맞춘다
+    assert [result["chunk_id"] for result in index.search("반려동물의 간식 시장 규모", k=2)] == [0]
+
+    assert index.search("인테리어비용", k=1)[0]["chunk_id"] == 1
+    assert index.search("전혀 관계없는 질문") == []
+
+def test_rare_terms_rank_higher():
+    index = DocumentIndex()
+    index.add_document("a", chunks=["창업 창업 창업 지원금", "창업 교육", "창업 멘토링", "창업 공간"])
+    # 모든 청크에 있는 "창업" 보다 한 청크에만 있는 "지원금" 이 순위를 정한다
+    assert index.search("창업 지원금", k=1)[0]["chunk_id"] == 0
+
+def test_documents_are_indexed_once():
+    index = DocumentIndex()
+    assert index.add_document("plan.pdf", "가" * 2000, doc_hash="h1") > 1
+    assert index.add_document("plan (1).pdf", "가" * 2000, doc_hash="h1") == 0
+    assert index.has_document("h1")
+    assert [chunk["chunk_id"] for chunk in index.leading_chunks("h1", k=2)] == [0, 1]
+
+def test_chunk_text_overlaps():
+    chunks = chunk_text("문장입니다. " * 200, size=100, overlap=20)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert chunks[1][:10] in chunks[0]
@@ -0,0 +1,39 @@
+import db_service
+import image_pipeline
+
+USER = {"email": "kim@example.com", "name": "김철수"}
+
+def image_message(*refs):
+    return [{"type": "text", "text": "이 사진 어때요?"}] + [
+        {"type": "image_url", "image_url": {"url": ref}} for ref in refs
+    ]
+
+def test_source_hash_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(image_pipeline, "IMAGE_ID_CACHE_MAX_ENTRIES", 2)
+    monkeypatch.setattr(image_pipeline, "_ids_by_source_hash", type(image_pipeline._ids_by_source_hash)())
+    for i in range(3):
+        image_pipeline._remember_source(f"hash{i}", f"id{i}")
+    assert image_pipeline._cached_source_id("hash0") is None
+    assert image_pipeline._cached_source_id("hash2") == "id2"
+
+def test_image_refs():
+    messages = [
+        {"role": "user", "content": image_message("gridfs://a", "data:image/png;base64,AAAA")},
+        {"role": "assistant", "content": "좋아요"},
+        {"role": "user", "content": image_message("gridfs://b")},
+    ]
+    assert image_pipeline.image_refs(messages) == {"gridfs://a", "gridfs://b"}
+
+def test_delete_session_keeps_shared_images(monkeypatch, chat_collection):
+    collection = chat_collection
+    deleted = []
+    monkeypatch.setattr(image_pipeline, "delete_images", lambda refs: deleted.append(set(refs)))
+
+    first = db_service.create_chat_session(collection, USER["email"], "첫 세션")
+    second = db_service.create_chat_session(collection, USER["email"], "두 번째 세션")
+    db_service.log_chat_message(collection, "user", image_message("gridfs://own", "gridfs://shared"), USER, first)
+    db_service.log_chat_message(collection, "user", image_message("gridfs://shared"), USER, second)
+
+    db_service.delete_chat_session(collection, first)
+    assert deleted == [{"gridfs://own"}]
+    assert len(db_service.get_session_messages(collection, second)) == 1
@@ -0,0 +1,121 @@
+from email.utils import formatdate
+from types import SimpleNamespace
+import threading
+import time
+
+import pytest
+
+import llm_client
+
+openai = pytest.importorskip("openai")
+
+@pytest.fixture(autouse=True)
+def fresh_slots(monkeypatch):
+    monkeypatch.setattr(llm_client, "_slots", threading.BoundedSemaphore(2))
+    monkeypatch.setattr(llm_client, "LLM_MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(llm_client, "LLM_MAX_RETRIES", 3)
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(llm_client.time, "sleep", calls.append)
+    return calls
+
+def status_error(status, headers=None):
+    response = SimpleNamespace(status_code=status, headers=headers or {}, request=None)
+    return openai.APIStatusError(f"HTTP {status}", response=response, body=None)
+
+def free_slots():
+    return llm_client._slots._value
+
+class FakeOpenAI:
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+def test_retries_honor_retry_after(sleeps):
+    client = llm_client.LLMClient(FakeOpenAI([
+        status_error(429, {"retry-after": "2"}),
+        status_error(503, {"retry-after-ms": "150"}),
+        "ok",
+    ]))
+    before = llm_client.stats()["retries"]
+    assert client.chat.completions.create(model="m", messages=[]) == "ok"
+    assert sleeps == [2.0, 0.15]
+    assert llm_client.stats()["retries"] == before + 2
+    assert free_slots() == 2
+
+def test_retry_after_date_and_cap(sleeps, monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_RETRY_MAX_DELAY", 20)
+    date = formatdate(time.time() + 10, usegmt=True)
+    client = llm_client.LLMClient(FakeOpenAI([
+        status_error(429, {"retry-after": date}),
+        status_error(429, {"retry-after": "3600"}),
+        "ok",
+    ]))
+    client.chat.completions.create(model="m", messages=[])
+    assert 8 <= sleeps[0] <= 10
+    assert sleeps[1] == 20
+
+def test_non_retryable_errors_raise_immediately(sleeps):
+    fake = FakeOpenAI([status_error(400), "ok"])
+    with pytest.raises(openai.APIStatusError):
+        llm_client.LLMClient(fake).chat.completions.create(model="m", messages=[])
+    assert fake.calls == 1
+    assert sleeps == []
+    assert free_slots() == 2
+
+def test_gives_up_after_max_retries(sleeps):
+    fake = FakeOpenAI([status_error(500)] * 5)
+    with pytest.raises(openai.APIStatusError):
+        llm_client.LLMClient(fake).chat.completions.create(model="m", messages=[])
+    assert fake.calls == 4
+    # Retry-After 가 없으면 지터 백오프: 0 ~ base * 2^attempt
+    assert all(0 <= delay <= llm_client.LLM_RETRY_BASE_DELAY * 2 ** i for i, delay in enumerate(sleeps))
+    assert free_slots() == 2
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+def test_stream_holds_slot_until_closed():
+    stream = FakeStream(["a", "b"])
+    client = llm_client.LLMClient(FakeOpenAI([stream]))
+    limited = client.chat.completions.create(model="m", messages=[], stream=True)
+    assert free_slots() == 1
+    chunks = iter(limited)
+    assert next(chunks) == "a"
+    limited.close()
+    limited.close()
+    assert stream.closed
+    assert free_slots() == 2
+
+def test_stream_releases_slot_when_drained():
+    client = llm_client.LLMClient(FakeOpenAI([FakeStream(["a", "b"])]))
+    assert list(client.chat.completions.create(model="m", messages=[], stream=True)) == ["a", "b"]
+    assert free_slots() == 2
+
+def test_busy_when_no_slot_frees_up(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_QUEUE_TIMEOUT", 0.01)
+    client = llm_client.LLMClient(FakeOpenAI([FakeStream([]), FakeStream([]), "ok"]))
+    streams = [client.chat.completions.create(model="m", messages=[], stream=True) for _ in range(2)]
+    with pytest.raises(llm_client.LLMBusyError):
+        client.chat.completions.create(model="m", messages=[])
+    for stream in streams:
+        stream.close()
+    assert client.chat.completions.create(model="m", messages=[]) == "ok"
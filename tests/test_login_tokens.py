@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+import login_tokens
+
+USER = {"email": "kim@example.com", "name": "김철수"}
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setenv("LOGIN_TOKEN_SECRET", "test-secret")
+    login_tokens._revoked.clear()
+
+def test_valid_token():
+    claims = login_tokens.verify(login_tokens.issue(USER))
+    assert claims["e"] == USER["email"]
+    assert claims["n"] == USER["name"]
+    assert not login_tokens.is_revoked(claims["j"])
+
+def test_expired_token():
+    assert login_tokens.verify(login_tokens.issue(USER, ttl=-1)) is None
+
+def test_revoked_token():
+    claims = login_tokens.verify(login_tokens.issue(USER))
+    login_tokens.revoke(claims["j"], time.time() + 60)
+    assert login_tokens.is_revoked(claims["j"])
+
+def test_requires_dedicated_secret(monkeypatch):
+    monkeypatch.delenv("LOGIN_TOKEN_SECRET")
+    monkeypatch.setenv("GOOGLE_CLIENT_SECRET", "oauth-secret")
+    assert not login_tokens.is_enabled()
+    assert login_tokens.verify("v1.abc.def") is None
+
+def test_wrong_secret(monkeypatch):
+    token = login_tokens.issue(USER)
+    monkeypatch.setenv("LOGIN_TOKEN_SECRET", "other-secret")
+    assert login_tokens.verify(token) is None
+
+def test_tampered_payload():
+    version, payload, signature = login_tokens.issue(USER).split(".")
+    other = login_tokens.issue({"email": "lee@example.com", "name": "이영희"}).split(".")[1]
+    assert login_tokens.verify(f"{version}.{other}.{signature}") is None
+
+@pytest.mark.parametrize("token", [
+    "v1.",
+    "v1.abc",
+    "v1.a.b.c",
+    "v1.한글.서명",
+    "v1.abc.def\n",
+    "v1.abc.d=ef",
+    "v1.abc." + "é" * 10,
+])
+def test_garbage_token(token):
+    assert login_tokens.verify(token) is None
+
+def test_signed_non_object_payload():
+    # 서명은 맞지만 claims 가 dict 가 아닌 경우
+    payload = login_tokens._b64encode(b"[1, 2]")
+    message = f"v1.{payload}"
+    assert login_tokens.verify(f"{message}.{login_tokens._sign(message)}") is None
@@ -0,0 +1,39 @@
+import threading
+
+import mongo_utils
+
+class SlowClient:
+    def __init__(self):
+        self.release = threading.Event()
+        self.pings = 0
+        self.closed = False
+        self.admin = self
+
+    def command(self, name):
+        self.pings += 1
+        self.release.wait(5)
+        raise ConnectionError("server unreachable")
+
+    def close(self):
+        self.closed = True
+
+def test_health_check_runs_off_the_request_thread(monkeypatch):
+    client = SlowClient()
+    monkeypatch.setattr(mongo_utils, "mongo_uri", "mongodb://example")
+    monkeypatch.setattr(mongo_utils, "_client", client)
+    monkeypatch.setattr(mongo_utils, "_last_health_check", 0.0)
+    monkeypatch.setattr(mongo_utils, "_health_thread", None)
+    monkeypatch.setattr(mongo_utils, "_last_health_ok", None)
+
+    # 느린 ping 을 기다리지 않고 바로 같은 클라이언트를 돌려준다
+    assert mongo_utils.get_mongo_client() is client
+    monkeypatch.setattr(mongo_utils, "_last_health_check", 0.0)
+    assert mongo_utils.get_mongo_client() is client  # 진행 중인 검사가 있으면 새로 띄우지 않는다
+
+    client.release.set()
+    mongo_utils._health_thread.join(5)
+    assert client.pings == 1
+    assert mongo_utils.get_pool_stats()["last_health_ok"] is False
+    # 실패해도 공유 클라이언트는 닫지 않는다
+    assert not client.closed
+    assert mongo_utils._client is client
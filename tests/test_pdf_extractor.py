@@ -0,0 +1,93 @@
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+pytest.importorskip("pypdf")
+
+import pdf_extractor
+
+def make_pdf(texts):
+    # 페이지마다 한 줄짜리 텍스트가 있는 최소 PDF
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(texts)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    pdf_extractor._cache.clear()
+    pdf_extractor._cache_chars = 0
+
+def test_extracts_pages_in_order():
+    result = pdf_extractor.extract_text(make_pdf(["first page", "second page", "third page"]))
+    assert result["text"].split("\n") == ["first page", "second page", "third page"]
+    assert (result["pages"], result["page_count"], result["truncated"]) == (3, 3, False)
+
+def test_page_limit_truncates():
+    result = pdf_extractor.extract_text(make_pdf(["one", "two", "three"]), max_pages=2)
+    assert result["text"] == "one\ntwo"
+    assert result["truncated"]
+
+def test_cached_pages_are_not_extracted_again(monkeypatch):
+    data = make_pdf(["alpha", "beta"])
+    pdf_extractor.extract_text(data)
+    monkeypatch.setattr(pdf_extractor, "_extract_range", lambda *args: pytest.fail("extracted again"))
+    assert pdf_extractor.extract_text(data)["text"] == "alpha\nbeta"
+
+class BrokenPool:
+    def __init__(self):
+        self.shut_down = False
+
+    def map(self, *args):
+        raise BrokenProcessPool("worker died")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+class InlinePool:
+    def map(self, function, *iterables):
+        return map(function, *iterables)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+def test_broken_pool_is_rebuilt_and_retried(monkeypatch):
+    broken = BrokenPool()
+    monkeypatch.setattr(pdf_extractor, "_pool", broken)
+    monkeypatch.setattr(pdf_extractor, "ProcessPoolExecutor", lambda **kwargs: InlinePool())
+    monkeypatch.setattr(pdf_extractor, "PDF_PARALLEL_MIN_PAGES", 1)
+    monkeypatch.setattr(pdf_extractor, "PDF_WORKERS", 2)
+
+    result = pdf_extractor.extract_text(make_pdf(["after crash"]))
+    assert result["text"] == "after crash"
+    assert broken.shut_down
+    assert isinstance(pdf_extractor._pool, InlinePool)
+
+def test_pool_broken_twice_raises(monkeypatch):
+    monkeypatch.setattr(pdf_extractor, "_pool", BrokenPool())
+    monkeypatch.setattr(pdf_extractor, "ProcessPoolExecutor", lambda **kwargs: BrokenPool())
+    monkeypatch.setattr(pdf_extractor, "PDF_PARALLEL_MIN_PAGES", 1)
+    monkeypatch.setattr(pdf_extractor, "PDF_WORKERS", 2)
+    with pytest.raises(BrokenProcessPool):
+        pdf_extractor.extract_text(make_pdf(["x"]))
+    # 다음 업로드는 새 풀로 시작한다
+    assert pdf_extractor._pool is None
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+import profiler
+
+BUCKET_100MS = profiler.BUCKETS.index(0.1)
+
+@pytest.fixture(autouse=True)
+def fresh_histograms():
+    profiler.reset()
+    yield
+    profiler.reset()
+
+def test_histogram_buckets_and_quantiles():
+    histogram = profiler.Histogram()
+    for ms in range(1, 101):
+        histogram.observe(ms / 1000)
+    assert histogram.count == 100
+    assert histogram.max == 0.1
+    # 1ms 는 첫 버킷, 100ms 까지는 모두 0.1 버킷 이하에 들어간다
+    assert histogram.counts[0] == 1
+    assert sum(histogram.counts[:BUCKET_100MS + 1]) == 100
+    assert histogram.quantile(0.5) == pytest.approx(0.051)
+    assert histogram.quantile(0.99) == pytest.approx(0.1)
+    assert profiler.Histogram().quantile(0.5) == 0.0
+
+def test_span_records_errors_and_nesting():
+    profiler.begin_rerun()
+    with profiler.span("outer"):
+        with pytest.raises(ValueError):
+            with profiler.span("inner"):
+                raise ValueError()
+    rerun = profiler.end_rerun()
+
+    assert [(s["name"], s["depth"], s["error"]) for s in rerun["spans"]] == [("outer", 0, False), ("inner", 1, True)]
+    summary = profiler.summary()
+    assert summary["inner"]["errors"] == 1
+    assert summary["outer"]["count"] == 1
+    assert summary["rerun"]["count"] == 1
+    assert profiler.last_rerun() is rerun
+
+def test_timed_generator_covers_consumption():
+    @profiler.timed("gen")
+    def numbers():
+        yield 1
+        yield 2
+
+    assert list(numbers()) == [1, 2]
+    assert profiler.summary()["gen"]["count"] == 1
+
+def test_prometheus_export():
+    profiler._record('say "hi"', 0.003)
+    profiler._record('say "hi"', 20.0)
+    text = profiler.to_prometheus()
+    assert '# TYPE app_span_seconds histogram' in text
+    assert 'app_span_seconds_bucket{stage="say \\"hi\\"",le="0.005"} 1' in text
+    # 누적 버킷: 30초 이하에 두 번째 표본이 더해진다
+    assert 'app_span_seconds_bucket{stage="say \\"hi\\"",le="30.0"} 2' in text
+    assert 'app_span_seconds_bucket{stage="say \\"hi\\"",le="+Inf"} 2' in text
+    assert 'app_span_seconds_count{stage="say \\"hi\\""} 2' in text
+    assert 'app_span_seconds_sum{stage="say \\"hi\\""} 20.003000' in text
+
+def test_write_snapshot_picks_format(tmp_path):
+    profiler._record("db.get_user_sessions", 0.01)
+    json_path = tmp_path / "profile.json"
+    profiler.write_snapshot(str(json_path))
+    snapshot = json.loads(json_path.read_text(encoding="utf-8"))
+    assert snapshot["spans"]["db.get_user_sessions"]["p50_ms"] == 10.0
+
+    prom_path = tmp_path / "profile.prom"
+    profiler.write_snapshot(str(prom_path))
+    assert prom_path.read_text(encoding="utf-8").startswith("# HELP app_span_seconds")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["profile.json", "profile.prom"]
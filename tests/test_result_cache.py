@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+import result_cache
+
+@pytest.fixture(autouse=True)
+def memory_only():
+    result_cache.configure(None)
+    result_cache.clear_memory()
+
+def test_invalid_result_is_not_cached():
+    responses = iter(['{"score": ', '{"score": 1}'])
+    compute = lambda: next(responses)
+    with pytest.raises(ValueError):
+        result_cache.get_or_compute("f", "m", "s", [], compute, validate=json.loads)
+    assert result_cache.get_or_compute("f", "m", "s", [], compute, validate=json.loads) == '{"score": 1}'
+    # 두 번째 결과는 캐시에서 나온다
+    assert result_cache.get_or_compute("f", "m", "s", [], compute, validate=json.loads) == '{"score": 1}'
+
+def test_invalid_cached_value_is_recomputed():
+    key = result_cache.make_key("f", "m", "s", [])
+    result_cache.put(key, "not json")
+    assert result_cache.get_or_compute("f", "m", "s", [], lambda: "[]", validate=json.loads) == "[]"
+    assert result_cache.get(key) == "[]"
@@ -0,0 +1,62 @@
+import pytest
+
+import build_data
+import segment_sizing
+
+MESSAGES = [{"role": "user", "content": "경기 30대 여성 취업자 대상 서비스"}]
+
+@pytest.fixture
+def fresh_sizer(monkeypatch):
+    monkeypatch.setattr(segment_sizing, "_sizer", None)
+    monkeypatch.setattr(segment_sizing, "_sizer_failed", False)
+    segment_sizing._segment_grounding.cache_clear()
+    segment_sizing.segment_figures.cache_clear()
+    yield
+    segment_sizing._segment_grounding.cache_clear()
+    segment_sizing.segment_figures.cache_clear()
+
+def test_grounding_uses_regional_figures(fresh_sizer):
+    grounding = segment_sizing.grounding_for_messages(MESSAGES)
+    assert "경기 여성 30~39세" in grounding
+    assert "전국 여성 30~39세" in grounding
+
+def test_no_target_means_no_grounding(fresh_sizer):
+    assert segment_sizing.grounding_for_messages([{"role": "user", "content": "안녕하세요"}]) is None
+
+def test_unavailable_snapshot_degrades_once(fresh_sizer, monkeypatch):
+    calls = {"load": 0, "build": 0}
+
+    def broken_load(name, *args, **kwargs):
+        calls["load"] += 1
+        raise ValueError("corrupt snapshot")
+
+    def broken_build(*args, **kwargs):
+        calls["build"] += 1
+        raise OSError("source csv missing")
+
+    monkeypatch.setattr(build_data, "load_snapshot", broken_load)
+    monkeypatch.setattr(build_data, "build", broken_build)
+    assert segment_sizing.grounding_for_messages(MESSAGES) is None
+    assert segment_sizing.grounding_for_messages(MESSAGES) is None
+    # 실패는 기억해 두고 다시 빌드하지 않는다
+    assert calls == {"load": 1, "build": 1}
+    with pytest.raises(RuntimeError):
+        segment_sizing.segment_figures("경기")
+
+def test_corrupt_snapshot_is_rebuilt(fresh_sizer, monkeypatch):
+    real_load = build_data.load_snapshot
+    state = {"broken": True, "rebuilt": False}
+
+    def load(name, *args, **kwargs):
+        if state["broken"]:
+            raise ValueError("corrupt snapshot")
+        return real_load(name, *args, **kwargs)
+
+    def build(*args, **kwargs):
+        state["broken"] = False
+        state["rebuilt"] = True
+
+    monkeypatch.setattr(build_data, "load_snapshot", load)
+    monkeypatch.setattr(build_data, "build", build)
+    assert "경기" in segment_sizing.grounding_for_messages(MESSAGES)
+    assert state["rebuilt"]
@@ -0,0 +1,55 @@
+import os
+import threading
+
+import pytest
+
+import upload_cache
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_cache, "UPLOAD_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(upload_cache, "_stats", dict.fromkeys(upload_cache._stats, 0))
+    return tmp_path
+
+def test_round_trip_text_and_frame():
+    pd = pytest.importorskip("pandas")
+    frame = pd.DataFrame({"지역": ["서울", "부산"], 1: [10, 20]})
+    upload_cache.put("abc", {"kind": "table", "rows": 5000}, text="프로파일", frame=frame)
+
+    cached = upload_cache.get("abc")
+    assert cached["text"] == "프로파일"
+    assert cached["meta"]["rows"] == 5000
+    assert cached["meta"]["frame_rows"] == 2
+    assert list(cached["frame"].columns) == ["지역", "1"]
+    assert cached["frame"]["지역"].tolist() == ["서울", "부산"]
+
+def test_missing_and_corrupt_entries(cache_dir):
+    assert upload_cache.get("nothing") is None
+    os.makedirs(cache_dir / "broken")
+    (cache_dir / "broken" / "meta.json").write_text("{not json", encoding="utf-8")
+    assert upload_cache.get("broken") is None
+    assert not (cache_dir / "broken").exists()
+    stats = upload_cache.stats()
+    assert (stats["misses"], stats["errors"]) == (1, 1)
+
+def test_evicts_least_recently_used(cache_dir):
+    for i, name in enumerate(["old", "used", "new"]):
+        upload_cache.put(name, {"kind": "pdf"}, text="x" * 1000)
+        os.utime(cache_dir / name, (1000 + i, 1000 + i))
+    # 오래된 항목을 읽으면 최근 사용으로 바뀐다
+    upload_cache.get("old")
+
+    assert upload_cache.evict(max_bytes=2500) == 1
+    assert sorted(os.listdir(cache_dir)) == ["new", "old"]
+
+def test_stats_are_counted_across_threads():
+    def hit_missing():
+        for _ in range(200):
+            upload_cache.get("missing")
+
+    threads = [threading.Thread(target=hit_missing) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert upload_cache.stats()["misses"] == 1600
@@ -0,0 +1,18 @@
+import mongo_utils
+import warmup
+
+def test_mongo_warmup_without_uri(monkeypatch):
+    monkeypatch.setattr(mongo_utils, "get_mongo_client", lambda: None)
+    monkeypatch.setattr(warmup, "_status", {})
+    warmup._run([("mongo", warmup._warm_mongo)])
+    assert warmup.status()["mongo"]["ok"]
+
+def test_failed_step_does_not_stop_the_rest(monkeypatch):
+    monkeypatch.setattr(warmup, "_status", {})
+
+    def broken():
+        raise RuntimeError("boom")
+
+    warmup._run([("broken", broken), ("next", lambda: None)])
+    assert warmup.status()["broken"] == {"ok": False, "error": "boom"}
+    assert warmup.status()["next"]["ok"]
@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+import chat_schema
+from write_behind import WriteBehindQueue
+
+START = datetime(2025, 1, 1)
+GOOD = "0000000000000000000000a1"
+BAD = "0000000000000000000000b2"
+
+def message(i, text=None):
+    return {
+        "type": "message",
+        "email": "kim@example.com",
+        "name": "김철수",
+        "role": "user",
+        "content": text or f"메시지 {i}",
+        "timestamp": START + timedelta(seconds=i),
+    }
+
+def contents(chat_collection, session_id):
+    buckets = chat_schema.message_buckets(chat_collection).find({"session_id": session_id}).sort(
+        [("first_at", 1), ("_id", 1)]
+    )
+    return [entry["content"] for bucket in buckets for entry in bucket["messages"]]
+
+class FlakyBuckets:
+    """버킷 컬렉션 대신 끼워 넣어 특정 세션의 bulk_write 를 실패시킨다."""
+
+    def __init__(self, buckets, failing_sessions, failures=None):
+        self.buckets = buckets
+        self.failing_sessions = set(failing_sessions)
+        self.failures = failures  # None 이면 계속 실패
+        self.calls = 0
+
+    def bulk_write(self, requests, ordered=True):
+        self.calls += 1
+        session_id = requests[0]._filter["session_id"]
+        if session_id in self.failing_sessions and (self.failures is None or self.failures > 0):
+            if self.failures is not None:
+                self.failures -= 1
+            raise AutoReconnect("connection reset")
+        return self.buckets.bulk_write(requests, ordered=ordered)
+
+    def find(self, *args, **kwargs):
+        return self.buckets.find(*args, **kwargs)
+
+@pytest.fixture
+def writer():
+    writer = WriteBehindQueue(batch_size=50, flush_interval=0.01, retries=2, retry_delay=0.001)
+    yield writer
+    writer.shutdown(timeout=1.0)
+
+@pytest.fixture
+def flaky(monkeypatch, chat_collection):
+    def install(failing_sessions, failures=None):
+        fake = FlakyBuckets(chat_schema.message_buckets(chat_collection), failing_sessions, failures)
+        monkeypatch.setattr(chat_schema, "message_buckets", lambda collection: fake)
+        return fake
+    return install
+
+def test_batches_messages_per_session(writer, chat_collection):
+    for i in range(10):
+        writer.enqueue_message(chat_collection, message(i), GOOD if i % 2 else BAD)
+    writer.enqueue_message(chat_collection, message(10, "세션 없음"))
+    assert writer.flush(timeout=2.0)
+
+    assert contents(chat_collection, GOOD) == [f"메시지 {i}" for i in range(1, 10, 2)]
+    assert contents(chat_collection, BAD) == [f"메시지 {i}" for i in range(0, 10, 2)]
+    assert chat_collection.count_documents({"session_id": {"$exists": False}}) == 1
+    stats = writer.stats()
+    assert stats["messages"] == 11
+    assert stats["batches"] < 11
+    assert writer.pending() == 0
+
+def test_shutdown_writes_queued_messages(chat_collection):
+    writer = WriteBehindQueue(batch_size=50, flush_interval=0.5)
+    for i in range(5):
+        writer.enqueue_message(chat_collection, message(i), GOOD)
+    writer.shutdown(timeout=2.0)
+    assert len(contents(chat_collection, GOOD)) == 5
+    assert not writer._thread.is_alive()
+
+def test_flush_without_thread_drains_synchronously(writer, chat_collection):
+    writer._queue.put((chat_collection, message(0), GOOD))
+    assert writer.flush()
+    assert contents(chat_collection, GOOD) == ["메시지 0"]
+
+def test_transient_failure_is_retried(writer, chat_collection, flaky):
+    fake = flaky([GOOD], failures=2)
+    for i in range(3):
+        writer.enqueue_message(chat_collection, message(i), GOOD)
+    assert writer.flush(timeout=2.0)
+    assert contents(chat_collection, GOOD) == ["메시지 0", "메시지 1", "메시지 2"]
+    assert writer.stats()["retries"] >= 2
+    assert fake.calls >= 3
+
+def test_failing_session_does_not_block_others(writer, chat_collection, flaky):
+    flaky([BAD])
+    writer.enqueue_message(chat_collection, message(0, "bad 0"), BAD)
+    writer.enqueue_message(chat_collection, message(1, "good 1"), GOOD)
+    writer.enqueue_message(chat_collection, message(2, "bad 2"), BAD)
+    assert not writer.flush(timeout=2.0)
+
+    assert contents(chat_collection, GOOD) == ["good 1"]
+    # 실패한 메시지는 버리지 않고 보관한다
+    assert writer.failed_count() == 2
+    assert writer.pending() == 2
+
+def test_kept_messages_are_written_by_the_next_request(writer, chat_collection, flaky):
+    fake = flaky([BAD])
+    writer.enqueue_message(chat_collection, message(0, "bad 0"), BAD)
+    writer.flush(timeout=2.0)
+    assert writer.failed_count() == 1
+
+    # 아직 저장소가 실패하면 요청 스레드에서 에러가 보인다
+    with pytest.raises(RuntimeError):
+        writer.enqueue_message(chat_collection, message(1, "bad 1"), BAD)
+    assert writer.failed_count() == 2
+
+    fake.failing_sessions.clear()
+    writer.enqueue_message(chat_collection, message(2, "bad 2"), BAD)
+    assert writer.failed_count() == 0
+    assert contents(chat_collection, BAD) == ["bad 0", "bad 1", "bad 2"]
+
+def test_partial_bucket_write_resumes_after_applied_requests():
+    docs = [message(i) for i in range(5)]
+    # 버킷 2개씩: [0, 1], [2, 3], [4]. 요청 3 (두 번째 묶음의 붙이기) 에서 실패
+    assert chat_schema.unapplied_docs(docs, 3, bucket_size=2) == docs[2:]
+    assert chat_schema.unapplied_docs(docs, 0, bucket_size=2) == docs
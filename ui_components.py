@@ -1,6 +1,10 @@
 import streamlit as st
-import matplotlib.pyplot as plt
-import numpy as np
+import functools
+import io
+import math
+import os
+import image_pipeline
+import profiler
 
 def render_custom_css():
     st.markdown("""
@@ -142,6 +146,7 @@ def render_logout_button():
             return True
     return False
 
+@profiler.timed("render.render_sidebar")
 def render_sidebar(sessions=None, on_session_select=None, on_new_chat=None, on_delete_session=None):
     with st.sidebar:
         if st.button("✨ 새 채팅", key="new_chat_btn", use_container_width=True):
@@ -191,15 +196,27 @@ def render_header():
         <h1 style='color: #4F8BF9; font-size: 24px; margin-bottom: 20px;'>Poten.Ai</h1>
     """, unsafe_allow_html=True)
 
-def display_chat_messages(messages):
-    for msg in messages:
+@profiler.timed("render.display_chat_messages")
+def display_chat_messages(messages, window=None, has_older=False, on_load_older=None):
+    # 최근 window 개만 그린다. 숨겨진(또는 아직 불러오지 않은) 메시지가 있으면 더 보기 버튼 표시
+    visible = messages[-window:] if window else messages
+    if len(visible) < len(messages) or has_older:
+        if st.button("⬆️ 이전 메시지 더 보기", key="load_older_messages", use_container_width=True):
+            if on_load_older:
+                on_load_older()
+                st.rerun()
+
+    for msg in visible:
         with st.chat_message(msg["role"]):
             if isinstance(msg["content"], list):
                 for item in msg["content"]:
                     if item["type"] == "text":
                         st.write(item["text"])
                     elif item["type"] == "image_url":
-                        st.image(item["image_url"]["url"])
+                        try:
+                            st.image(image_pipeline.load_image_from_url(item["image_url"]["url"]))
+                        except Exception as e:
+                            st.caption(f"🖼️ 이미지를 불러오지 못했습니다: {str(e)}")
             else:
                 st.write(msg["content"])
 
@@ -209,6 +226,7 @@ def display_user_info(user_info):
         st.write(f"**{user_info['name']}**님")
         st.caption(user_info['email'])
 
+@profiler.timed("render.render_bmc_visual")
 def render_bmc_visual(bmc_data):
     st.markdown("""
     <style>
@@ -307,47 +325,87 @@ def render_bmc_visual(bmc_data):
     """
     st.markdown(html, unsafe_allow_html=True)
 
-def render_radar_chart(scores):
-    # 한글 폰트 설정 (Windows/Linux/Mac 대응 필요, 일단 기본 폰트 사용하거나 영문으로)
-    # Streamlit Cloud 등에서는 한글 폰트가 없을 수 있음.
-    # 안전하게 영문 라벨 사용하거나, 사용자가 설치한 폰트를 찾도록 해야 함.
-    # 여기서는 간단히 구현.
-    
-    labels = ['Marketability', 'Profitability', 'Innovation', 'Feasibility', 'Growth']
-    # 점수 순서 맞추기
-    values = [
-        scores.get('marketability', 0),
-        scores.get('profitability', 0),
-        scores.get('innovation', 0),
-        scores.get('feasibility', 0),
-        scores.get('growth_potential', 0)
-    ]
-    
-    # 레이더 차트 그리기
-    angles = np.linspace(0, 2 * np.pi, len(labels), endpoint=False).tolist()
-    
-    # 닫힌 도형을 위해 첫 번째 값을 마지막에 추가
-    values += values[:1]
-    angles += angles[:1]
-    
-    fig, ax = plt.subplots(figsize=(6, 6), subplot_kw=dict(polar=True))
-    
-    ax.fill(angles, values, color='#10a37f', alpha=0.25)
-    ax.plot(angles, values, color='#10a37f', linewidth=2)
-    
+RADAR_CHART_BACKEND = os.getenv("RADAR_CHART_BACKEND", "matplotlib")
+RADAR_COLOR = "#10a37f"
+RADAR_LABELS = ['Marketability', 'Profitability', 'Innovation', 'Feasibility', 'Growth']
+RADAR_KEYS = ['marketability', 'profitability', 'innovation', 'feasibility', 'growth_potential']
+
+def radar_values(scores):
+    # 캐시 키로 쓰기 위해 0~100 범위의 튜플로 정규화
+    values = []
+    for key in RADAR_KEYS:
+        try:
+            value = float(scores.get(key, 0))
+        except (TypeError, ValueError):
+            value = 0.0
+        values.append(round(min(max(value, 0.0), 100.0), 1))
+    return tuple(values)
+
+def _radar_angles(count):
+    return [2 * math.pi * i / count for i in range(count)]
+
+@functools.lru_cache(maxsize=256)
+def radar_chart_png(values):
+    # pyplot 을 거치지 않는 Figure 는 전역 figure 목록에 등록되지 않아 참조가 끊기면 바로 해제된다
+    from matplotlib.figure import Figure
+
+    angles = _radar_angles(len(values))
+    closed_values = list(values) + [values[0]]
+    closed_angles = angles + angles[:1]
+
+    fig = Figure(figsize=(6, 6))
+    ax = fig.add_subplot(polar=True)
+    ax.fill(closed_angles, closed_values, color=RADAR_COLOR, alpha=0.25)
+    ax.plot(closed_angles, closed_values, color=RADAR_COLOR, linewidth=2)
+
     ax.set_yticklabels([])
-    ax.set_xticks(angles[:-1])
-    ax.set_xticklabels(labels, fontsize=12, fontweight='bold')
-    
+    ax.set_xticks(angles)
+    ax.set_xticklabels(RADAR_LABELS, fontsize=12, fontweight='bold')
+
     # 0~100 범위 고정
     ax.set_ylim(0, 100)
-    
-    # 차트 배경 투명
-    fig.patch.set_alpha(0.0)
-    ax.patch.set_alpha(0.0)
-    
-    st.pyplot(fig)
 
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", transparent=True, bbox_inches="tight")
+    fig.clear()
+    return buffer.getvalue()
+
+@functools.lru_cache(maxsize=256)
+def radar_chart_svg(values, size=420):
+    # matplotlib 없이 그리는 SVG 버전 (RADAR_CHART_BACKEND=svg)
+    center = size / 2
+    radius = size * 0.32
+    angles = _radar_angles(len(values))
+
+    def point(angle, r):
+        # matplotlib polar 와 같게 0도를 오른쪽, 반시계 방향으로 둔다
+        return center + r * math.cos(angle), center - r * math.sin(angle)
+
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" width="{size}" height="{size}">']
+    for level in (20, 40, 60, 80, 100):
+        ring = " ".join("%.1f,%.1f" % point(a, radius * level / 100) for a in angles)
+        parts.append(f'<polygon points="{ring}" fill="none" stroke="#d1d5db" stroke-width="1"/>')
+    for angle, label in zip(angles, RADAR_LABELS):
+        x, y = point(angle, radius)
+        parts.append(f'<line x1="{center}" y1="{center}" x2="{x:.1f}" y2="{y:.1f}" stroke="#d1d5db" stroke-width="1"/>')
+        lx, ly = point(angle, radius + 28)
+        parts.append(f'<text x="{lx:.1f}" y="{ly:.1f}" font-size="14" font-weight="bold" text-anchor="middle" dominant-baseline="middle">{label}</text>')
+    shape = " ".join("%.1f,%.1f" % point(a, radius * v / 100) for a, v in zip(angles, values))
+    parts.append(f'<polygon points="{shape}" fill="{RADAR_COLOR}" fill-opacity="0.25" stroke="{RADAR_COLOR}" stroke-width="2"/>')
+    parts.append('</svg>')
+    return "".join(parts)
+
+@profiler.timed("render.render_radar_chart")
+def render_radar_chart(scores):
+    # 한글 폰트가 없는 환경(Streamlit Cloud 등)을 고려해 라벨은 영문으로 둔다
+    # 같은 점수면 이미 그린 이미지를 재사용한다
+    values = radar_values(scores)
+    if RADAR_CHART_BACKEND == "svg":
+        st.markdown(f'<div style="text-align:center">{radar_chart_svg(values)}</div>', unsafe_allow_html=True)
+    else:
+        st.image(radar_chart_png(values))
+
+@profiler.timed("render.render_panel_discussion")
 def render_panel_discussion(discussion_data):
     st.markdown("""
     <style>
@@ -424,3 +482,28 @@ def render_panel_discussion(discussion_data):
             <div>{message}</div>
         </div>
         """, unsafe_allow_html=True)
+
+def render_profiler_panel(rerun, summary, prometheus_text, json_text):
+    # 성능 디버그 패널: 이번 리런의 구간별 시간 + 프로세스 전체 p50/p99
+    with st.sidebar.expander("⏱️ 성능 프로파일", expanded=False):
+        if rerun:
+            st.caption(f"이번 리런: {rerun['total_ms']:.1f} ms")
+            lines = []
+            for item in rerun["spans"]:
+                marker = " ⚠️" if item["error"] else ""
+                lines.append(f"{'  ' * item['depth']}{item['name']}: {item['ms']:.1f} ms{marker}")
+            if lines:
+                st.code("\n".join(lines), language=None)
+
+        if summary:
+            rows = [
+                {"stage": name, "count": s["count"], "p50_ms": s["p50_ms"], "p99_ms": s["p99_ms"], "max_ms": s["max_ms"]}
+                for name, s in summary.items()
+            ]
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("JSON", json_text, file_name="profile.json", mime="application/json", key="profiler_json")
+        with col2:
+            st.download_button("Prometheus", prometheus_text, file_name="profile.prom", mime="text/plain", key="profiler_prom")
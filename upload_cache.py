@@ -0,0 +1,150 @@
+# 첨부 파일 파싱 결과 디스크 캐시 (파일 내용 sha256 기준)
+# 추출 텍스트/프로파일은 텍스트 파일로, 표 데이터는 Parquet(pyarrow 없으면 pickle)으로 저장한다.
+# 전체 크기가 UPLOAD_CACHE_MAX_MB 를 넘으면 가장 오래 쓰지 않은(mtime) 항목부터 지운다.
+# 표 파일은 전체 DataFrame 이 아니라 앞부분 표본(data_profiler 의 head)만 저장한다. 전체 행 통계는
+# 스트리밍 프로파일러가 이미 프로파일 텍스트로 만들어 두었고, 표는 행 검색용 색인(doc_retrieval.table_chunks)에만
+# 쓰이므로 큰 파일 전체를 메모리에 올려 다시 저장할 이유가 없다. meta 의 rows/frame_rows 로 구분된다.
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+UPLOAD_CACHE_DIR = os.getenv("UPLOAD_CACHE_DIR", os.path.join(".cache", "uploads"))
+UPLOAD_CACHE_MAX_MB = int(os.getenv("UPLOAD_CACHE_MAX_MB", "512"))
+
+# pyarrow 는 import 비용이 커서 설치 여부만 확인하고 실제 import 는 pandas 가 필요할 때 한다
+FRAME_FORMAT = "parquet" if importlib.util.find_spec("pyarrow") else "pickle"
+
+_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+def _count(name, n=1):
+    # Streamlit 스크립트 스레드 여러 개에서 동시에 불린다
+    with _stats_lock:
+        _stats[name] += n
+
+def _entry_dir(digest):
+    return os.path.join(UPLOAD_CACHE_DIR, digest)
+
+def get(digest):
+    """캐시된 파싱 결과 {"meta", "text", "frame"} 를 돌려준다. 없으면 None."""
+    path = _entry_dir(digest)
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        text = None
+        if os.path.exists(os.path.join(path, "text.txt")):
+            with open(os.path.join(path, "text.txt"), encoding="utf-8") as f:
+                text = f.read()
+        frame = None
+        frame_file = meta.get("frame_file")
+        if frame_file:
+            import pandas as pd
+            if frame_file.endswith(".parquet"):
+                frame = pd.read_parquet(os.path.join(path, frame_file))
+            else:
+                frame = pd.read_pickle(os.path.join(path, frame_file))
+    except FileNotFoundError:
+        _count("misses")
+        return None
+    except Exception as e:
+        # 깨진 항목은 지우고 다시 파싱하게 한다
+        print(f"업로드 캐시 읽기 실패: {str(e)}")
+        _count("errors")
+        shutil.rmtree(path, ignore_errors=True)
+        return None
+
+    # 최근 사용 시각 갱신 (LRU 축출 기준)
+    now = time.time()
+    try:
+        os.utime(path, (now, now))
+    except OSError:
+        pass
+    _count("hits")
+    return {"meta": meta, "text": text, "frame": frame}
+
+def put(digest, meta, text=None, frame=None):
+    path = _entry_dir(digest)
+    if os.path.isdir(path):
+        return
+    try:
+        os.makedirs(UPLOAD_CACHE_DIR, exist_ok=True)
+        # 임시 디렉터리에 다 쓴 뒤 rename 해서 반쯤 쓴 항목이 읽히지 않게 한다
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=UPLOAD_CACHE_DIR)
+        meta = dict(meta, created_at=time.time())
+        if text is not None:
+            with open(os.path.join(tmp, "text.txt"), "w", encoding="utf-8") as f:
+                f.write(text)
+        if frame is not None:
+            frame = frame.copy()
+            frame.columns = [str(c) for c in frame.columns]
+            meta["frame_file"] = None
+            meta["frame_rows"] = len(frame)
+            if FRAME_FORMAT == "parquet":
+                try:
+                    frame.to_parquet(os.path.join(tmp, "frame.parquet"), index=False)
+                    meta["frame_file"] = "frame.parquet"
+                except Exception:
+                    # 숫자/문자가 섞인 object 컬럼 등 Parquet 로 못 쓰는 표는 pickle 로 저장
+                    pass
+            if meta["frame_file"] is None:
+                meta["frame_file"] = "frame.pkl"
+                frame.to_pickle(os.path.join(tmp, meta["frame_file"]))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # 다른 스레드가 먼저 저장한 경우
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        _count("stores")
+    except Exception as e:
+        print(f"업로드 캐시 저장 실패: {str(e)}")
+        _count("errors")
+        return
+    evict()
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def evict(max_bytes=None):
+    if max_bytes is None:
+        max_bytes = UPLOAD_CACHE_MAX_MB * 1024 * 1024
+    with _lock:
+        try:
+            names = os.listdir(UPLOAD_CACHE_DIR)
+        except FileNotFoundError:
+            return 0
+        entries = []
+        for name in names:
+            path = os.path.join(UPLOAD_CACHE_DIR, name)
+            if name.startswith(".tmp-") or not os.path.isdir(path):
+                continue
+            entries.append((os.path.getmtime(path), _dir_size(path), path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        _count("evictions", removed)
+        return removed
+
+def stats():
+    with _stats_lock:
+        return dict(_stats, format=FRAME_FORMAT)
@@ -0,0 +1,63 @@
+# 서버 시작 시 백그라운드 워밍업
+# 첫 사용자가 기다리지 않도록 Mongo 커넥션 풀, OpenAI 클라이언트, 인구 통계 스냅샷을 미리 준비한다.
+import os
+import threading
+import time
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+
+_started = False
+_lock = threading.Lock()
+_status = {}
+
+def _warm_mongo():
+    from mongo_utils import get_mongo_client
+
+    client = get_mongo_client()
+    if client is None:
+        # MONGO_URI 가 없으면 DB 없이 동작하므로 데울 것도 없다
+        return
+    client.admin.command("ping")
+
+def _warm_openai(api_key):
+    import llm_client
+
+    llm_client.get_client(api_key)
+
+def _warm_census():
+    import census_index
+    import segment_sizing
+
+    census_index.get_index()
+    segment_sizing.get_sizer()
+
+def _run(steps):
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+            _status[name] = {"ok": True, "ms": round((time.perf_counter() - started) * 1000, 1)}
+        except Exception as e:
+            # 워밍업 실패는 치명적이지 않다 (실제 요청 때 다시 시도됨)
+            print(f"워밍업 실패 ({name}): {str(e)}")
+            _status[name] = {"ok": False, "error": str(e)}
+
+def start(openai_api_key=None):
+    """프로세스당 한 번만 워밍업 스레드를 띄운다 (Streamlit 리런마다 호출해도 됨)."""
+    global _started
+    if _started or not WARMUP_ENABLED:
+        return False
+    with _lock:
+        if _started:
+            return False
+        _started = True
+
+    steps = [("mongo", _warm_mongo)]
+    if openai_api_key:
+        steps.append(("openai", lambda: _warm_openai(openai_api_key)))
+    steps.append(("census", _warm_census))
+    threading.Thread(target=_run, args=(steps,), name="warmup", daemon=True).start()
+    return True
+
+def status():
+    return dict(_status)
@@ -0,0 +1,283 @@
+# 채팅 로그용 write-behind 큐
+# 요청 스레드는 큐에 넣기만 하고, 백그라운드 스레드가 세션별 메시지 버킷에 bulk_write 로 묶어서 저장한다.
+# 저장에 실패한 메시지는 버리지 않는다. 몇 번 다시 시도한 뒤에도 실패하면 보관해 두었다가
+# 다음 요청 스레드가 직접(동기로) 쓰고, 그래도 실패하면 그 요청에서 에러를 낸다.
+import atexit
+import os
+import queue
+import threading
+import time
+
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import chat_schema
+
+WRITE_BATCH_SIZE = int(os.getenv("CHAT_WRITE_BATCH_SIZE", "200"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("CHAT_WRITE_FLUSH_INTERVAL_MS", "200")) / 1000
+WRITE_QUEUE_MAX = int(os.getenv("CHAT_WRITE_QUEUE_MAX", "10000"))
+WRITE_RETRIES = int(os.getenv("CHAT_WRITE_RETRIES", "3"))
+WRITE_RETRY_DELAY = float(os.getenv("CHAT_WRITE_RETRY_DELAY_MS", "200")) / 1000
+DUPLICATE_KEY = 11000
+
+class WriteBehindQueue:
+    def __init__(self, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL, max_size=WRITE_QUEUE_MAX,
+                 retries=WRITE_RETRIES, retry_delay=WRITE_RETRY_DELAY):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        # 다시 시도해도 저장하지 못한 (collection, doc, session_id). 큐 순서를 유지한다
+        self._failed = []
+        self._failed_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "batches": 0,
+            "messages": 0,
+            "session_updates": 0,
+            "errors": 0,
+            "retries": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="chat-write-behind", daemon=True)
+            self._thread.start()
+
+    def enqueue_message(self, collection, doc, session_id=None):
+        self._ensure_started()
+        item = (collection, doc, session_id)
+        if self.failed_count():
+            # 백그라운드에서 못 쓴 메시지가 있으면 순서를 지키도록 새 메시지와 함께 여기서 바로 쓴다
+            self._write_sync([item])
+            return
+        try:
+            self._queue.put(item, timeout=1.0)
+        except queue.Full:
+            # 큐가 가득 차면 요청 스레드에서 바로 쓴다 (유실보다 지연이 낫다)
+            self._write_sync([item])
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def failed_count(self):
+        with self._failed_lock:
+            return len(self._failed)
+
+    def pending(self):
+        # 큐에 남은 것 + 현재 쓰는 중인 배치 + 저장하지 못하고 보관 중인 것
+        return self._queue.unfinished_tasks + self.failed_count()
+
+    def flush(self, timeout=10.0):
+        if not self.pending():
+            return True
+        if self._thread is None or not self._thread.is_alive():
+            self._drain_sync()
+        else:
+            deadline = time.monotonic() + timeout
+            while self._queue.unfinished_tasks:
+                if time.monotonic() > deadline:
+                    return False
+                time.sleep(0.005)
+        if self.failed_count():
+            try:
+                self._write_sync([])
+            except Exception as e:
+                print(f"보관 중인 메시지 저장 실패: {str(e)}")
+                return False
+        return True
+
+    def shutdown(self, timeout=10.0):
+        self.flush(timeout)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        lost = self.failed_count()
+        if lost:
+            print(f"종료 시 저장하지 못한 채팅 메시지 {lost}개")
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats["batches"] or 1
+        stats["avg_flush_ms"] = round(stats.pop("total_flush_ms") / batches, 2)
+        stats["queue_depth"] = self.depth()
+        stats["failed_pending"] = self.failed_count()
+        return stats
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_with_retries(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _take_failed(self):
+        with self._failed_lock:
+            failed, self._failed = self._failed, []
+        return failed
+
+    def _keep_failed(self, items):
+        with self._failed_lock:
+            self._failed = items + self._failed
+
+    def _write_with_retries(self, batch):
+        # 이전에 못 쓴 메시지를 먼저 써야 세션 안의 순서가 유지된다
+        items = self._take_failed() + batch
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self._stats_lock:
+                    self._stats["retries"] += 1
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            items = self._write_batch(items)
+            if not items:
+                return
+        print(f"채팅 메시지 {len(items)}개 저장 실패, 다음 요청에서 다시 씁니다.")
+        self._keep_failed(items)
+
+    def _write_sync(self, items):
+        # 요청 스레드에서 직접 쓴다. 그래도 실패하면 보관하고 예외로 알린다 (조용히 버리지 않는다)
+        failed = self._write_batch(self._take_failed() + items)
+        if failed:
+            self._keep_failed(failed)
+            raise RuntimeError(f"채팅 메시지 {len(failed)}개를 저장하지 못했습니다.")
+
+    def _drain_sync(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            try:
+                self._write_with_retries(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _insert_loose(self, collection, items):
+        docs = [doc for _, doc, _ in items]
+        try:
+            collection.insert_many(docs, ordered=False)
+            return []
+        except BulkWriteError as e:
+            # 다시 시도할 때 이미 들어간 문서(같은 _id)는 성공으로 본다
+            failed = sorted({
+                error["index"] for error in e.details.get("writeErrors", [])
+                if error.get("code") != DUPLICATE_KEY
+            })
+            if failed:
+                print(f"메시지 일괄 저장 실패: {str(e)}")
+            return [items[i] for i in failed]
+        except Exception as e:
+            print(f"메시지 일괄 저장 실패: {str(e)}")
+            return items
+
+    def _append_session(self, collection, session_id, items):
+        # 세션마다 따로 ordered bulk_write 해서 한 세션의 실패가 다른 세션을 막지 않게 한다
+        docs = [doc for _, doc, _ in items]
+        requests = chat_schema.append_requests(session_id, docs[0]["email"], docs[0]["name"], docs)
+        try:
+            chat_schema.message_buckets(collection).bulk_write(requests, ordered=True)
+            return []
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if not errors:
+                return []
+            print(f"세션 메시지 저장 실패: {str(e)}")
+            remaining = chat_schema.unapplied_docs(docs, errors[0]["index"])
+            return items[len(items) - len(remaining):]
+        except Exception as e:
+            # 연결 오류는 어디까지 반영됐는지 알 수 없어 전부 다시 쓴다 (유실보다 중복이 낫다)
+            print(f"세션 메시지 저장 실패: {str(e)}")
+            return items
+
+    def _write_batch(self, batch):
+        """배치를 저장하고 저장하지 못한 항목을 원래 순서대로 돌려준다."""
+        started = time.perf_counter()
+        collections = {}
+        loose = {}
+        by_session = {}
+        bumps = {}
+        for item in batch:
+            collection, doc, session_id = item
+            key = collection.full_name
+            collections[key] = collection
+            if not session_id:
+                loose.setdefault(key, []).append(item)
+                continue
+            # 세션 메시지는 세션별 버킷에 한 번에 붙인다
+            by_session.setdefault(key, {}).setdefault(session_id, []).append(item)
+            # 같은 세션의 updated_at 갱신은 가장 늦은 시각 하나로 합친다
+            session_bumps = bumps.setdefault(key, {})
+            ts = doc["timestamp"]
+            if session_id not in session_bumps or session_bumps[session_id] < ts:
+                session_bumps[session_id] = ts
+
+        failed = []
+        errors = 0
+        session_updates = 0
+        for key, collection in collections.items():
+            groups = [self._insert_loose(collection, loose[key])] if loose.get(key) else []
+            groups += [
+                self._append_session(collection, session_id, items)
+                for session_id, items in by_session.get(key, {}).items()
+            ]
+            for group in groups:
+                if group:
+                    errors += 1
+                    failed += group
+            # updated_at 은 $max 라 실패해도 다음 메시지에서 맞춰진다 (메시지 자체는 위에서 보관)
+            requests = [
+                UpdateOne({"_id": ObjectId(session_id)}, {"$max": {"updated_at": ts}})
+                for session_id, ts in bumps.get(key, {}).items()
+                if ObjectId.is_valid(session_id)
+            ]
+            if requests:
+                try:
+                    chat_schema.sessions(collection).bulk_write(requests, ordered=False)
+                    session_updates += len(requests)
+                except Exception as e:
+                    errors += 1
+                    print(f"세션 갱신 실패: {str(e)}")
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["messages"] += len(batch) - len(failed)
+            self._stats["session_updates"] += session_updates
+            self._stats["errors"] += errors
+            self._stats["last_flush_ms"] = round(elapsed_ms, 2)
+            self._stats["max_flush_ms"] = round(max(self._stats["max_flush_ms"], elapsed_ms), 2)
+            self._stats["total_flush_ms"] += elapsed_ms
+        # 세션별로 묶으면서 섞인 순서를 원래 큐 순서로 되돌린다
+        order = {id(item): i for i, item in enumerate(batch)}
+        return sorted(failed, key=lambda item: order[id(item)])
+
+chat_writer = WriteBehindQueue()
+atexit.register(chat_writer.shutdown)